@@ -0,0 +1,173 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+
+from apiv1.serializers import CustomErrorSerializer
+from error_messages.worksite_error_messages import PaginationErrors
+from services.common_utils import QuerySetChain
+
+CURSOR_SALT = "apiv1.pagination.cursor"
+
+
+class Cursor(NamedTuple):
+    """Структура данных с позицией курсора: номер QuerySet'а в QuerySetChain и ключ последнего объекта страницы."""
+
+    part: int = 0
+    values: Optional[Tuple] = None
+
+
+def get_approximate_count(queryset: QuerySet | QuerySetChain) -> int:
+    """
+    Примерное количество объектов без COUNT(*) по большим выборкам: в PostgreSQL берется оценка планировщика,
+    а точный COUNT(*) выполняется, только если оценка меньше API_APPROXIMATE_COUNT_THRESHOLD (на небольших
+    выборках он дешевый). Результат кешируется на API_COUNT_CACHE_TIMEOUT секунд.
+    """
+
+    if isinstance(queryset, QuerySetChain):
+        return sum(get_approximate_count(part) for part in queryset.querysets)
+    queryset = queryset.order_by().values("pk")
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f"{sql}{params}".encode(), usedforsecurity=False).hexdigest()
+    cache_count_name = f"{settings.API_COUNT_CACHE_NAME}{settings.CACHE_NAMES_DELIMITER}{digest}"
+    count = cache.get(cache_count_name)
+    if count is None:
+        count = _get_planner_estimate(queryset, sql, params)
+        if count is None or count < settings.API_APPROXIMATE_COUNT_THRESHOLD:
+            count = queryset.count()
+        cache.set(cache_count_name, count, settings.API_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def _get_planner_estimate(queryset: QuerySet, sql: str, params: Tuple) -> Optional[int]:
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class HybridPagination(LimitOffsetPagination):
+    """
+    Пагинация API. По умолчанию - limit/offset, как раньше. С параметром cursor (пустым для первой страницы)
+    у вьюх с атрибутом cursor_ordering (например, ("-time_added", "-id")) - keyset пагинация: страница
+    выбирается условием по ключу последнего объекта предыдущей страницы, а не OFFSET, поэтому глубокие страницы
+    не медленнее первой, а добавление новых объектов не сдвигает страницы. Курсор подписан и непрозрачен для
+    клиента, переход возможен только вперед (ссылка next). В режиме курсора COUNT(*) не выполняется, а с
+    параметром count=approximate (в обоих режимах) количество берется из get_approximate_count.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset: QuerySet | QuerySetChain, request: Request, view: APIView = None) -> List:
+        self.request = request
+        self.approximate_count = request.query_params.get(self.count_query_param, None) == "approximate"
+        self.cursor_ordering = getattr(view, "cursor_ordering", None)
+        if self.cursor_ordering is None or self.cursor_query_param not in request.query_params:
+            self.cursor_ordering = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        self.count = get_approximate_count(queryset) if self.approximate_count else None
+        cursor = self._decode_cursor(queryset, request.query_params[self.cursor_query_param])
+        parts = queryset.querysets if isinstance(queryset, QuerySetChain) else (queryset,)
+        annotations = {f"cursor_{i}": F(field.lstrip("-")) for i, field in enumerate(self.cursor_ordering)}
+        objects: List[Tuple[int, object]] = []
+        for part in range(cursor.part, len(parts)):
+            part_queryset = parts[part].order_by(*self.cursor_ordering).annotate(**annotations)
+            if part == cursor.part and cursor.values is not None:
+                part_queryset = part_queryset.filter(self._get_keyset_filter(cursor.values))
+            # на один объект больше, чтобы узнать, есть ли следующая страница
+            objects.extend((part, obj) for obj in part_queryset[: self.limit + 1 - len(objects)])
+            if len(objects) > self.limit:
+                break
+        self.next_cursor = None
+        if len(objects) > self.limit:
+            part, last = objects[self.limit - 1]
+            self.next_cursor = Cursor(part, tuple(getattr(last, name) for name in annotations))
+        return [obj for _, obj in objects[: self.limit]]
+
+    def get_count(self, queryset: QuerySet | QuerySetChain) -> int:
+        if self.approximate_count:
+            return get_approximate_count(queryset)
+        return super().get_count(queryset)
+
+    def get_paginated_response(self, data: List) -> Response:
+        if self.cursor_ordering is None:
+            return super().get_paginated_response(data)
+        response: Dict = {} if self.count is None else {"count": self.count}
+        return Response(response | {"next": self._get_next_cursor_link(), "results": data})
+
+    def get_schema_operation_parameters(self, view: APIView) -> List[Dict]:
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append(
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "approximate - примерное количество объектов (без COUNT(*) по большим выборкам).",
+                "schema": {"type": "string", "enum": ["approximate"]},
+            }
+        )
+        if getattr(view, "cursor_ordering", None) is not None:
+            parameters.append(
+                {
+                    "name": self.cursor_query_param,
+                    "required": False,
+                    "in": "query",
+                    "description": "Курсор страницы из ссылки next (пустой - первая страница), вместо offset.",
+                    "schema": {"type": "string"},
+                }
+            )
+        return parameters
+
+    def _get_keyset_filter(self, values: Tuple) -> Q:
+        """Условие "после ключа values" в порядке cursor_ordering (с равенством по первым полям)."""
+
+        fields = [field.lstrip("-") for field in self.cursor_ordering]
+        lookups = ["lt" if field.startswith("-") else "gt" for field in self.cursor_ordering]
+        query = Q()
+        for i, (field, lookup) in enumerate(zip(fields, lookups)):
+            query |= Q(**dict(zip(fields[:i], values[:i])), **{f"{field}__{lookup}": values[i]})
+        # избыточное условие по первому полю, чтобы индекс использовался как диапазон
+        return Q(**{f"{fields[0]}__{lookups[0]}e": values[0]}) & query
+
+    def _decode_cursor(self, queryset: QuerySet | QuerySetChain, token: str) -> Cursor:
+        if not token:
+            return Cursor()
+        try:
+            part, values = signing.loads(token, salt=CURSOR_SALT)
+            model = (queryset.querysets[part] if isinstance(queryset, QuerySetChain) else queryset).model
+            fields = [model._meta.get_field(field.lstrip("-")) for field in self.cursor_ordering]
+            if len(values) != len(fields) or None in values:
+                raise ValueError
+            return Cursor(part, tuple(field.to_python(value) for field, value in zip(fields, values)))
+        except (signing.BadSignature, DjangoValidationError, ValueError, TypeError, IndexError):
+            error = PaginationErrors["cursor"]
+            raise ValidationError(CustomErrorSerializer({"detail": error.message, "code": error.code}).data)
+
+    def _get_next_cursor_link(self) -> Optional[str]:
+        if self.next_cursor is None:
+            return None
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in self.next_cursor.values]
+        token = signing.dumps((self.next_cursor.part, values), salt=CURSOR_SALT)
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
@@ -0,0 +1,17 @@
+from typing import IO, Mapping, Optional
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson (в паре с apiv1.renderers.ORJSONRenderer)."""
+
+    def parse(
+        self, stream: IO[bytes], media_type: Optional[str] = None, parser_context: Optional[Mapping] = None
+    ) -> object:
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
@@ -0,0 +1,27 @@
+from typing import Any, Mapping, Optional
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Даты и время передаются в JSONEncoder DRF, чтобы формат совпадал со стандартным JSONRenderer
+# (миллисекунды, "Z" для UTC). Остальные типы, которые orjson не умеет кодировать (Decimal, ленивые строки,
+# QuerySet и т.д.), тоже кодируются JSONEncoder.
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson: тот же формат ответа, но кодирование в несколько раз быстрее стандартного json."""
+
+    def render(
+        self,
+        data: object,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[Mapping[str, Any]] = None,
+    ) -> bytes:
+        if data is None:
+            return b""
+        options = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=JSONEncoder().default, option=options)
@@ -1,18 +1,23 @@
 from datetime import datetime
-from typing import Dict, Literal, Tuple
+from typing import Dict, Literal, Optional, Tuple
 
 import pytz
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db.models import QuerySet
+from django.http import QueryDict
+from django.urls import reverse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from error_messages.errors import E
 from home_app.models import ApplicantSettings, CompanySettings
+from services.apiv1_utils import get_selected_fields
 from services.common_utils import get_timezone, get_user_settings
+from services.worksite_app_mixins import CheckPermissionsToSeeVacancy, get_company_ratings, get_similar_vacancys
 from worksite_app.constants import EXPERIENCE_CHOICES
-from worksite_app.models import Offer, Rating, Vacancy
+from worksite_app.models import Offer, Rating, SalaryStats, Vacancy
 
 UserSettings = ApplicantSettings | CompanySettings
 
@@ -26,16 +31,67 @@ def set_datetime_to_timezone(dt: datetime, timezone: str) -> Tuple[datetime | Li
     return None, None
 
 
-def set_time_to_user_timezone(user: User | UserSettings, time: datetime, attribute_name: str = "time_added") -> Dict:
+def set_time_to_user_timezone(
+    user: User | UserSettings,
+    time: datetime,
+    attribute_name: str = "time_added",
+    user_timezone: Optional[str | Literal[False]] = None,
+) -> Dict:
     """Приведение datetime объекта к временной зоне, установленной в настройках текущего пользователя."""
 
-    user_timezone = get_timezone(user)
+    if user_timezone is None:
+        user_timezone = get_timezone(user)
     if user_timezone:
         time, timezone = set_datetime_to_timezone(time, user_timezone)
         return {attribute_name: time.strftime("%H:%M %d/%m/%Y") if time else None, "timezone": timezone}
     return {attribute_name: time.strftime("%H:%M %d/%m/%Y") if time else None, "timezone": "UTC"}
 
 
+def get_company_info(company_settings: CompanySettings) -> Dict:
+    data = CompanySettingsSerializer(instance=company_settings, context={"view_rating": True}).data
+    return data | {"vacancys_count": company_settings.vacancys_count}
+
+
+# Миксин сериализаторов, возвращающих только поля, выбранные GET параметрами fields и expand (см.
+# services.apiv1_utils.get_selected_fields). Вьюха передает выбранные поля в контексте (fields), остальные поля
+# не вычисляются. Поля из expandable_fields возвращаются только по expand. В field_sources перечислены колонки,
+# нужные полю (по умолчанию - одноименная колонка), по ним setup_eager_loading ограничивает запрос. Описание
+# вынесено из докстринга, так как drf-spectacular показывал бы его в схеме каждого сериализатора.
+class DynamicFieldsMixin(object):
+    expandable_fields: Tuple[str, ...] = ()
+    field_sources: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def get_selected_fields(cls, params: QueryDict) -> Tuple[str, ...] | E:
+        return get_selected_fields(params, cls.Meta.fields, cls.expandable_fields)
+
+    @classmethod
+    def get_default_fields(cls) -> Tuple[str, ...]:
+        return tuple(field for field in cls.Meta.fields if field not in cls.expandable_fields)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset: QuerySet, fields: Optional[Tuple[str, ...]] = None) -> QuerySet:
+        columns = [
+            column for field in fields or cls.get_default_fields() for column in cls.field_sources.get(field, (field,))
+        ]
+        relations = {column.rpartition("__")[0] for column in columns if "__" in column}
+        queryset = queryset.select_related(None)
+        if relations:  # select_related() без аргументов подтягивает все связи
+            queryset = queryset.select_related(*relations)
+        return queryset.only("pk", *columns)
+
+    def get_fields(self) -> Dict[str, serializers.Field]:
+        fields = super().get_fields()
+        # выбор полей относится только к сериализатору ответа, а не к вложенным в него сериализаторам
+        is_root = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        selected = self.context.get("fields", None) if is_root else None
+        if selected is None:  # сериализатор используется без выбора полей (валидация, схема API)
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+
 class DefaultErrorSerializer(serializers.Serializer):
     detail = serializers.CharField()
 
@@ -45,6 +101,21 @@ class CustomErrorSerializer(serializers.Serializer):
     code = serializers.CharField()
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField())
+
+
+class BulkItemResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    id = serializers.IntegerField(allow_null=True)
+    detail = serializers.CharField(allow_null=True)
+    code = serializers.CharField(allow_null=True)
+
+
+class BulkResultSerializer(serializers.Serializer):
+    results = BulkItemResultSerializer(many=True)
+
+
 class CompanySettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = CompanySettings
@@ -84,53 +155,102 @@ class CompanySerializer(serializers.ModelSerializer):
         return company.first_name
 
 
-class CompanyDetailSerializer(CompanySerializer):
+class RatingsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    time_added = serializers.SerializerMethodField()
+    applicant = serializers.SerializerMethodField()
+
+    field_sources = {"applicant": ("applicant__username",)}
+
+    class Meta:
+        model = Rating
+        fields = "applicant", "rating", "comment", "time_added"
+
+    @extend_schema_field(serializers.DictField)
+    def get_time_added(self, rating):
+        return set_time_to_user_timezone(self.context["request"].user, rating.time_added)
+
+    @extend_schema_field(OpenApiTypes.STR)
+    def get_applicant(self, rating):
+        return rating.applicant.username
+
+
+class CompanyDetailSerializer(DynamicFieldsMixin, CompanySerializer):
     company_info = serializers.SerializerMethodField()
     date_joined = serializers.SerializerMethodField()
+    latest_ratings = serializers.SerializerMethodField()
+
+    expandable_fields = ("latest_ratings",)
+    field_sources = {"company_name": ("first_name",), "company_info": (), "latest_ratings": ()}
+    latest_ratings_count = 5
 
     class Meta:
         model = User
-        fields = "username", "company_name", "date_joined", "company_info"
+        fields = "username", "company_name", "date_joined", "company_info", "latest_ratings"
 
     @extend_schema_field(serializers.DictField)
     def get_company_info(self, company):
-        settings_ = get_user_settings(company)
-        data = CompanySettingsSerializer(instance=settings_, context={"view_rating": True})
-        vacancys_count = Vacancy.objects.filter(company=company, archived=False, deleted=False).count()
-        return data.data | {"vacancys_count": vacancys_count}
+        return get_company_info(get_user_settings(company))
 
     @extend_schema_field(serializers.DictField)
     def get_date_joined(self, company):
         return set_time_to_user_timezone(self.context["request"].user, company.date_joined, "date_joined")
 
+    @extend_schema_field(RatingsSerializer(many=True))
+    def get_latest_ratings(self, company):
+        ratings = get_company_ratings(company)[: self.latest_ratings_count]
+        return RatingsSerializer(ratings, many=True, context={"request": self.context["request"]}).data
 
-class VacancysSerializer(serializers.ModelSerializer):
+
+class VacancysSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company = CompanySerializer(read_only=True)
     time_added = serializers.SerializerMethodField()
     experience = ExperienceChoiceField(choices=EXPERIENCE_CHOICES)
+    company_info = serializers.SerializerMethodField()
+
+    expandable_fields = ("company_info",)
+    field_sources = {"company": ("company__username", "company__first_name"), "company_info": ("company__username",)}
 
     class Meta:
         model = Vacancy
-        fields = ("id", "company", "name", "money", "experience", "city", "time_added", "archived")
+        fields = ("id", "company", "name", "money", "experience", "city", "time_added", "archived", "company_info")
 
     @classmethod
-    def setup_eager_loading(cls, queryset) -> QuerySet:
-        queryset = queryset.prefetch_related("company")
+    def setup_eager_loading(cls, queryset: QuerySet, fields: Optional[Tuple[str, ...]] = None) -> QuerySet:
+        queryset = super().setup_eager_loading(queryset, fields)
+        if fields and "company_info" in fields:
+            # настройки компании подтягиваются подзапросами, как на странице вакансии
+            queryset = queryset.annotate(**CheckPermissionsToSeeVacancy.get_company_settings_annotations())
         return queryset
 
     @extend_schema_field(serializers.DictField)
     def get_time_added(self, vacancy):
-        return set_time_to_user_timezone(self.context["request"].user, vacancy.time_added)
+        user_timezone = self.context.get("user_timezone", None)
+        return set_time_to_user_timezone(self.context["request"].user, vacancy.time_added, user_timezone=user_timezone)
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_experience_data(self, vacancy):
         return EXPERIENCE_CHOICES[int(vacancy.experience)][1]
 
+    @extend_schema_field(serializers.DictField)
+    def get_company_info(self, vacancy):
+        return get_company_info(CheckPermissionsToSeeVacancy.get_company_settings(vacancy))
+
+
+class SimilarVacancySerializer(serializers.ModelSerializer):
+    company = CompanySerializer(read_only=True)
+    experience = ExperienceChoiceField(choices=EXPERIENCE_CHOICES)
+
+    class Meta:
+        model = Vacancy
+        fields = "id", "company", "name", "money", "experience", "city"
+
 
 class VacancyDetailSerializer(VacancysSerializer):
+    similar_vacancys = serializers.SerializerMethodField()
+
     class Meta:
         immutable_fields = "name", "description", "money", "experience", "city", "skills"
-        read_only_fields = "pk", "company", "time_added", "archived"
+        read_only_fields = "pk", "company", "time_added", "archived", "company_info", "similar_vacancys"
         model = Vacancy
         fields = *read_only_fields, *immutable_fields
         extra_kwargs: Dict = {}
@@ -140,6 +260,10 @@ class VacancyDetailSerializer(VacancysSerializer):
         for field in self.Meta.immutable_fields:
             self.Meta.extra_kwargs[field] = {"required": True}
 
+    @extend_schema_field(SimilarVacancySerializer(many=True))
+    def get_similar_vacancys(self, vacancy):
+        return SimilarVacancySerializer(get_similar_vacancys(vacancy.pk), many=True).data
+
 
 class _BaseOfferSerializer(serializers.ModelSerializer):
     time_added = serializers.SerializerMethodField()
@@ -152,24 +276,35 @@ class _BaseOfferSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_resume(self, offer):
-        return (
-            settings.MEDIA_URL + offer.resume.path.split(str(settings.BASE_DIR))[-1].split(settings.MEDIA_ROOT)[-1]
-            if offer.resume
-            else None
-        )
+        return reverse("offer_resume", kwargs={"ids": offer.pk}) if offer.resume else None
 
     @extend_schema_field(OpenApiTypes.STR)
     def get_applicant(self, offer):
         return offer.applicant.username
 
 
-class OffersFullSerializer(_BaseOfferSerializer):
+class OfferVacancySerializer(serializers.ModelSerializer):
+    experience = ExperienceChoiceField(choices=EXPERIENCE_CHOICES)
+
+    class Meta:
+        model = Vacancy
+        fields = "id", "name", "money", "experience", "city", "archived"
+
+
+class OffersFullSerializer(DynamicFieldsMixin, _BaseOfferSerializer):
     time_applyed = serializers.SerializerMethodField()
+    vacancy_info = OfferVacancySerializer(source="vacancy", read_only=True)
+
+    expandable_fields = ("vacancy_info",)
+    field_sources = {
+        "applicant": (),
+        "vacancy_info": tuple(f"vacancy__{field}" for field in OfferVacancySerializer.Meta.fields),
+    }
 
     class Meta:
         model = Offer
         read_only_fields = "id", "time_added", "time_applyed", "applyed", "withdrawn"
-        fields = *read_only_fields, "vacancy", "applicant", "resume", "resume_text"
+        fields = *read_only_fields, "vacancy", "applicant", "resume", "resume_text", "vacancy_info"
 
     @extend_schema_field(serializers.DictField)
     def get_time_applyed(self, offer):
@@ -196,18 +331,50 @@ class VacancyOffersSerializer(_BaseOfferSerializer):
         fields = *read_only_fields, "applicant", "resume", "resume_text"
 
 
-class RatingsSerializer(serializers.ModelSerializer):
-    time_added = serializers.SerializerMethodField()
-    applicant = serializers.SerializerMethodField()
+class SalaryStatsSerializer(serializers.ModelSerializer):
+    experience = serializers.SerializerMethodField()
+    histogram = serializers.SerializerMethodField()
 
     class Meta:
-        model = Rating
-        fields = "applicant", "rating", "comment", "time_added"
-
-    @extend_schema_field(serializers.DictField)
-    def get_time_added(self, rating):
-        return set_time_to_user_timezone(self.context["request"].user, rating.time_added)
+        model = SalaryStats
+        fields = "city", "experience", "count", "p10", "p50", "p90", "histogram", "time_updated"
 
     @extend_schema_field(OpenApiTypes.STR)
-    def get_applicant(self, rating):
-        return rating.applicant.username
+    def get_experience(self, stats):
+        # пустое значение - статистика по всем уровням опыта города
+        return EXPERIENCE_CHOICES[int(stats.experience)][1] if stats.experience else None
+
+    @extend_schema_field(serializers.ListField(child=serializers.DictField()))
+    def get_histogram(self, stats):
+        bins = settings.SALARY_STATS_BINS
+        return [
+            {"money_from": money_from, "money_to": money_to, "count": count}
+            for money_from, money_to, count in zip(bins, bins[1:], stats.histogram)
+        ]
+
+
+class StatsRowSerializer(serializers.Serializer):
+    offers_count = serializers.IntegerField()
+    applyed_count = serializers.IntegerField()
+    withdrawn_count = serializers.IntegerField()
+    time_to_apply = serializers.DurationField(allow_null=True)
+    withdrawal_rate = serializers.FloatField(allow_null=True)
+
+
+class VacancyStatsSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    stats = StatsRowSerializer()
+
+
+class DayStatsSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    stats = StatsRowSerializer()
+
+
+class CompanyStatsSerializer(serializers.Serializer):
+    date_from = serializers.DateField(source="period.date_from")
+    date_to = serializers.DateField(source="period.date_to")
+    totals = StatsRowSerializer()
+    vacancys = VacancyStatsSerializer(many=True)
+    days = DayStatsSerializer(many=True)
@@ -6,10 +6,17 @@ from apiv1.views import (
     AddRatingAPIView,
     ApplicantOffersViewSet,
     ApplyOfferAPIView,
+    BulkApplyOffersAPIView,
     CompanyApplyedOffersAPIView,
+    CompanyStatsAPIView,
+    ExportCompanyApplyedOffersAPIView,
+    ExportCompanyVacancysAPIView,
+    ExportVacancyOffersAPIView,
     GetCompanyDetailAPIView,
     GetCompanyRatingsAPIView,
     GetVacancyOffersAPIView,
+    OfferResumeAPIView,
+    SalaryStatsAPIView,
     UpdateSettingsAPIView,
     VacancyViewSet,
 )
@@ -24,9 +31,20 @@ urlpatterns = [
     path("company/<str:uname>/", GetCompanyDetailAPIView.as_view(), name="company_detail"),
     path("company/<str:uname>/ratings/", GetCompanyRatingsAPIView.as_view(), name="company_ratings"),
     path("offers/<int:ids>/apply/", ApplyOfferAPIView.as_view(), name="apply_offer"),
+    path("offers/<int:ids>/resume/", OfferResumeAPIView.as_view(), name="offer_resume"),
     path("company/offers/applyed/", CompanyApplyedOffersAPIView.as_view(), name="company_applyed_offers"),
+    path("company/offers/apply/", BulkApplyOffersAPIView.as_view(), name="bulk_apply_offers"),
+    path("company/offers/stats/", CompanyStatsAPIView.as_view(), name="company_stats"),
+    path("company/vacancys/export/", ExportCompanyVacancysAPIView.as_view(), name="export_company_vacancys"),
+    path(
+        "company/offers/applyed/export/",
+        ExportCompanyApplyedOffersAPIView.as_view(),
+        name="export_company_applyed_offers",
+    ),
+    path("vacancys/<int:ids>/offers/export/", ExportVacancyOffersAPIView.as_view(), name="export_vacancy_offers"),
     path("rating/add/<str:uname>/", AddRatingAPIView.as_view(), name="add_rating"),
     path("settings/update/", UpdateSettingsAPIView.as_view(), name="update_settings"),
+    path("salary-stats/", SalaryStatsAPIView.as_view(), name="salary_stats"),
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
     path("schema/docs/", SpectacularSwaggerView.as_view(url_name="schema")),
 ]
@@ -1,9 +1,14 @@
-from typing import NamedTuple, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Type
 
 from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -14,35 +19,54 @@ from rest_framework.viewsets import GenericViewSet
 from apiv1.permissions import IsApplicant, IsAuthenticatedCompanyOrReadOnly, IsCompany
 from apiv1.serializers import (
     ApplicantSettingsSerializer,
+    BulkIdsSerializer,
+    BulkResultSerializer,
     CompanyApplyedOffersSerializer,
     CompanyDetailSerializer,
     CompanySettingsSerializer,
+    CompanyStatsSerializer,
     CustomErrorSerializer,
     DefaultErrorSerializer,
+    DynamicFieldsMixin,
     OffersFullSerializer,
     RatingsSerializer,
+    SalaryStatsSerializer,
     VacancyDetailSerializer,
     VacancyOffersSerializer,
     VacancysSerializer,
 )
-from services.common_utils import RequestHost, check_is_user_company
+from error_messages.errors import E
+from services.apiv1_utils import (
+    EXPORT_FORMATS,
+    ExportRow,
+    get_export_params,
+    get_export_response,
+    set_offer_resume_url,
+)
+from services.common_utils import QuerySetChain, RequestHost, check_is_user_company, get_protected_file_response
+from services.company_stats import get_company_dashboard, get_company_stats_period
 from services.home_app_mixins import UpdateSettingsMixin
+from services.salary_stats import filter_salary_stats
 from services.worksite_app_mixins import (
     AddOfferMixin,
     AddRatingMixin,
-    AddVacancyMixin,
     ApplyOfferMixin,
+    BulkAddVacancysMixin,
+    BulkApplyOffersMixin,
+    BulkWithdrawOffersMixin,
+    CheckPermissionsToSeeResume,
     CheckPermissionsToSeeVacancy,
     CheckPermissionsToSeeVacancyOffersAndDeleteVacancy,
     CompanyApplyedOffersMixin,
     DefaultPOSTReturn,
     DeleteVacancyMixin,
+    OfferSearchMixin,
     VacancyFilterMixin,
     VacancySearchMixin,
     WithdrawOfferMixin,
     get_company_ratings,
 )
-from worksite_app.models import Offer, Vacancy
+from worksite_app.models import ArchivedOffer, Offer, Vacancy
 
 
 class POSTStatuses(NamedTuple):
@@ -61,7 +85,111 @@ class POSTView(object):
         return Response(data, status=statuses.success if flag.status else statuses.error)
 
 
+class BulkView(object):
+    @staticmethod
+    def get_response(flag: DefaultPOSTReturn) -> Response:
+        """Ответ bulk-эндпоинта: 201 если обработаны все объекты, 207 если часть объектов с ошибками."""
+
+        if not flag.status:
+            data = CustomErrorSerializer({"detail": flag.error.message, "code": flag.error.code}).data
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        results = [
+            {
+                "index": result.index,
+                "id": result.id,
+                "detail": result.error.message if result.error else None,
+                "code": result.error.code if result.error else None,
+            }
+            for result in flag.status
+        ]
+        has_errors = any(result.error for result in flag.status)
+        return Response(
+            BulkResultSerializer({"results": results}).data,
+            status=status.HTTP_207_MULTI_STATUS if has_errors else status.HTTP_201_CREATED,
+        )
+
+    @staticmethod
+    def get_ids(request: Request) -> Optional[List]:
+        return request.data.get("ids", None) if isinstance(request.data, dict) else None
+
+
+BULK_RESPONSES = {
+    status.HTTP_201_CREATED: BulkResultSerializer,
+    status.HTTP_207_MULTI_STATUS: BulkResultSerializer,
+    status.HTTP_400_BAD_REQUEST: CustomErrorSerializer,
+}
+
+
+class ExportView(object):
+    @staticmethod
+    def get_response(
+        request: Request,
+        queryset: QuerySet,
+        fields: Tuple[str, ...],
+        filename: str,
+        prepare_row: Optional[Callable[[ExportRow], ExportRow]] = None,
+    ) -> Response | StreamingHttpResponse:
+        params = get_export_params(request.query_params)
+        if isinstance(params, E):
+            data = CustomErrorSerializer({"detail": params.message, "code": params.code}).data
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return get_export_response(queryset, fields, filename, params, prepare_row)
+
+
+EXPORT_PARAMETERS = [
+    OpenApiParameter(name="output", type=str, enum=tuple(EXPORT_FORMATS), description="Формат выгрузки."),
+    OpenApiParameter(name="compress", type=str, enum=("gzip",), description="Сжатие выгрузки на лету."),
+]
+EXPORT_RESPONSES = {
+    **{(status.HTTP_200_OK, f.content_type): OpenApiTypes.BINARY for f in EXPORT_FORMATS.values()},
+    (status.HTTP_200_OK, "application/gzip"): OpenApiTypes.BINARY,
+    status.HTTP_400_BAD_REQUEST: CustomErrorSerializer,
+    status.HTTP_403_FORBIDDEN: DefaultErrorSerializer,
+}
+
+
+class DynamicFieldsView(object):
+    """Выбор полей ответа GET параметрами fields и expand для сериализаторов с DynamicFieldsMixin."""
+
+    def get_selected_fields(self, serializer_class: Optional[Type[DynamicFieldsMixin]] = None) -> Tuple[str, ...]:
+        serializer_class = serializer_class or self.get_serializer_class()
+        fields = serializer_class.get_selected_fields(self.request.query_params)
+        if isinstance(fields, E):
+            raise ValidationError(CustomErrorSerializer({"detail": fields.message, "code": fields.code}).data)
+        return fields
+
+    def get_serializer_context(self) -> Dict:
+        return super().get_serializer_context() | {"fields": self.get_selected_fields()}
+
+
+def get_fields_parameters(serializer_class: Type[DynamicFieldsMixin]) -> List[OpenApiParameter]:
+    parameters = [
+        OpenApiParameter(
+            name="fields",
+            type=str,
+            many=True,
+            explode=False,
+            enum=serializer_class.Meta.fields,
+            description="Поля ответа через запятую (по умолчанию все, кроме полей из expand).",
+        )
+    ]
+    if serializer_class.expandable_fields:
+        parameters.append(
+            OpenApiParameter(
+                name="expand",
+                type=str,
+                many=True,
+                explode=False,
+                enum=serializer_class.expandable_fields,
+                description="Дополнительные поля ответа через запятую.",
+            )
+        )
+    return parameters
+
+
+@extend_schema_view(list=extend_schema(parameters=get_fields_parameters(VacancysSerializer)))
 class VacancyViewSet(
+    DynamicFieldsView,
     GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -70,15 +198,16 @@ class VacancyViewSet(
     VacancyFilterMixin,
     VacancySearchMixin,
     DeleteVacancyMixin,
-    AddVacancyMixin,
+    BulkAddVacancysMixin,
 ):
-    """Вьюсет для отображения всех, одной, удаления, добавления вакансий на сайте."""
+    """Вьюсет для отображения всех, одной, удаления, добавления (в том числе пачкой) вакансий на сайте."""
 
     request_host = RequestHost.APIVIEW
 
     serializer_class = VacancysSerializer
     serializer_detail_class = validation_class = VacancyDetailSerializer
     lookup_url_kwarg = "ids"
+    cursor_ordering = ("-time_added", "-id")
     permission_classes = (IsAuthenticatedCompanyOrReadOnly,)
 
     def get_queryset(self):
@@ -87,17 +216,20 @@ class VacancyViewSet(
         filter_kwargs = self.filter(self.request.query_params, company, (not self.request.user == company))
         search_query = self.search(self.request.query_params)
         queryset = Vacancy.objects.filter(**filter_kwargs).filter(search_query)
-        queryset = self.get_serializer_class().setup_eager_loading(queryset)
+        queryset = self.get_serializer_class().setup_eager_loading(queryset, self.get_selected_fields())
         return queryset
 
     @extend_schema(
-        responses={status.HTTP_200_OK: serializer_detail_class, status.HTTP_404_NOT_FOUND: DefaultErrorSerializer}
+        responses={status.HTTP_200_OK: serializer_detail_class, status.HTTP_404_NOT_FOUND: DefaultErrorSerializer},
+        parameters=get_fields_parameters(serializer_detail_class),
     )
     def retrieve(self, request: Request, *args, **kwargs) -> Response:
         """Получение конктретной вакансии по ее id."""
 
-        vacancy = CheckPermissionsToSeeVacancy.check_perms(request, self.kwargs[self.lookup_url_kwarg])
-        return Response(self.serializer_detail_class(vacancy, context={"request": request}).data)
+        fields = self.get_selected_fields(self.serializer_detail_class)
+        detail = CheckPermissionsToSeeVacancy.load(request, self.kwargs[self.lookup_url_kwarg])
+        context = {"request": request, "user_timezone": detail.viewer_timezone, "fields": fields}
+        return Response(self.serializer_detail_class(detail.vacancy, context=context).data)
 
     @extend_schema(
         responses={
@@ -122,8 +254,18 @@ class VacancyViewSet(
         flag = self.add_vacancy(request.data, request.user)
         return POSTView.get_response(flag)
 
+    @extend_schema(request=VacancyDetailSerializer(many=True), responses=BULK_RESPONSES)
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request: Request, *args, **kwargs) -> Response:
+        """Создание пачки вакансий одним запросом (не более API_BULK_MAX_ITEMS)."""
+
+        flag = self.add_vacancys(request.data, request.user)
+        return BulkView.get_response(flag)
 
+
+@extend_schema_view(list=extend_schema(parameters=get_fields_parameters(OffersFullSerializer)))
 class ApplicantOffersViewSet(
+    DynamicFieldsView,
     GenericViewSet,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -131,16 +273,28 @@ class ApplicantOffersViewSet(
     mixins.RetrieveModelMixin,
     AddOfferMixin,
     WithdrawOfferMixin,
+    BulkWithdrawOffersMixin,
 ):
     """Вьюсет для отображения всех, одной, добавления, удаления предложений на вакансии со стороны соискателя."""
 
     serializer_class = validation_class = OffersFullSerializer
     lookup_url_kwarg = "ids"
+    cursor_ordering = ("-time_added", "-id")
     permission_classes = (IsAuthenticated, IsApplicant)
     request_host = RequestHost.APIVIEW
+    ratelimits = {"create": "offers"}
 
     def get_queryset(self):
-        return Offer.objects.filter(applicant=self.request.user, vacancy__deleted=False)
+        # сначала актуальные отклики, затем перенесенные в архив вместе с закрытыми вакансиями
+        fields = self.get_selected_fields()
+        return QuerySetChain(
+            *(
+                self.serializer_class.setup_eager_loading(
+                    model.objects.filter(applicant=self.request.user, vacancy__deleted=False), fields
+                )
+                for model in (Offer, ArchivedOffer)
+            )
+        )
 
     @extend_schema(
         responses={
@@ -170,19 +324,57 @@ class ApplicantOffersViewSet(
         self.withdraw_offer(request, self.kwargs[self.lookup_url_kwarg])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @extend_schema(responses={status.HTTP_200_OK: serializer_class, status.HTTP_404_NOT_FOUND: DefaultErrorSerializer})
+    @extend_schema(request=BulkIdsSerializer, responses=BULK_RESPONSES)
+    @action(detail=False, methods=["post"], url_path="withdraw")
+    def bulk_withdraw(self, request: Request, *args, **kwargs) -> Response:
+        """Отзыв пачки откликов на вакансии по их id."""
+
+        flag = self.withdraw_offers(request, BulkView.get_ids(request))
+        return BulkView.get_response(flag)
+
+    @extend_schema(
+        responses={status.HTTP_200_OK: serializer_class, status.HTTP_404_NOT_FOUND: DefaultErrorSerializer},
+        parameters=get_fields_parameters(serializer_class),
+    )
     def retrieve(self, request: Request, *args, **kwargs) -> Response:
         """Получение оффера соискателя."""
 
-        offer = get_object_or_404(Offer, pk=self.kwargs[self.lookup_url_kwarg])
+        fields = self.get_selected_fields()
+        # сначала среди актуальных откликов, затем среди перенесенных в архив
+        for model in (Offer, ArchivedOffer):
+            queryset = model.objects.filter(applicant=request.user, pk=self.kwargs[self.lookup_url_kwarg])
+            offer = self.serializer_class.setup_eager_loading(queryset, fields).first()
+            if offer is not None:
+                break
+        else:
+            raise Http404
         return Response(
-            self.get_serializer_class()(instance=offer, context={"request": request}).data, status=status.HTTP_200_OK
+            self.get_serializer_class()(instance=offer, context={"request": request, "fields": fields}).data,
+            status=status.HTTP_200_OK,
         )
 
 
+class OfferResumeAPIView(APIView, CheckPermissionsToSeeResume):
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        responses={
+            (status.HTTP_200_OK, "application/octet-stream"): OpenApiTypes.BINARY,
+            status.HTTP_403_FORBIDDEN: DefaultErrorSerializer,
+            status.HTTP_404_NOT_FOUND: DefaultErrorSerializer,
+        }
+    )
+    def get(self, request: Request, ids: int) -> HttpResponse | FileResponse:
+        """Получение файла с резюме оффера (для соискателя-автора и компании, разместившей вакансию)."""
+
+        offer = self.check_perms(request, ids)
+        return get_protected_file_response(offer.resume)
+
+
 class UpdateSettingsAPIView(APIView, UpdateSettingsMixin):
     request_host = RequestHost.APIVIEW
     permission_classes = (IsAuthenticated,)
+    ratelimits = {"post": "settings"}
 
     @extend_schema(
         request={"Соискатель": ApplicantSettingsSerializer, "Компания": CompanySettingsSerializer},
@@ -205,14 +397,16 @@ class UpdateSettingsAPIView(APIView, UpdateSettingsMixin):
             status.HTTP_200_OK: RatingsSerializer,
             status.HTTP_404_NOT_FOUND: DefaultErrorSerializer,
             status.HTTP_400_BAD_REQUEST: CustomErrorSerializer,
-        }
+        },
+        parameters=get_fields_parameters(RatingsSerializer),
     )
 )
-class GetCompanyRatingsAPIView(ListAPIView):
+class GetCompanyRatingsAPIView(DynamicFieldsView, ListAPIView):
     """Получение отзывов на конкретную компанию по ее username."""
 
     serializer_class = validation_class = RatingsSerializer
     lookup_url_kwarg = "uname"
+    cursor_ordering = ("-time_added", "-id")
 
     def get_queryset(self):
         company = get_object_or_404(User, username=self.kwargs[self.lookup_url_kwarg])
@@ -221,18 +415,23 @@ class GetCompanyRatingsAPIView(ListAPIView):
                 CustomErrorSerializer(data={"detail": "Неверный username компании.", "code": "INVALID_USERNAME"}).data,
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        return get_company_ratings(company).prefetch_related("applicant")
+        return self.serializer_class.setup_eager_loading(get_company_ratings(company), self.get_selected_fields())
 
 
-class GetCompanyDetailAPIView(APIView):
+class GetCompanyDetailAPIView(DynamicFieldsView, APIView):
     serializer_class = CompanyDetailSerializer
 
-    @extend_schema(responses={status.HTTP_200_OK: serializer_class, status.HTTP_404_NOT_FOUND: DefaultErrorSerializer})
+    @extend_schema(
+        responses={status.HTTP_200_OK: serializer_class, status.HTTP_404_NOT_FOUND: DefaultErrorSerializer},
+        parameters=get_fields_parameters(serializer_class),
+    )
     def get(self, request: Request, uname: str) -> Response:
         """Получение детальной информации о конктретной компании."""
 
-        user = get_object_or_404(User, username=uname)
-        return Response(self.serializer_class(user, context={"request": request}).data, status=status.HTTP_200_OK)
+        fields = self.get_selected_fields(self.serializer_class)
+        user = get_object_or_404(self.serializer_class.setup_eager_loading(User.objects.all(), fields), username=uname)
+        context = {"request": request, "fields": fields}
+        return Response(self.serializer_class(user, context=context).data, status=status.HTTP_200_OK)
 
 
 @extend_schema_view(
@@ -241,10 +440,17 @@ class GetCompanyDetailAPIView(APIView):
             status.HTTP_200_OK: VacancyOffersSerializer,
             status.HTTP_403_FORBIDDEN: DefaultErrorSerializer,
             status.HTTP_404_NOT_FOUND: DefaultErrorSerializer,
-        }
+        },
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                type=str,
+                description='Поиск по тексту резюме: операторы AND, OR, NOT, скобки и "фразы".',
+            )
+        ],
     )
 )
-class GetVacancyOffersAPIView(ListAPIView, CheckPermissionsToSeeVacancyOffersAndDeleteVacancy):
+class GetVacancyOffersAPIView(ListAPIView, CheckPermissionsToSeeVacancyOffersAndDeleteVacancy, OfferSearchMixin):
     """Получение всех откликов на вакансию по ее id."""
 
     serializer_class = VacancyOffersSerializer
@@ -252,13 +458,15 @@ class GetVacancyOffersAPIView(ListAPIView, CheckPermissionsToSeeVacancyOffersAnd
 
     def get_queryset(self):
         vacancy = self.check_perms(self.request, self.kwargs[self.lookup_url_kwarg])
-        return Offer.objects.filter(vacancy=vacancy, withdrawn=False)
+        queryset = Offer.objects.filter(vacancy=vacancy, withdrawn=False).defer("resume_search_vector")
+        return self.search_offers(queryset, self.request.query_params)
 
 
 class AddRatingAPIView(APIView, AddRatingMixin):
     permission_classes = (IsAuthenticated,)
     serializer_class = validation_class = RatingsSerializer
     request_host = RequestHost.APIVIEW
+    ratelimits = {"post": "ratings"}
 
     @extend_schema(
         responses={
@@ -289,11 +497,118 @@ class ApplyOfferAPIView(APIView, ApplyOfferMixin):
         return Response(status=status.HTTP_201_CREATED)
 
 
+class BulkApplyOffersAPIView(APIView, BulkApplyOffersMixin):
+    permission_classes = (IsAuthenticated, IsCompany)
+
+    @extend_schema(request=BulkIdsSerializer, responses=BULK_RESPONSES)
+    def post(self, request: Request) -> Response:
+        """Принятие пачки офферов от соискателей по их id."""
+
+        flag = self.apply_offers(request, BulkView.get_ids(request))
+        return BulkView.get_response(flag)
+
+
+class ExportCompanyVacancysAPIView(APIView):
+    permission_classes = (IsAuthenticated, IsCompany)
+    fields = "id", "name", "money", "experience", "city", "skills", "time_added", "archived", "offers_count"
+
+    @extend_schema(parameters=EXPORT_PARAMETERS, responses=EXPORT_RESPONSES)
+    def get(self, request: Request) -> Response | StreamingHttpResponse:
+        """Потоковая выгрузка всех вакансий компании в CSV или NDJSON."""
+
+        queryset = Vacancy.objects.filter(company=request.user, deleted=False).order_by("pk")
+        return ExportView.get_response(request, queryset, self.fields, f"vacancys_{request.user.username}")
+
+
+class ExportCompanyApplyedOffersAPIView(APIView, CompanyApplyedOffersMixin):
+    permission_classes = (IsAuthenticated, IsCompany)
+    fields = (
+        "id",
+        "vacancy_id",
+        "vacancy__name",
+        "applicant__username",
+        "resume",
+        "resume_text",
+        "time_added",
+        "time_applyed",
+    )
+
+    @extend_schema(parameters=EXPORT_PARAMETERS, responses=EXPORT_RESPONSES)
+    def get(self, request: Request) -> Response | StreamingHttpResponse:
+        """Потоковая выгрузка всех принятых компанией офферов в CSV или NDJSON."""
+
+        queryset = self.get_company_applyed_offers(request.user, False)
+        filename = f"applyed_offers_{request.user.username}"
+        return ExportView.get_response(request, queryset, self.fields, filename, set_offer_resume_url)
+
+
+class ExportVacancyOffersAPIView(APIView, CheckPermissionsToSeeVacancyOffersAndDeleteVacancy):
+    permission_classes = (IsAuthenticated,)
+    fields = "id", "applicant__username", "resume", "resume_text", "time_added"
+
+    @extend_schema(parameters=EXPORT_PARAMETERS, responses=EXPORT_RESPONSES)
+    def get(self, request: Request, ids: int) -> Response | StreamingHttpResponse:
+        """Потоковая выгрузка всех откликов на вакансию в CSV или NDJSON."""
+
+        vacancy = self.check_perms(request, ids)
+        queryset = Offer.objects.filter(vacancy=vacancy, withdrawn=False).order_by("pk")
+        return ExportView.get_response(request, queryset, self.fields, f"offers_{ids}", set_offer_resume_url)
+
+
 class CompanyApplyedOffersAPIView(ListAPIView, CompanyApplyedOffersMixin):
     """Получение принятых компанией офферов."""
 
     serializer_class = CompanyApplyedOffersSerializer
     permission_classes = (IsAuthenticated, IsCompany)
+    cursor_ordering = ("-time_applyed", "-id")
 
     def get_queryset(self):
         return self.get_company_applyed_offers(self.request.user, False)
+
+
+@extend_schema_view(
+    get=extend_schema(
+        parameters=[
+            OpenApiParameter(name="city", type=str, description="Город."),
+            OpenApiParameter(
+                name="experience",
+                type=str,
+                description="Требуемый опыт (0-4) или all - статистика по всем уровням опыта города.",
+            ),
+        ],
+    )
+)
+class SalaryStatsAPIView(ListAPIView):
+    """Статистика зарплат открытых вакансий по городам и опыту: количество, процентили и гистограмма."""
+
+    serializer_class = SalaryStatsSerializer
+
+    def get_queryset(self):
+        return filter_salary_stats(self.request.query_params)
+
+
+class CompanyStatsAPIView(APIView):
+    permission_classes = (IsAuthenticated, IsCompany)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name="date_from", type=OpenApiTypes.DATE, description="Первый день периода."),
+            OpenApiParameter(
+                name="date_to", type=OpenApiTypes.DATE, description="Последний день (по умолчанию сегодня)."
+            ),
+        ],
+        responses={
+            status.HTTP_200_OK: CompanyStatsSerializer,
+            status.HTTP_400_BAD_REQUEST: CustomErrorSerializer,
+            status.HTTP_403_FORBIDDEN: DefaultErrorSerializer,
+        },
+    )
+    def get(self, request: Request) -> Response:
+        """Статистика откликов на вакансии компании по дням: отклики, время до принятия, доля отозванных."""
+
+        period = get_company_stats_period(request.query_params)
+        if isinstance(period, E):
+            data = CustomErrorSerializer({"detail": period.message, "code": period.code}).data
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        dashboard = get_company_dashboard(request.user, period)
+        return Response(CompanyStatsSerializer(dashboard).data, status=status.HTTP_200_OK)
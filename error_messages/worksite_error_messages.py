@@ -9,14 +9,47 @@ class VacancyErrors(BaseErrorsEnum):
     INVALID_EXPERIENCE = "Неверный требуемый опыт работы."
     INVALID_CITY = "Неверный город."
     INVALID_SKILLS = "Неверные навыки."
+    INVALID_STATE = "Вакансия уже закрыта."
 
 
 class OfferErrors(BaseErrorsEnum):
     INVALID_RESUME = "Неверный файл с резюме."
     INVALID_RESUME_TEXT = "Неверная длина письменного резюме."
     INVALID_VACANCY = "Резюме должно быть в одном поле."
+    INVALID_ID = "Неверный id отклика."
+    INVALID_STATE = "Отклик уже отозван или принят."
 
 
 class RatingErrors(BaseErrorsEnum):
     INVALID_RATING = "Неверная оценка компании."
     INVALID_COMMENT = "Неверная длина комментария."
+
+
+class BulkErrors(BaseErrorsEnum):
+    INVALID_ITEMS = "Ожидается непустой список объектов."
+    INVALID_SIZE = "Слишком много объектов в одном запросе."
+    INVALID_ITEM = "Неверный объект."
+
+
+class ExportErrors(BaseErrorsEnum):
+    INVALID_OUTPUT = "Неверный формат выгрузки (csv или ndjson)."
+    INVALID_COMPRESS = "Неверный тип сжатия выгрузки (gzip)."
+
+
+class FieldsErrors(BaseErrorsEnum):
+    INVALID_FIELDS = "Неизвестное поле в параметре fields."
+    INVALID_EXPAND = "Неизвестное поле в параметре expand."
+
+
+class PaginationErrors(BaseErrorsEnum):
+    INVALID_CURSOR = "Неверный курсор страницы."
+
+
+class SavedSearchErrors(BaseErrorsEnum):
+    INVALID_PARAMS = "Нельзя сохранить поиск без условий."
+    INVALID_SEARCH = "Слишком длинный поисковый запрос."
+    INVALID_COUNT = "Сохранено максимальное количество поисков."
+
+
+class CompanyStatsErrors(BaseErrorsEnum):
+    INVALID_PERIOD = "Неверный период статистики (даты в формате ГГГГ-ММ-ДД, не длиннее года)."
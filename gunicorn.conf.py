@@ -1,6 +1,24 @@
+import os
+from typing import Literal
+
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.base import Worker
+from prometheus_client import multiprocess
+
+from services.metrics import clear_multiprocess_dir
+
 bind = "0.0.0.0:8080"
 workers = 5
 accesslog = "/django-simple-worksite/log/access.log"
 errorlog = "/django-simple-worksite/log/error.log"
 capture_output = True
 loglevel = "info"
+
+
+def on_starting(server: Arbiter) -> Literal[None]:
+    clear_multiprocess_dir()
+
+
+def child_exit(server: Arbiter, worker: Worker) -> Literal[None]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR", None):
+        multiprocess.mark_process_dead(worker.pid)
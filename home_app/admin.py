@@ -1,6 +1,61 @@
+from typing import List, Optional
+
 from django.contrib import admin
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import URLPattern, path, reverse
+from django.utils.html import format_html
 
-from home_app.models import ApplicantSettings, CompanySettings
+from home_app.models import ApplicantSettings, CompanySettings, RequestProfile
 
 admin.site.register(CompanySettings)
 admin.site.register(ApplicantSettings)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "time_added",
+        "method",
+        "path",
+        "view_name",
+        "status",
+        "duration_ms",
+        "sql_queries",
+        "sql_ms",
+        "cache_calls",
+        "profiler",
+        "user",
+        "download",
+    )
+    list_filter = ("profiler", "view_name")
+    search_fields = ("path",)
+    exclude = ("profile",)
+    readonly_fields = [field.name for field in RequestProfile._meta.fields if field.name != "profile"] + ["download"]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj: Optional[RequestProfile] = None) -> bool:
+        return False
+
+    def get_urls(self) -> List[URLPattern]:
+        download = path(
+            "<int:pk>/download/",
+            self.admin_site.admin_view(self.download_view),
+            name="home_app_requestprofile_download",
+        )
+        return [download, *super().get_urls()]
+
+    @admin.display(description="профиль")
+    def download(self, obj: RequestProfile) -> str:
+        url = reverse("admin:home_app_requestprofile_download", args=(obj.pk,))
+        return format_html('<a href="{}">{}</a>', url, obj.profile_filename)
+
+    def download_view(self, request: HttpRequest, pk: int) -> HttpResponse:
+        obj = get_object_or_404(RequestProfile, pk=pk)
+        if not self.has_view_permission(request, obj):
+            return HttpResponse(status=403)
+        response = HttpResponse(bytes(obj.profile), content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="{obj.profile_filename}"'
+        return response
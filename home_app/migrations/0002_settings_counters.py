@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-19 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("home_app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="applicantsettings",
+            name="offers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="companysettings",
+            name="vacancys_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
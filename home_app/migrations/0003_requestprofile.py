@@ -0,0 +1,50 @@
+# Generated by Django 5.0 on 2026-10-19 05:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("home_app", "0002_settings_counters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "profiler",
+                    models.CharField(
+                        choices=[
+                            ("sample", "сэмплирующий (стеки в формате folded для flamegraph.pl и speedscope)"),
+                            ("cprofile", "детерминированный (cProfile, файл для pstats и snakeviz)"),
+                        ],
+                        max_length=8,
+                    ),
+                ),
+                ("method", models.CharField(max_length=8)),
+                ("path", models.CharField(max_length=2048)),
+                ("view_name", models.CharField(blank=True, default="", max_length=200)),
+                ("status", models.PositiveSmallIntegerField()),
+                ("duration_ms", models.FloatField()),
+                ("sql_queries", models.PositiveIntegerField(null=True)),
+                ("sql_ms", models.FloatField(null=True)),
+                ("cache_calls", models.JSONField(null=True)),
+                ("profile", models.BinaryField()),
+                ("time_added", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-time_added",),
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("home_app", "0003_requestprofile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companysettings",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
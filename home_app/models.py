@@ -22,6 +22,10 @@ class CompanySettings(models.Model):
     company_description = models.TextField(default="", validators=(MaxLengthValidator(5000), MinLengthValidator(64)))
     company_site = models.URLField(blank=True, default="")
     rating = models.FloatField(validators=(MinValueValidator(0), MaxValueValidator(5)), default=0)
+    # Денормализованный счетчик активных (не архивированных и не удаленных) вакансий компании.
+    vacancys_count = models.PositiveIntegerField(default=0, editable=False)
+    # Версия настроек для ключа кеша карточек вакансий компании, увеличивается при смене логотипа.
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return self.company.username
@@ -33,6 +37,42 @@ class ApplicantSettings(models.Model):
     applicant_avatar = models.ImageField(
         upload_to=applicant_avatar_path, default=settings.DEFAULT_APPLICANT_AVATAR_FILENAME
     )
+    # Денормализованный счетчик всех откликов соискателя.
+    offers_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.applicant.username
+
+
+class RequestProfile(models.Model):
+    """Модель профилей запросов, снятых по запросу staff пользователей (см. services.profiling)."""
+
+    SAMPLE, CPROFILE = "sample", "cprofile"
+    PROFILER_CHOICES = [
+        (SAMPLE, "сэмплирующий (стеки в формате folded для flamegraph.pl и speedscope)"),
+        (CPROFILE, "детерминированный (cProfile, файл для pstats и snakeviz)"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    profiler = models.CharField(max_length=8, choices=PROFILER_CHOICES)
+    method = models.CharField(max_length=8)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=200, blank=True, default="")
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    # Счетчики из services.instrumentation (NULL, если инструментирование запросов выключено)
+    sql_queries = models.PositiveIntegerField(null=True)
+    sql_ms = models.FloatField(null=True)
+    cache_calls = models.JSONField(null=True)
+    profile = models.BinaryField()
+    time_added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-time_added",)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    @property
+    def profile_filename(self) -> str:
+        return f"profile-{self.pk}.{'folded' if self.profiler == self.SAMPLE else 'prof'}"
@@ -10,6 +10,7 @@ from django.views.generic import View
 from home_app.forms import ApplicantRegisterForm, AuthForm, CompanyRegisterForm
 from services.common_utils import check_is_user_auth, check_is_user_company
 from services.home_app_utils import RegisterViewUtils, SettingsViewUtils
+from services.ratelimit import RateLimitMixin
 
 
 def get_register_page(request: HttpRequest) -> bool:
@@ -70,7 +71,9 @@ class LogoutView(LoginRequiredMixin, View):
         return redirect(f'{reverse("home_app:home")}?show_logout=True')
 
 
-class RegisterView(View):
+class RegisterView(RateLimitMixin, View):
+    ratelimits = {"post": "register"}
+
     def get(
         self, request: HttpRequest, flag_error: Optional[bool] = False, form: Optional[Mapping] = None
     ) -> HttpResponse:
@@ -90,8 +93,9 @@ class RegisterView(View):
         return RegisterViewUtils.register_view_utils(self, request, applicant=get_register_page(request))
 
 
-class SettingsView(LoginRequiredMixin, View):
+class SettingsView(LoginRequiredMixin, RateLimitMixin, View):
     login_url = reverse_lazy("home_app:auth")
+    ratelimits = {"post": "settings"}
 
     def get(
         self, request: HttpRequest, flag_success: Optional[bool] = False, flag_error: Optional[bool] = False
@@ -0,0 +1,164 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import QueryDict, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+
+from error_messages.errors import E
+from error_messages.worksite_error_messages import ExportErrors, FieldsErrors
+
+ExportRow = Dict[str, object]
+
+
+class ExportFormat(NamedTuple):
+    """Структура данных с параметрами формата выгрузки."""
+
+    content_type: str
+    extension: str
+    header: bool
+    writer: Callable[[Tuple[str, ...]], Callable[[ExportRow], str]]
+
+
+class ExportParams(NamedTuple):
+    """Структура данных с параметрами выгрузки, полученными из запроса."""
+
+    export_format: ExportFormat
+    compress: bool
+
+
+class _EchoBuffer(object):
+    """Буфер для csv.writer, который не копит строки, а сразу возвращает записанное."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _get_csv_writer(fields: Tuple[str, ...]) -> Callable[[ExportRow], str]:
+    writer = csv.writer(_EchoBuffer())
+    return lambda row: writer.writerow([_to_text(row[field]) for field in fields])
+
+
+def _get_ndjson_writer(fields: Tuple[str, ...]) -> Callable[[ExportRow], str]:
+    return lambda row: json.dumps({field: row[field] for field in fields}, ensure_ascii=False, default=_to_text) + "\n"
+
+
+def _to_text(value: object) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "csv": ExportFormat("text/csv", "csv", True, _get_csv_writer),
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", False, _get_ndjson_writer),
+}
+
+
+def get_export_params(params: Dict[str, str]) -> ExportParams | E:
+    """
+    Получение формата выгрузки из GET параметров output (csv или ndjson) и compress (gzip).
+    Параметр называется output, а не format, так как format уже занят DRF для выбора рендерера.
+    """
+
+    export_format = EXPORT_FORMATS.get(params.get("output", "csv"), None)
+    if export_format is None:
+        return ExportErrors["output"]
+    compress = params.get("compress", None)
+    if compress not in (None, "gzip"):
+        return ExportErrors["compress"]
+    return ExportParams(export_format, compress == "gzip")
+
+
+def get_selected_fields(params: QueryDict, fields: Tuple[str, ...], expandable: Tuple[str, ...]) -> Tuple[str, ...] | E:
+    """
+    Поля ответа API по GET параметрам fields (какие поля вернуть) и expand (какие из необязательных полей
+    expandable добавить), значения перечисляются через запятую. Без fields возвращаются все поля, кроме
+    необязательных. Поля возвращаются в порядке fields сериализатора.
+    """
+
+    requested, expand = _get_names(params, "fields"), _get_names(params, "expand")
+    if requested is not None and not requested <= set(fields):
+        return FieldsErrors["fields"]
+    if expand is not None and not expand <= set(expandable):
+        return FieldsErrors["expand"]
+    if requested is None:
+        requested = set(fields) - set(expandable)
+    return tuple(field for field in fields if field in requested or (expand and field in expand))
+
+
+def _get_names(params: QueryDict, name: str) -> Optional[FrozenSet[str]]:
+    if name not in params:
+        return None
+    names = frozenset(field.strip() for value in params.getlist(name) for field in value.split(",") if field.strip())
+    return names or None
+
+
+def _iter_lines(rows: Iterable[ExportRow], fields: Tuple[str, ...], export_format: ExportFormat) -> Iterator[str]:
+    write = export_format.writer(fields)
+    if export_format.header:
+        yield write(dict(zip(fields, fields)))
+    for row in rows:
+        yield write(row)
+
+
+def _iter_chunks(lines: Iterable[str], compress: bool) -> Iterator[bytes]:
+    """Склейка строк в блоки по EXPORT_STREAM_BUFFER_SIZE байт с необязательным сжатием gzip на лету."""
+
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 - формат gzip
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= settings.EXPORT_STREAM_BUFFER_SIZE:
+            chunk = b"".join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def set_offer_resume_url(row: ExportRow) -> ExportRow:
+    """Замена имени файла с резюме на ссылку для его скачивания через API."""
+
+    row["resume"] = reverse("offer_resume", kwargs={"ids": row["id"]}) if row["resume"] else None
+    return row
+
+
+def get_export_response(
+    queryset: QuerySet,
+    fields: Tuple[str, ...],
+    filename: str,
+    params: ExportParams,
+    prepare_row: Optional[Callable[[ExportRow], ExportRow]] = None,
+) -> StreamingHttpResponse:
+    """
+    Потоковая выгрузка QuerySet'а. Строки читаются серверным курсором пачками по EXPORT_CHUNK_SIZE,
+    поэтому расход памяти не зависит от количества строк.
+    """
+
+    rows: Iterable[ExportRow] = queryset.values(*fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    if prepare_row:
+        rows = map(prepare_row, rows)
+    lines = _iter_lines(rows, fields, params.export_format)
+    response = StreamingHttpResponse(
+        _iter_chunks(lines, params.compress),
+        content_type="application/gzip" if params.compress else params.export_format.content_type,
+    )
+    filename = f"{filename}.{params.export_format.extension}{'.gz' if params.compress else ''}"
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    response["X-Accel-Buffering"] = "no"  # nginx не должен буферизировать поток целиком
+    return response
@@ -1,12 +1,24 @@
-from typing import Any, Literal, NamedTuple, Optional, TypeAlias
+import io
+import mimetypes
+import os
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Literal, NamedTuple, Optional, Sequence, Type, TypeAlias
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser, User
 from django.core.cache import cache
-from django.http import HttpRequest
+from django.db import connection, models
+from django.db.models import F, QuerySet
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Greatest
+from django.http import FileResponse, HttpRequest, HttpResponse
+from django.utils.encoding import iri_to_uri
+from django.utils.http import content_disposition_header
 
 from error_messages.errors import E
 from home_app.models import ApplicantSettings, CompanySettings
+from services.metrics import CacheName, observe_cache_lookup
 
 UserSettings: TypeAlias = CompanySettings | ApplicantSettings
 
@@ -29,13 +41,69 @@ def check_is_user_company(user: User | AnonymousUser) -> bool:
         return False
 
 
+def get_user_settings_cache_name(user_pk: int) -> str:
+    return f"{user_pk}{settings.CACHE_NAMES_DELIMITER}{settings.USER_SETTINGS_CACHE_NAME}"
+
+
+def delete_user_settings_cache(*users_pks: int) -> Literal[None]:
+    """Сброс закешированных настроек пользователей (например, после изменения счетчиков в настройках)."""
+
+    cache.delete_many([get_user_settings_cache_name(pk) for pk in users_pks])
+
+
+def change_counter(queryset: QuerySet, field: str, delta: int) -> int:
+    """Атомарное изменение денормализованного счетчика через F() выражение (без ухода в минус)."""
+
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def change_counters(queryset: QuerySet, field: str, deltas: Dict[int, int], key: str = "pk") -> Literal[None]:
+    """Изменение счетчика у многих строк сразу: строки с одинаковым изменением обновляются одним запросом."""
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for value, delta in deltas.items():
+        groups[delta].append(value)
+    for delta, values in groups.items():
+        change_counter(queryset.filter(**{f"{key}__in": values}), field, delta)
+
+
+def insert_rows(model: Type[models.Model], columns: Sequence[str], rows: Iterable[Sequence]) -> Literal[None]:
+    """
+    Вставка готовых к записи в БД значений (после get_db_prep_save) в обход ORM. В PostgreSQL строки
+    передаются через COPY FROM STDIN в текстовом формате (быстрее INSERT на больших объемах).
+    """
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    quoted = ", ".join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write("\t".join(_to_copy_value(value) for value in row) + "\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table} ({quoted}) FROM STDIN", buffer)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({quoted}) VALUES ({placeholders})", list(rows))
+
+
+def _to_copy_value(value: object) -> str:
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    value = value.isoformat() if hasattr(value, "isoformat") else str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
 def get_user_settings(user: User | AnonymousUser | UserSettings) -> Literal[False] | UserSettings:
     if isinstance(user, (ApplicantSettings, CompanySettings)):
         return user
     if not user.is_authenticated:
         return False
-    cache_settings_name = f"{user.pk}{settings.CACHE_NAMES_DELIMITER}{settings.USER_SETTINGS_CACHE_NAME}"
+    cache_settings_name = get_user_settings_cache_name(user.pk)
     user_settings = cache.get(cache_settings_name)
+    observe_cache_lookup(CacheName.USER_SETTINGS, bool(user_settings))
     if not user_settings:
         if check_is_user_company(user):
             user_settings = CompanySettings.objects.select_related("company").get(company=user)
@@ -64,6 +132,66 @@ def get_path_to_crop_photo(path: str) -> str:
     return "/".join(splitted_path)
 
 
+def get_protected_file_response(file: FieldFile, as_attachment: bool = False) -> HttpResponse | FileResponse:
+    """
+    Ответ с файлом из защищенного хранилища. При USE_X_ACCEL_REDIRECT тело ответа пустое, а файл
+    (включая range-запросы) отдает nginx, не занимая воркер gunicorn на время передачи.
+    """
+
+    filename = os.path.basename(file.name)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if settings.USE_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = iri_to_uri(f"{settings.PROTECTED_MEDIA_URL}{file.name}")
+    else:
+        response = FileResponse(file.open("rb"), content_type=content_type)
+    response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+class QuerySetChain(object):
+    """
+    Несколько QuerySet'ов, идущих друг за другом, как одна последовательность (например, актуальные и
+    архивные записи). Поддерживает count() и срезы для пагинации DRF и values().iterator() для выгрузок.
+    """
+
+    def __init__(self, *querysets: QuerySet):
+        self.querysets = querysets
+        self._counts: Optional[List[int]] = None
+
+    def count(self) -> int:
+        return sum(self._get_counts())
+
+    def values(self, *fields: str) -> "QuerySetChain":
+        return QuerySetChain(*(queryset.values(*fields) for queryset in self.querysets))
+
+    def iterator(self, chunk_size: Optional[int] = None) -> Iterator:
+        return chain.from_iterable(queryset.iterator(chunk_size=chunk_size) for queryset in self.querysets)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self) -> Iterator:
+        return chain.from_iterable(self.querysets)
+
+    def __getitem__(self, item: slice) -> List:
+        start, stop = item.start or 0, item.stop
+        objects = []
+        for queryset, count in zip(self.querysets, self._get_counts()):
+            if stop is not None and stop <= 0:
+                break
+            if start < count:
+                objects.extend(queryset[start:stop])
+            start, stop = max(start - count, 0), (None if stop is None else stop - count)
+        return objects
+
+    def _get_counts(self) -> List[int]:
+        if self._counts is None:
+            self._counts = [queryset.count() for queryset in self.querysets]
+        return self._counts
+
+
 def get_error_field(request_host: RequestHost, v: Any) -> str:
     """Получение поля, которое связано с ошибкой в валидаторе."""
 
@@ -0,0 +1,212 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Q, QuerySet, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from error_messages.errors import E
+from error_messages.worksite_error_messages import CompanyStatsErrors
+from worksite_app.models import ArchivedOffer, CompanyDailyStats, Offer
+
+StatsKey = Tuple[int, date]  # (id вакансии, день)
+COUNTERS = "offers_count", "offers_withdrawn_count", "applyed_count", "withdrawn_count", "time_to_apply_sum"
+
+
+class Period(NamedTuple):
+    """Структура данных с периодом статистики, обе даты включаются."""
+
+    date_from: date
+    date_to: date
+
+
+class StatsRow(NamedTuple):
+    """Структура данных со статистикой откликов за период (по вакансии, дню или всей компании)."""
+
+    offers_count: int
+    applyed_count: int
+    withdrawn_count: int
+    time_to_apply: Optional[timedelta]  # среднее время до принятия отклика
+    # доля отозванных (на момент пересчета) среди откликов, поданных за период, поэтому не больше 1;
+    # withdrawn_count - отзывы, сделанные за период, в том числе откликов, поданных раньше
+    withdrawal_rate: Optional[float]
+
+    @classmethod
+    def from_sums(cls, sums: Dict) -> "StatsRow":
+        offers, applyed = sums["offers_count"] or 0, sums["applyed_count"] or 0
+        withdrawn, time_to_apply = sums["withdrawn_count"] or 0, sums["time_to_apply_sum"]
+        return cls(
+            offers,
+            applyed,
+            withdrawn,
+            time_to_apply / applyed if applyed and time_to_apply is not None else None,
+            round((sums["offers_withdrawn_count"] or 0) / offers, 4) if offers else None,
+        )
+
+
+class VacancyStats(NamedTuple):
+    id: int
+    name: str
+    stats: StatsRow
+
+
+class DayStats(NamedTuple):
+    date: date
+    stats: StatsRow
+
+
+class CompanyDashboard(NamedTuple):
+    period: Period
+    totals: StatsRow
+    vacancys: List[VacancyStats]  # по убыванию числа откликов
+    days: List[DayStats]
+
+
+# События откликов: поле времени события и счетчики статистики, которые оно увеличивает
+EVENTS = {
+    "time_added": {
+        "offers_count": Count("pk"),
+        "offers_withdrawn_count": Count("pk", filter=Q(withdrawal_counted=True)),
+    },
+    "time_applyed": {
+        "applyed_count": Count("pk"),
+        "time_to_apply_sum": Sum(ExpressionWrapper(F("time_applyed") - F("time_added"), output_field=DurationField())),
+    },
+    "time_withdrawn": {"withdrawn_count": Count("pk")},
+}
+
+
+def _get_bounds(period: Period) -> Tuple[datetime, datetime]:
+    start = timezone.make_aware(datetime.combine(period.date_from, time.min))
+    return start, timezone.make_aware(datetime.combine(period.date_to + timedelta(days=1), time.min))
+
+
+def _get_events(model: Type[Offer | ArchivedOffer], field: str, period: Period) -> QuerySet:
+    start, end = _get_bounds(period)
+    day = TruncDate(field, tzinfo=timezone.get_current_timezone())
+    return (
+        model.objects.filter(**{f"{field}__gte": start, f"{field}__lt": end})
+        .order_by()
+        .values("vacancy_id", "vacancy__company_id", "vacancy__name", day=day)
+        .annotate(**EVENTS[field])
+    )
+
+
+def get_daily_stats(period: Period) -> List[CompanyDailyStats]:
+    """Дневная статистика всех вакансий за период, посчитанная по откликам (и архивным откликам) в БД."""
+
+    stats: Dict[StatsKey, CompanyDailyStats] = {}
+    for model in (Offer, ArchivedOffer):
+        for field in EVENTS:
+            for row in _get_events(model, field, period):
+                key = (row["vacancy_id"], row["day"])
+                if key not in stats:
+                    stats[key] = CompanyDailyStats(
+                        company_id=row["vacancy__company_id"],
+                        vacancy_id=row["vacancy_id"],
+                        vacancy_name=row["vacancy__name"],
+                        date=row["day"],
+                    )
+                for counter in EVENTS[field]:
+                    setattr(stats[key], counter, getattr(stats[key], counter) + row[counter])
+    return list(stats.values())
+
+
+def update_company_stats(period: Optional[Period] = None) -> Dict[str, int]:
+    """
+    Пересчет дневной статистики компаний за период (по умолчанию - последние COMPANY_STATS_REFRESH_DAYS дней).
+    Строки дней периода заменяются целиком пачками по COMPANY_STATS_BATCH_DAYS дней, поэтому пересчет можно
+    повторять. Более ранние дни не пересчитываются (их отклики могли быть удалены по сроку хранения): отзывы
+    откликов, поданных до периода, только увеличивают offers_withdrawn_count дня отклика, каждый один раз.
+    """
+
+    if period is None:
+        today = timezone.localdate()
+        period = Period(today - timedelta(days=settings.COMPANY_STATS_REFRESH_DAYS - 1), today)
+    report = {"days": 0, "rows": 0, "withdrawals": 0}
+    for batch in _split_period(period):
+        start, end = _get_bounds(batch)
+        with transaction.atomic():
+            # отзывы, учтенные пересчетом дня отклика, не должны учитываться повторно как ранние
+            for model in (Offer, ArchivedOffer):
+                model.objects.filter(
+                    time_added__gte=start, time_added__lt=end, withdrawn=True, withdrawal_counted=False
+                ).update(withdrawal_counted=True)
+            stats = get_daily_stats(batch)
+            CompanyDailyStats.objects.filter(date__range=batch).delete()
+            CompanyDailyStats.objects.bulk_create(stats)
+        report["days"] += (batch.date_to - batch.date_from).days + 1
+        report["rows"] += len(stats)
+    report["withdrawals"] = _add_earlier_withdrawals(_get_bounds(period)[0])
+    return report
+
+
+def _split_period(period: Period) -> Iterator[Period]:
+    start = period.date_from
+    while start <= period.date_to:
+        batch = Period(start, min(start + timedelta(days=settings.COMPANY_STATS_BATCH_DAYS - 1), period.date_to))
+        yield batch
+        start = batch.date_to + timedelta(days=1)
+
+
+def _add_earlier_withdrawals(start: datetime) -> int:
+    """
+    Учет еще не учтенных отзывов откликов, поданных до start, в offers_withdrawn_count строк дней отклика.
+    Строки дней, которых нет в статистике, не создаются.
+    """
+
+    day = TruncDate("time_added", tzinfo=timezone.get_current_timezone())
+    count = 0
+    for model in (Offer, ArchivedOffer):
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    model.objects.select_for_update()
+                    .filter(withdrawn=True, withdrawal_counted=False, time_added__lt=start)
+                    .order_by()
+                    .values_list("pk", flat=True)[: settings.COMPANY_STATS_BATCH_OFFERS]
+                )
+                if not ids:
+                    break
+                offers = model.objects.filter(pk__in=ids).order_by()
+                for row in offers.values("vacancy_id", day=day).annotate(withdrawn=Count("pk")):
+                    CompanyDailyStats.objects.filter(vacancy_id=row["vacancy_id"], date=row["day"]).update(
+                        offers_withdrawn_count=F("offers_withdrawn_count") + row["withdrawn"]
+                    )
+                offers.update(withdrawal_counted=True)
+            count += len(ids)
+    return count
+
+
+def get_company_stats_period(params: Dict[str, str]) -> Period | E:
+    """Период статистики из GET параметров date_from и date_to (по умолчанию - последние дни до сегодня)."""
+
+    try:
+        date_to = date.fromisoformat(params["date_to"]) if params.get("date_to", None) else timezone.localdate()
+        default_from = date_to - timedelta(days=settings.COMPANY_STATS_DEFAULT_DAYS - 1)
+        date_from = date.fromisoformat(params["date_from"]) if params.get("date_from", None) else default_from
+    except ValueError:
+        return CompanyStatsErrors["period"]
+    if not timedelta(0) <= date_to - date_from < timedelta(days=settings.COMPANY_STATS_MAX_DAYS):
+        return CompanyStatsErrors["period"]
+    return Period(date_from, date_to)
+
+
+def get_company_dashboard(company: User, period: Period) -> CompanyDashboard:
+    """Статистика компании за период, читается только из дневной статистики."""
+
+    stats = CompanyDailyStats.objects.filter(company=company, date__range=period).order_by()
+    sums = {counter: Sum(counter) for counter in COUNTERS}
+    vacancys = stats.values("vacancy_id").annotate(name=Max("vacancy_name"), **sums).order_by("-offers_count")
+    days = {row["date"]: StatsRow.from_sums(row) for row in stats.values("date").annotate(**sums)}
+    empty = StatsRow.from_sums(dict.fromkeys(COUNTERS))
+    dates = (period.date_from + timedelta(days=i) for i in range((period.date_to - period.date_from).days + 1))
+    return CompanyDashboard(
+        period,
+        StatsRow.from_sums(stats.aggregate(**sums)),
+        [VacancyStats(row["vacancy_id"], row["name"], StatsRow.from_sums(row)) for row in vacancys],
+        [DayStats(day, days.get(day, empty)) for day in dates],
+    )
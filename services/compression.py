@@ -0,0 +1,66 @@
+import gzip
+import re
+from typing import Callable, Literal, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него ответы сжимаются только gzip
+    brotli = None
+
+ACCEPT_ENCODING_RE = re.compile(r"(?:^|,)\s*(br|gzip)\s*(?:;\s*q=(\d(?:\.\d+)?))?\s*(?=,|$)")
+
+
+def get_encoding(accept_encoding: str) -> Optional[Literal["br", "gzip"]]:
+    """Лучшее из поддерживаемых клиентом сжатий (brotli, если доступен, иначе gzip) или None."""
+
+    accepted = {
+        encoding for encoding, quality in ACCEPT_ENCODING_RE.findall(accept_encoding.lower()) if float(quality or 1)
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    return "gzip" if "gzip" in accepted else None
+
+
+class CompressionMiddleware(object):
+    """
+    Middleware, сжимающий ответы API (пути из COMPRESSION_PATH_PREFIXES) brotli или gzip, если их тело не
+    меньше COMPRESSION_MIN_SIZE байт. Потоковые ответы (выгрузки, файлы резюме) не сжимаются: у выгрузок
+    есть свое сжатие (параметр compress), а файлы резюме обычно уже сжаты.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        if not request.path.startswith(settings.COMPRESSION_PATH_PREFIXES):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        encoding = get_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if encoding == "br":
+            content = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            content = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = encoding
+        # тело изменилось, поэтому сильный ETag становится слабым (как в django.middleware.gzip)
+        etag = response.get("ETag", "")
+        if etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -4,6 +4,7 @@ from typing import Any, Dict, Literal, Tuple, Type, Union
 import pytz
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.db.models import F
 from django.http.request import HttpRequest
 from rest_framework.request import Request
 
@@ -15,6 +16,7 @@ from services.common_utils import (
     DefaultPOSTReturn,
     RequestHost,
     check_is_user_company,
+    delete_user_settings_cache,
     get_error_field,
     get_user_settings,
 )
@@ -100,14 +102,14 @@ class UpdateSettingsMixin(DataValidationMixin):
             v, is_valid, data = self.validate_received_data(data, {}, settings_, validation_class=validation_class)
             if not is_valid:
                 return DefaultPOSTReturn(False, SettingsErrors[get_error_field(self.request_host, v)])
-            v.save()
+            self.save_fields(v, (self.Fields.DESCRIPTION, self.Fields.SITE))
         return DefaultPOSTReturn(True)
 
     def _set_timezone(self, timezone: str, settings_: ApplicantSettings | CompanySettings) -> Literal[None, True]:
         if timezone not in pytz.common_timezones_set:
             return True
         settings_.timezone = timezone
-        settings_.save()
+        settings_.save(update_fields=(self.Fields.TIMEZONE,))
         return
 
     def _save_uploaded_photo(
@@ -123,8 +125,14 @@ class UpdateSettingsMixin(DataValidationMixin):
                 os.remove(os.path.join(settings.BASE_DIR, path_to_photo_dir, file))
         except FileNotFoundError:
             pass
-        validator_object.save()
-        if not company:
+        self.save_fields(validator_object, (self.Fields.COMPANY_LOGO if company else self.Fields.APPLICANT_AVATAR,))
+        if company:
+            # новый логотип должен появиться в закешированных карточках вакансий компании. Версия перечитывается,
+            # чтобы следующие сохранения настроек в этом запросе не вернули старое значение
+            CompanySettings.objects.filter(pk=user_settings.pk).update(version=F("version") + 1)
+            user_settings.refresh_from_db(fields=["version"])
+            delete_user_settings_cache(user_settings.company_id)
+        else:
             make_center_crop.delay(user_settings.applicant_avatar.path)
 
     def get_data_to_serializer(self, data: Dict, files: Dict) -> Dict:
@@ -3,15 +3,13 @@ from __future__ import annotations
 from typing import Literal
 
 import pytz
-from django.conf import settings
-from django.core.cache import cache
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 
 from home_app.forms import ApplicantRegisterForm, ApplicantSettingsForm, CompanyRegisterForm, CompanySettingsForm
 from home_app.models import ApplicantSettings, CompanySettings
-from services.common_utils import RequestHost, check_is_user_company, get_user_settings
+from services.common_utils import RequestHost, check_is_user_company, delete_user_settings_cache, get_user_settings
 from services.home_app_mixins import UpdateSettingsMixin
 
 Context = dict
@@ -57,7 +55,7 @@ class SettingsViewUtils(UpdateSettingsMixin):
         self, view_self, request: HttpRequest, flag_error: Literal[False] | str, flag_success: bool, company: bool
     ) -> HttpResponse:
         if company and flag_success:
-            cache.delete(f"{request.user.id}{settings.CACHE_NAMES_DELIMITER}{settings.USER_SETTINGS_CACHE_NAME}")
+            delete_user_settings_cache(request.user.id)
             return redirect(
                 f"{reverse('worksite_app:some_company', kwargs={'uname': request.user.username})}" f"?show_success=True"
             )
@@ -0,0 +1,357 @@
+import json
+import logging
+import random
+import re
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Literal, NamedTuple, Optional, Set, Tuple, Type
+
+from celery.signals import before_task_publish
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.http import HttpRequest, HttpResponse
+
+from services.metrics import observe_request
+
+logger = logging.getLogger("worksite.instrumentation")
+slow_queries_logger = logging.getLogger("worksite.slow_queries")
+
+# Нормализация SQL до "формы" запроса: значения и списки параметров заменяются на ?, чтобы одинаковые
+# запросы с разными аргументами (типичный N+1) считались одним.
+_SQL_NORMALIZERS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"\s+"), " "),
+)
+_OWN_FILES = (__file__, "/site-packages/", "/dist-packages/")
+CALL_SITE_DEPTH = 3
+REQUEST_ID_RE = re.compile(r"[\w.-]{1,64}")
+EXPLAINED_SHAPES_MAX_SIZE = 1000
+
+
+class SQLShape(object):
+    """Статистика запросов одной формы за время обработки запроса."""
+
+    __slots__ = "count", "duration", "call_site"
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.call_site: Optional[str] = None
+
+
+class NPlusOne(NamedTuple):
+    """Структура данных с найденным N+1: форма запроса, число выполнений, общее время и место вызова."""
+
+    sql: str
+    count: int
+    duration: float
+    call_site: Optional[str]
+
+
+class RequestStats(object):
+    """Счетчики SQL запросов, обращений к кешу и отправленных Celery задач за время обработки запроса."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.view_name: Optional[str] = None
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.sql_shapes: Dict[str, SQLShape] = {}
+        self.cache = Counter()
+        self.cache_duration = 0.0
+        self.tasks: List[str] = []
+
+    def add_query(self, sql: str, duration: float) -> Literal[None]:
+        self.queries += 1
+        self.sql_duration += duration
+        shape = self.sql_shapes.setdefault(normalize_sql(sql), SQLShape())
+        shape.count += 1
+        shape.duration += duration
+        # место вызова ищется один раз, когда запрос становится подозрительным, а не для каждого запроса
+        if shape.count == settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD + 1:
+            shape.call_site = _get_call_site()
+
+    def add_cache_call(self, operation: str, duration: float, hits: int = 0, misses: int = 0) -> Literal[None]:
+        self.cache[operation] += 1
+        self.cache["hits"] += hits
+        self.cache["misses"] += misses
+        self.cache_duration += duration
+
+    def get_n_plus_one(self) -> List[NPlusOne]:
+        return [
+            NPlusOne(sql, shape.count, shape.duration, shape.call_site)
+            for sql, shape in self.sql_shapes.items()
+            if shape.count > settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD
+        ]
+
+    def get_server_timing(self, total: float) -> str:
+        """Значение заголовка Server-Timing (длительности в миллисекундах)."""
+
+        cache = ", ".join(f"{self.cache[op]} {op}" for op in ("get", "set", "delete", "hits", "misses"))
+        metrics = [
+            f'db;dur={self.sql_duration * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;dur={self.cache_duration * 1000:.1f};desc="{cache}"',
+            f'celery;desc="{len(self.tasks)} tasks"',
+        ]
+        if n_plus_one := self.get_n_plus_one():
+            metrics.append(f'n-plus-one;desc="{len(n_plus_one)} shapes"')
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def get_request_stats() -> Optional[RequestStats]:
+    """Счетчики текущего запроса (None вне InstrumentationMiddleware, например в Celery задачах)."""
+
+    return _request_stats.get()
+
+
+def normalize_sql(sql: str) -> str:
+    for pattern, replacement in _SQL_NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def _get_call_site() -> Optional[str]:
+    """Ближайшие к запросу кадры стека из кода проекта (не Django и не сторонних библиотек), от вызова SQL вверх."""
+
+    base_dir = f"{settings.BASE_DIR}/"
+    frames = [
+        f"{frame.filename.removeprefix(base_dir)}:{frame.lineno} in {frame.name}"
+        for frame in reversed(traceback.extract_stack()[:-1])
+        if frame.filename.startswith(base_dir) and not any(part in frame.filename for part in _OWN_FILES)
+    ]
+    return " <- ".join(frames[:CALL_SITE_DEPTH]) or None
+
+
+def _record_query(execute: Callable, sql: str, params: object, many: bool, context: Dict) -> object:
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+_explaining: ContextVar[bool] = ContextVar("explaining", default=False)
+_explained_shapes: Set[str] = set()
+
+
+def add_slow_query_log(sender: Type[BaseDatabaseWrapper], connection: BaseDatabaseWrapper, **kwargs) -> Literal[None]:
+    """Подключение журнала медленных запросов к новому соединению с БД (обработчик сигнала connection_created)."""
+
+    if _log_slow_query not in connection.execute_wrappers:
+        # в начало списка: execute_wrapper() в InstrumentationMiddleware при выходе снимает последний элемент
+        connection.execute_wrappers.insert(0, _log_slow_query)
+
+
+def _log_slow_query(execute: Callable, sql: str, params: object, many: bool, context: Dict) -> object:
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    slow = duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS
+    if slow or random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+        _write_query_log(context["connection"], sql, params, many, duration_ms, slow)
+    return result
+
+
+def _write_query_log(
+    connection: BaseDatabaseWrapper, sql: str, params: object, many: bool, duration_ms: float, slow: bool
+) -> Literal[None]:
+    stats = _request_stats.get()
+    shape = normalize_sql(sql)
+    record = {
+        "event": "slow_query" if slow else "sampled_query",
+        "duration_ms": round(duration_ms, 1),
+        "sql": shape,
+        "database": connection.alias,
+        "view": stats.view_name if stats else None,
+        "request_id": stats.request_id if stats else None,
+    }
+    explain_threshold = settings.SLOW_QUERY_EXPLAIN_THRESHOLD_MS
+    if (
+        slow
+        and not many
+        and explain_threshold is not None
+        and duration_ms >= explain_threshold
+        and shape[:6].upper() == "SELECT"
+        and shape not in _explained_shapes
+    ):
+        if len(_explained_shapes) >= EXPLAINED_SHAPES_MAX_SIZE:
+            _explained_shapes.clear()
+        _explained_shapes.add(shape)
+        record["plan"] = _explain(connection, sql, params)
+    slow_queries_logger.log(
+        logging.WARNING if slow else logging.INFO, json.dumps(record, ensure_ascii=False, default=str)
+    )
+
+
+def _explain(connection: BaseDatabaseWrapper, sql: str, params: object) -> Optional[List[str]]:
+    """
+    План медленного запроса. EXPLAIN выполняется отдельным курсором в точке сохранения, чтобы ошибка
+    не прервала текущую транзакцию и не затронула результат исходного запроса.
+    """
+
+    token = _explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return [" ".join(map(str, row)) for row in cursor.fetchall()]
+    except DatabaseError:
+        slow_queries_logger.warning("Unable to explain query %s", sql, exc_info=True)
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+@before_task_publish.connect
+def _record_task(sender: Optional[str] = None, **kwargs) -> Literal[None]:
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.tasks.append(sender)
+
+
+_MISSING = object()
+# Признак выполнения инструментированного метода кеша: базовые реализации get_many/set_many/delete_many
+# вызывают get/set/delete, и такие вложенные вызовы не должны учитываться повторно.
+_in_cache_call: ContextVar[bool] = ContextVar("in_cache_call", default=False)
+CacheHits = Callable[[object], Tuple[int, int]]
+
+
+class InstrumentedCacheMixin(object):
+    """Миксин для бэкенда кеша, учитывающий обращения к кешу, попадания и промахи в счетчиках запроса."""
+
+    def get(self, key: str, default: object = None, version: Optional[int] = None) -> object:
+        value = self._record("get", _get_hits, super().get, key, _MISSING, version)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys: List[str], version: Optional[int] = None) -> Dict:
+        keys = list(keys)
+        return self._record(
+            "get", lambda values: (len(values), len(keys) - len(values)), super().get_many, keys, version
+        )
+
+    def set(self, *args, **kwargs) -> Literal[None]:
+        return self._record("set", None, super().set, *args, **kwargs)
+
+    def add(self, *args, **kwargs) -> bool:
+        return self._record("set", None, super().add, *args, **kwargs)
+
+    def set_many(self, *args, **kwargs) -> List:
+        return self._record("set", None, super().set_many, *args, **kwargs)
+
+    def delete(self, *args, **kwargs) -> bool:
+        return self._record("delete", None, super().delete, *args, **kwargs)
+
+    def delete_many(self, *args, **kwargs) -> Literal[None]:
+        return self._record("delete", None, super().delete_many, *args, **kwargs)
+
+    @staticmethod
+    def _record(operation: str, hits: Optional[CacheHits], method: Callable, *args, **kwargs) -> object:
+        stats = _request_stats.get()
+        if stats is None or _in_cache_call.get():
+            return method(*args, **kwargs)
+        token = _in_cache_call.set(True)
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            _in_cache_call.reset(token)
+            duration = time.perf_counter() - started
+        stats.add_cache_call(operation, duration, *(hits(result) if hits else (0, 0)))
+        return result
+
+
+def _get_hits(value: object) -> Tuple[int, int]:
+    return (0, 1) if value is _MISSING else (1, 0)
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentationMiddleware(object):
+    """
+    Middleware, собирающий по каждому запросу число и время SQL запросов, обращения к кешу и отправленные
+    Celery задачи. Итог пишется в лог одной JSON строкой и (при INSTRUMENTATION_SERVER_TIMING) в заголовок
+    Server-Timing. Формы SQL, выполненные больше INSTRUMENTATION_N_PLUS_ONE_THRESHOLD раз, считаются N+1 и
+    логируются с местом вызова.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+        request_id = request.headers.get("X-Request-ID", "")
+        stats = RequestStats(request_id if REQUEST_ID_RE.fullmatch(request_id) else uuid.uuid4().hex)
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        total = time.perf_counter() - started
+        observe_request(stats.view_name, request.method, response.status_code, total, stats.queries)
+
+        response["X-Request-ID"] = stats.request_id
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response["Server-Timing"] = stats.get_server_timing(total)
+        n_plus_one = stats.get_n_plus_one()
+        for query in n_plus_one:
+            logger.warning(
+                "N+1: %d queries (%.1f ms) of shape %s at %s",
+                query.count,
+                query.duration * 1000,
+                query.sql,
+                query.call_site,
+            )
+        logger.info(
+            json.dumps(
+                {
+                    "request_id": stats.request_id,
+                    "method": request.method,
+                    "view": stats.view_name,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": round(total * 1000, 1),
+                    "sql_queries": stats.queries,
+                    "sql_ms": round(stats.sql_duration * 1000, 1),
+                    "cache": dict(stats.cache),
+                    "cache_ms": round(stats.cache_duration * 1000, 1),
+                    "celery_tasks": stats.tasks,
+                    "n_plus_one": [query._asdict() for query in n_plus_one],
+                },
+                ensure_ascii=False,
+            )
+        )
+        return response
+
+    def process_view(self, request: HttpRequest, *args, **kwargs) -> Literal[None]:
+        stats = _request_stats.get()
+        if stats is not None and request.resolver_match:
+            stats.view_name = request.resolver_match.view_name
@@ -0,0 +1,129 @@
+import glob
+import os
+import shutil
+import time
+from typing import Dict, Iterable, Literal, Optional
+
+from celery import Task
+from celery.signals import task_failure, task_postrun, task_prerun, worker_init, worker_process_shutdown
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.metrics_core import Metric
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+# Метрики пишутся в файлы каталога PROMETHEUS_MULTIPROC_DIR (если он задан), поэтому их можно объединить
+# для всех воркеров gunicorn и Celery. Без этой переменной окружения метрики хранятся в памяти процесса.
+REQUEST_LATENCY = Histogram(
+    "worksite_request_duration_seconds",
+    "Время обработки HTTP запроса.",
+    ("view", "method", "status"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "worksite_request_db_queries",
+    "Число SQL запросов за один HTTP запрос.",
+    ("view",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+CACHE_LOOKUPS = Counter(
+    "worksite_cache_lookups_total",
+    "Обращения к кешу настроек пользователей и оценок компаний.",
+    ("cache", "result"),
+)
+TASK_DURATION = Histogram(
+    "worksite_task_duration_seconds",
+    "Время выполнения Celery задачи.",
+    ("task",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+TASK_FAILURES = Counter("worksite_task_failures_total", "Число завершившихся ошибкой Celery задач.", ("task",))
+
+UNRESOLVED_VIEW = "<unresolved>"
+
+
+class CacheName(object):
+    """Названия кешей для метрики CACHE_LOOKUPS."""
+
+    USER_SETTINGS = "user_settings"
+    COMPANY_RATINGS = "company_ratings"
+    VACANCY_CARDS = "vacancy_cards"
+
+
+def observe_request(view_name: Optional[str], method: str, status: int, duration: float, queries: int) -> Literal[None]:
+    view_name = view_name or UNRESOLVED_VIEW
+    REQUEST_LATENCY.labels(view_name, method, str(status)).observe(duration)
+    REQUEST_DB_QUERIES.labels(view_name).observe(queries)
+
+
+def observe_cache_lookup(cache_name: str, hit: bool) -> Literal[None]:
+    CACHE_LOOKUPS.labels(cache_name, "hit" if hit else "miss").inc()
+
+
+class MultiDirCollector(object):
+    """
+    Сборщик, объединяющий файлы метрик из нескольких каталогов PROMETHEUS_MULTIPROC_DIR (gunicorn и Celery
+    работают в разных контейнерах и очищают свои каталоги независимо).
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = tuple(paths)
+
+    def collect(self) -> Iterable[Metric]:
+        files = [file for path in self.paths for file in glob.glob(os.path.join(path, "*.db"))]
+        return MultiProcessCollector.merge(files, accumulate=True)
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Метрики в текстовом формате Prometheus."""
+
+    registry = REGISTRY
+    if settings.METRICS_DIRS:
+        registry = CollectorRegistry()
+        registry.register(MultiDirCollector(settings.METRICS_DIRS))
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def clear_multiprocess_dir() -> Literal[None]:
+    """Очистка каталога с файлами метрик при старте (файлы прошлого запуска исказили бы счетчики)."""
+
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR", None)
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+_tasks_started: Dict[str, float] = {}
+
+
+def connect_celery_metrics() -> Literal[None]:
+    """Подключение сбора метрик Celery задач и очистки файлов метрик воркера (вызывается в celery_setup)."""
+
+    task_prerun.connect(_start_task)
+    task_postrun.connect(_finish_task)
+    task_failure.connect(_fail_task)
+    worker_init.connect(_clear_worker_metrics)
+    worker_process_shutdown.connect(_mark_worker_process_dead)
+
+
+def _start_task(task_id: str, **kwargs) -> Literal[None]:
+    _tasks_started[task_id] = time.perf_counter()
+
+
+def _finish_task(task_id: str, task: Task, **kwargs) -> Literal[None]:
+    started = _tasks_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name).observe(time.perf_counter() - started)
+
+
+def _fail_task(sender: Task, **kwargs) -> Literal[None]:
+    TASK_FAILURES.labels(sender.name).inc()
+
+
+def _clear_worker_metrics(**kwargs) -> Literal[None]:
+    clear_multiprocess_dir()
+
+
+def _mark_worker_process_dead(pid: int, **kwargs) -> Literal[None]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR", None):
+        mark_process_dead(pid)
@@ -0,0 +1,141 @@
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Callable, Literal, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpRequest, HttpResponse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from home_app.models import RequestProfile
+from services.instrumentation import get_request_stats
+
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILERS = {
+    "1": RequestProfile.SAMPLE,
+    RequestProfile.SAMPLE: RequestProfile.SAMPLE,
+    RequestProfile.CPROFILE: RequestProfile.CPROFILE,
+}
+
+
+class StackSampler(object):
+    """
+    Сэмплирующий профилировщик: фоновый поток каждые interval секунд снимает стек потока, обрабатывающего
+    запрос, и считает одинаковые стеки. Результат - строки "func (file:line);...;func (file:line) count"
+    (формат folded для flamegraph.pl и speedscope).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> Literal[None]:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> Literal[None]:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id, None)
+            if frame is not None:
+                self.stacks[_format_stack(frame)] += 1
+
+    def get_folded(self) -> bytes:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode()
+
+
+def _format_stack(frame: Optional[FrameType]) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({_get_short_filename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def _get_short_filename(filename: str) -> str:
+    """Путь относительно проекта или site-packages, чтобы стеки не зависели от места установки."""
+
+    _, site_packages, path = filename.rpartition("-packages" + os.sep)
+    return path if site_packages else os.path.relpath(filename, settings.BASE_DIR)
+
+
+class ProfilingMiddleware(object):
+    """
+    Middleware для профилирования отдельных запросов staff пользователей: запрос с параметром _profile
+    (или заголовком X-Profile) со значением sample (или 1) выполняется под сэмплирующим профилировщиком,
+    со значением cprofile - под cProfile. Профиль вместе с числом SQL запросов и обращений к кешу сохраняется
+    в RequestProfile (раздел админки), его id возвращается в заголовке X-Profile-ID. Запросы без флага
+    проходят без каких-либо дополнительных действий.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        # Без флага запрос не должен стоить ничего лишнего, поэтому строка запроса разбирается только при
+        # наличии в ней имени параметра
+        flag = request.META.get(PROFILE_HEADER, None)
+        if flag is None and PROFILE_PARAM in request.META.get("QUERY_STRING", ""):
+            flag = request.GET.get(PROFILE_PARAM, None)
+        if flag is None or not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        profiler = PROFILERS.get(flag, None)
+        user = self._get_user(request)
+        if profiler is None or user is None or not user.is_staff:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        if profiler == RequestProfile.CPROFILE:
+            profile = cProfile.Profile()
+            response = profile.runcall(self.get_response, request)
+            profile.create_stats()
+            data = marshal.dumps(profile.stats)  # формат файлов pstats (как у Profile.dump_stats)
+        else:
+            with StackSampler(settings.PROFILING_SAMPLE_INTERVAL_MS / 1000) as sampler:
+                response = self.get_response(request)
+            data = sampler.get_folded()
+        duration = time.perf_counter() - started
+
+        stats = get_request_stats()
+        request_profile = RequestProfile.objects.create(
+            user=user,
+            profiler=profiler,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view_name=request.resolver_match.view_name if request.resolver_match else "",
+            status=response.status_code,
+            duration_ms=round(duration * 1000, 1),
+            sql_queries=stats.queries if stats else None,
+            sql_ms=round(stats.sql_duration * 1000, 1) if stats else None,
+            cache_calls=dict(stats.cache) if stats else None,
+            profile=data,
+        )
+        response["X-Profile-ID"] = str(request_profile.pk)
+        return response
+
+    @staticmethod
+    def _get_user(request: HttpRequest) -> Optional[User | AnonymousUser]:
+        """Пользователь сессии или (для запросов к API) владелец токена из заголовка Authorization."""
+
+        if request.user.is_authenticated or "Authorization" not in request.headers:
+            return request.user
+        try:
+            authenticated = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return authenticated[0] if authenticated else None
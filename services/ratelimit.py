@@ -0,0 +1,184 @@
+import logging
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Literal, NamedTuple, Optional, Tuple
+
+import redis
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import render
+from django.utils.module_loading import import_string
+from django.views.generic import View
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger("worksite.ratelimit")
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+BUCKET_KEYS = ("user", "ip")
+
+# Атомарная проверка нескольких корзин: токен списывается из всех корзин, только если он есть в каждой из них.
+# KEYS - ключи корзин, ARGV - пары (емкость, скорость пополнения в токенах в секунду) для каждой корзины.
+# Время берется у Redis, чтобы корзины не зависели от расхождения часов на разных серверах.
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local tokens, wait = {}, 0
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[i * 2 - 1]), tonumber(ARGV[i * 2])
+    local bucket = redis.call("HMGET", key, "tokens", "time")
+    tokens[i] = capacity
+    if bucket[1] then
+        tokens[i] = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+    end
+    if tokens[i] < 1 then
+        wait = math.max(wait, (1 - tokens[i]) / rate)
+    end
+end
+if wait > 0 then
+    return {0, math.ceil(wait * 1000)}
+end
+for i, key in ipairs(KEYS) do
+    local capacity, rate = tonumber(ARGV[i * 2 - 1]), tonumber(ARGV[i * 2])
+    redis.call("HSET", key, "tokens", tostring(tokens[i] - 1), "time", tostring(now))
+    redis.call("PEXPIRE", key, math.ceil(capacity / rate * 1000))
+end
+return {1, 0}
+"""
+
+
+class Rate(NamedTuple):
+    """Структура данных с лимитом: корзина на пользователя или IP, емкость и время ее полного пополнения."""
+
+    key: Literal["user", "ip"]
+    capacity: int
+    period: int
+
+
+class Bucket(NamedTuple):
+    key: str
+    capacity: int
+    rate: float  # токенов в секунду
+
+
+def parse_rate(rate: str) -> Rate:
+    """Разбор лимита вида "user:10/m" (10 запросов в минуту на пользователя) или "ip:5/h"."""
+
+    key, _, limit = rate.partition(":")
+    capacity, _, period = limit.partition("/")
+    if key not in BUCKET_KEYS or not capacity.isdigit() or period[:1] not in PERIODS:
+        raise ValueError(f"Invalid rate limit {rate!r}.")
+    return Rate(key, int(capacity), PERIODS[period[0]])
+
+
+class TokenBucketBackend(object):
+    def consume(self, buckets: List[Bucket]) -> Optional[float]:
+        """Списание токена из всех корзин. Возвращает None, если запрос разрешен, иначе секунды до повтора."""
+
+        raise NotImplementedError
+
+
+class RedisTokenBucketBackend(TokenBucketBackend):
+    """Корзины в Redis, проверка и списание выполняются одним Lua скриптом (атомарно для всех воркеров)."""
+
+    def __init__(self):
+        # короткие таймауты: зависший Redis не должен задерживать запросы дольше, чем на секунду
+        self.client = redis.Redis.from_url(settings.RATELIMIT_REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def consume(self, buckets: List[Bucket]) -> Optional[float]:
+        args = [value for bucket in buckets for value in (bucket.capacity, bucket.rate)]
+        try:
+            allowed, retry_after_ms = self.script(keys=[bucket.key for bucket in buckets], args=args)
+        except redis.RedisError:
+            # недоступность Redis не должна останавливать запись на сайте, поэтому запрос пропускается
+            logger.exception("Rate limit check failed")
+            return None
+        return None if allowed else retry_after_ms / 1000
+
+
+class LocMemTokenBucketBackend(TokenBucketBackend):
+    """Корзины в памяти процесса (для тестов и локального запуска без Redis)."""
+
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.lock = threading.Lock()
+
+    def consume(self, buckets: List[Bucket]) -> Optional[float]:
+        with self.lock:
+            now = time.monotonic()
+            tokens = []
+            for bucket in buckets:
+                available, updated = self.buckets.get(bucket.key, (bucket.capacity, now))
+                tokens.append(min(bucket.capacity, available + (now - updated) * bucket.rate))
+            wait = max(((1 - available) / bucket.rate for bucket, available in zip(buckets, tokens)), default=0)
+            if wait > 0:
+                return wait
+            for bucket, available in zip(buckets, tokens):
+                self.buckets[bucket.key] = (available - 1, now)
+        return None
+
+
+@lru_cache
+def get_backend(path: str) -> TokenBucketBackend:
+    return import_string(path)()
+
+
+def get_client_ip(request: HttpRequest) -> str:
+    """IP клиента с учетом NUM_PROXIES доверенных прокси (так же, как его определяют троттлы DRF)."""
+
+    return BaseThrottle().get_ident(request)
+
+
+def check_ratelimit(request: HttpRequest, scope: str) -> Optional[float]:
+    """
+    Проверка лимитов RATELIMITS[scope] для запроса. Корзина на пользователя учитывается только для
+    авторизованных пользователей. Возвращает None, если запрос разрешен, иначе секунды до повтора.
+    """
+
+    if not settings.RATELIMIT_ENABLED:
+        return None
+    buckets = []
+    for rate in map(parse_rate, settings.RATELIMITS[scope]):
+        if rate.key == "user" and not request.user.is_authenticated:
+            continue
+        ident = request.user.pk if rate.key == "user" else get_client_ip(request)
+        buckets.append(Bucket(f"ratelimit:{scope}:{rate.key}:{ident}", rate.capacity, rate.capacity / rate.period))
+    if not buckets:
+        return None
+    return get_backend(settings.RATELIMIT_BACKEND).consume(buckets)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Троттл DRF для вьюсетов и APIView с атрибутом ratelimits = {действие вьюсета или HTTP метод: scope}.
+    При превышении лимита DRF отвечает 429 с заголовком Retry-After.
+    """
+
+    def allow_request(self, request: Request, view: View) -> bool:
+        ratelimits = getattr(view, "ratelimits", None)
+        scope = ratelimits and ratelimits.get(getattr(view, "action", None) or request.method.lower(), None)
+        self.retry_after = check_ratelimit(request, scope) if scope else None
+        return self.retry_after is None
+
+    def wait(self) -> Optional[float]:
+        return self.retry_after
+
+
+class RateLimitMixin(object):
+    """Миксин для обычных View с атрибутом ratelimits = {HTTP метод: scope}. Превышение лимита - ответ 429."""
+
+    ratelimits: Dict[str, str] = {}
+
+    def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        scope = self.ratelimits.get(request.method.lower(), None)
+        retry_after = check_ratelimit(request, scope) if scope else None
+        if retry_after is not None:
+            retry_after = math.ceil(retry_after)
+            response = render(request, "429.html", context={"retry_after": retry_after}, status=429)
+            response["Retry-After"] = str(retry_after)
+            return response
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,157 @@
+from itertools import groupby
+from typing import Dict, Iterable, List, Literal, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, QuerySet, Sum
+
+from worksite_app.constants import EXPERIENCE_CHOICES_VALID_VALUES
+from worksite_app.models import SalaryStats, Vacancy
+
+Group = Tuple[str, str]  # (город, опыт), пустой опыт - все уровни опыта города
+PERCENTILES = 10, 50, 90
+
+
+class Signature(NamedTuple):
+    """
+    Сигнатура группы вакансий: если она не изменилась, то не изменился и набор зарплат группы. Сумма id меняется
+    и при замене одной вакансии другой с той же зарплатой, так как id вакансий не переиспользуются.
+    """
+
+    count: int
+    money_sum: int
+    ids_sum: int
+
+
+def get_live_vacancys() -> QuerySet[Vacancy]:
+    return Vacancy.objects.filter(archived=False, deleted=False)
+
+
+def get_signatures() -> Dict[Group, Signature]:
+    """Сигнатуры групп открытых вакансий (одним GROUP BY), включая итоговые группы городов."""
+
+    signatures: Dict[Group, Signature] = {}
+    groups = get_live_vacancys().order_by().values_list("city", "experience")
+    for city, experience, *signature in groups.annotate(Count("pk"), Sum("money"), Sum("pk")):
+        signatures[(city, experience)] = Signature(*signature)
+        total = signatures.get((city, ""), Signature(0, 0, 0))
+        signatures[(city, "")] = Signature(*(a + b for a, b in zip(total, signature)))
+    return signatures
+
+
+def get_stats(money: np.ndarray) -> Dict:
+    """Количество, процентили (с линейной интерполяцией, как percentile_cont) и гистограмма зарплат."""
+
+    p10, p50, p90 = np.percentile(money, PERCENTILES)
+    histogram, _ = np.histogram(money, bins=settings.SALARY_STATS_BINS)
+    return {
+        "count": len(money),
+        "p10": round(p10),
+        "p50": round(p50),
+        "p90": round(p90),
+        "histogram": histogram.tolist(),
+    }
+
+
+def _get_city_money(cities: List[str]) -> Iterable[Tuple[str, Dict[str, np.ndarray]]]:
+    """Зарплаты открытых вакансий городов по опыту, читаются одним потоком по (город, опыт)."""
+
+    rows = (
+        get_live_vacancys()
+        .filter(city__in=cities)
+        .order_by("city", "experience")
+        .values_list("city", "experience", "money")
+        .iterator(chunk_size=2000)
+    )
+    for city, city_rows in groupby(rows, key=lambda row: row[0]):
+        yield (
+            city,
+            {
+                experience: np.fromiter((row[2] for row in group), dtype=np.int64)
+                for experience, group in groupby(city_rows, key=lambda row: row[1])
+            },
+        )
+
+
+def update_salary_stats(full: bool = False) -> Dict[str, int]:
+    """
+    Обновление статистики зарплат. Сигнатуры всех групп считаются в БД, а зарплаты читаются только для городов
+    с изменившимися группами (при full - для всех городов). Группы без открытых вакансий удаляются.
+    """
+
+    signatures = get_signatures()
+    stored = {
+        (city, experience): Signature(*signature)
+        for city, experience, *signature in SalaryStats.objects.values_list(
+            "city", "experience", "count", "money_sum", "ids_sum"
+        )
+    }
+    removed = stored.keys() - signatures.keys()
+    changed = {group for group, signature in signatures.items() if full or stored.get(group) != signature}
+    cities = sorted({city for city, _ in changed})
+
+    SalaryStats.objects.filter(pk__in=_get_ids(removed)).delete()
+    updated = 0
+    for start in range(0, len(cities), settings.SALARY_STATS_BATCH_SIZE):
+        batch = cities[start : start + settings.SALARY_STATS_BATCH_SIZE]
+        objects = []
+        for city, money in _get_city_money(batch):
+            money[""] = np.concatenate(list(money.values()))
+            for experience, values in money.items():
+                if (city, experience) in changed:
+                    signature = signatures[(city, experience)]._asdict()
+                    stats = get_stats(values) | signature
+                    objects.append(SalaryStats(city=city, experience=experience, **stats))
+        _save_stats(objects)
+        updated += len(objects)
+    return {"groups": len(signatures), "updated": updated, "removed": len(removed)}
+
+
+def _get_ids(groups: Set[Group]) -> List[int]:
+    if not groups:
+        return []
+    cities = {city for city, _ in groups}
+    queryset = SalaryStats.objects.filter(city__in=cities).values_list("pk", "city", "experience")
+    return [pk for pk, city, experience in queryset if (city, experience) in groups]
+
+
+def _save_stats(objects: List[SalaryStats]) -> Literal[None]:
+    fields = "count", "p10", "p50", "p90", "histogram", "money_sum", "ids_sum", "time_updated"
+    with transaction.atomic():
+        SalaryStats.objects.bulk_create(
+            objects, update_conflicts=True, unique_fields=("city", "experience"), update_fields=fields
+        )
+
+
+def filter_salary_stats(params: Dict[str, str]) -> QuerySet[SalaryStats]:
+    """
+    Статистика зарплат с фильтрами как у поиска вакансий: city - город, experience - значение опыта или all для
+    итоговых групп городов. Неверные значения фильтров не применяются.
+    """
+
+    kwargs = {}
+    city, experience = params.get("city", None), params.get("experience", None)
+    if city and city != "Любой":
+        kwargs["city"] = city
+    if experience == "all":
+        kwargs["experience"] = ""
+    elif experience in EXPERIENCE_CHOICES_VALID_VALUES:
+        kwargs["experience"] = experience
+    return SalaryStats.objects.filter(**kwargs).order_by("-count", "city", "experience")
+
+
+def get_top_cities_stats() -> List[Tuple[SalaryStats, List[Optional[SalaryStats]]]]:
+    """
+    Итоговая статистика городов с наибольшим числом вакансий и статистика этих городов по каждому значению опыта
+    в порядке EXPERIENCE_CHOICES (None, если вакансий с таким опытом в городе нет).
+    """
+
+    totals = list(filter_salary_stats({"experience": "all"})[: settings.SALARY_STATS_SHOWN_CITIES])
+    by_experience: Dict[str, Dict[str, SalaryStats]] = {total.city: {} for total in totals}
+    for stats in SalaryStats.objects.filter(city__in=by_experience).exclude(experience=""):
+        by_experience[stats.city][stats.experience] = stats
+    return [
+        (total, [by_experience[total.city].get(experience, None) for experience in EXPERIENCE_CHOICES_VALID_VALUES])
+        for total in totals
+    ]
@@ -0,0 +1,168 @@
+from collections import defaultdict
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from worksite_app.models import SavedSearch, SavedSearchMatch, Vacancy
+
+TRIGRAM_LENGTH = 3
+SEARCH_FIELDS = "name", "description"  # поля, по которым ищет VacancySearchMixin
+
+
+def get_search_key(search: str) -> str:
+    """
+    Ключ сохраненного поиска в инвертированном индексе по ключевым словам - первая триграмма search. Вакансия,
+    в тексте которой есть search, содержит и любую его триграмму, поэтому по ключу поиск не пропускается.
+    """
+
+    search = search.lower()
+    return search[:TRIGRAM_LENGTH] if len(search) >= TRIGRAM_LENGTH else ""
+
+
+def get_saved_search_url(saved_search: SavedSearch) -> str:
+    return f"{reverse('worksite_app:home')}?{urlencode(saved_search.params)}"
+
+
+def _get_trigrams(vacancy: Vacancy) -> Set[str]:
+    trigrams = set()
+    for field in SEARCH_FIELDS:
+        text = (getattr(vacancy, field) or "").lower()
+        trigrams.update(text[i : i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1))
+    return trigrams
+
+
+class SavedSearchIndex(object):
+    """
+    Инвертированный индекс сохраненных поисков: списки поисков по городу, опыту и ключу ключевых слов (пустое
+    значение - условие не задано). Для вакансии просматриваются только списки с ее значениями этих условий и
+    пустыми значениями, у найденных поисков проверяются зарплата и вхождение search в поля вакансии.
+    """
+
+    def __init__(self, saved_searches: Iterable[SavedSearch]):
+        self.postings: Dict[Tuple[str, str, str], List[SavedSearch]] = defaultdict(list)
+        for saved_search in saved_searches:
+            for experience in list(saved_search.experience) or [""]:
+                self.postings[(saved_search.city, experience, saved_search.search_key)].append(saved_search)
+        self.keys = {key for _, _, key in self.postings}
+
+    def get_matches(self, vacancy: Vacancy, trigrams: Set[str]) -> Iterator[SavedSearch]:
+        keys = (trigrams & self.keys) | {""}
+        for city in {vacancy.city, ""}:
+            for experience in (vacancy.experience, ""):
+                for key in keys:
+                    for saved_search in self.postings.get((city, experience, key), ()):
+                        if self._check(saved_search, vacancy):
+                            yield saved_search
+
+    @staticmethod
+    def _check(saved_search: SavedSearch, vacancy: Vacancy) -> bool:
+        if saved_search.money_from is not None and vacancy.money < saved_search.money_from:
+            return False
+        if saved_search.money_to is not None and vacancy.money > saved_search.money_to:
+            return False
+        if not saved_search.search:
+            return True
+        search = saved_search.search.lower()
+        return any(search in (getattr(vacancy, field) or "").lower() for field in saved_search.search_fields.split(","))
+
+
+def match_new_vacancys() -> Dict[str, int]:
+    """
+    Подбор сохраненных поисков для новых вакансий пачками по SAVED_SEARCHES_BATCH_SIZE. Из БД берутся только
+    поиски-кандидаты пачки (по индексу на search_key и city), по ним строится SavedSearchIndex, так что сами
+    сохраненные поиски по таблице вакансий не выполняются. Совпадения ставятся в очередь уведомлений
+    (SavedSearchMatch), вакансии пачки отмечаются проверенными.
+    """
+
+    report = {"vacancys": 0, "matches": 0}
+    pending = Vacancy.objects.filter(saved_searches_matched=False).order_by("pk")
+    fields = "name", "description", "money", "experience", "city", "archived", "deleted"
+    while True:
+        with transaction.atomic():
+            batch = pending.select_for_update(skip_locked=True).only(*fields)[: settings.SAVED_SEARCHES_BATCH_SIZE]
+            vacancys = list(batch)
+            if not vacancys:
+                break
+            matches = list(_get_matches([v for v in vacancys if not v.archived and not v.deleted]))
+            SavedSearchMatch.objects.bulk_create(matches, ignore_conflicts=True)
+            Vacancy.objects.filter(pk__in=[v.pk for v in vacancys]).update(saved_searches_matched=True)
+        report["vacancys"] += len(vacancys)
+        report["matches"] += len(matches)
+    return report
+
+
+def _get_matches(vacancys: List[Vacancy]) -> Iterator[SavedSearchMatch]:
+    if not vacancys:
+        return
+    trigrams = {vacancy.pk: _get_trigrams(vacancy) for vacancy in vacancys}
+    # ключей немного больше, чем разных начал поисковых запросов, они читаются из индекса
+    keys = set(SavedSearch.objects.order_by().values_list("search_key", flat=True).distinct())
+    candidates = SavedSearch.objects.filter(
+        search_key__in=(keys & set().union(*trigrams.values())) | {""},
+        city__in={vacancy.city for vacancy in vacancys} | {""},
+    ).only("city", "money_from", "money_to", "experience", "search", "search_fields", "search_key")
+    index = SavedSearchIndex(candidates.iterator())
+    for vacancy in vacancys:
+        for saved_search in index.get_matches(vacancy, trigrams[vacancy.pk]):
+            yield SavedSearchMatch(saved_search_id=saved_search.pk, vacancy_id=vacancy.pk)
+
+
+def send_digests() -> Dict[str, int]:
+    """
+    Рассылка накопленных совпадений сохраненных поисков: одно письмо на соискателя со всеми его поисками.
+    Соискатели без email видят совпадения только на странице сохраненных поисков. Вакансии, закрытые после
+    подбора, в письма не попадают. Отправленные и пропущенные совпадения отмечаются уведомленными.
+    """
+
+    report = {"applicants": 0, "emails": 0, "matches": 0}
+    pending = SavedSearchMatch.objects.filter(notified=False)
+    applicants = list(pending.order_by().values_list("saved_search__applicant", flat=True).distinct())
+    connection = get_connection()
+    for start in range(0, len(applicants), settings.SAVED_SEARCHES_BATCH_SIZE):
+        ids = applicants[start : start + settings.SAVED_SEARCHES_BATCH_SIZE]
+        matches = list(
+            pending.filter(saved_search__applicant__in=ids)
+            .select_related("saved_search__applicant", "vacancy")
+            .order_by("saved_search__applicant", "saved_search", "-vacancy__time_added")
+        )
+        open_matches = [match for match in matches if not (match.vacancy.archived or match.vacancy.deleted)]
+        messages = [
+            _get_digest_message(applicant, list(applicant_matches))
+            for applicant, applicant_matches in groupby(open_matches, key=lambda match: match.saved_search.applicant)
+            if applicant.email
+        ]
+        connection.send_messages(messages)
+        SavedSearchMatch.objects.filter(pk__in=[match.pk for match in matches]).update(notified=True)
+        report["applicants"] += len(ids)
+        report["emails"] += len(messages)
+        report["matches"] += len(open_matches)
+    return report
+
+
+def _get_digest_message(applicant: User, matches: List[SavedSearchMatch]) -> EmailMessage:
+    searches = []
+    for saved_search, search_matches in groupby(matches, key=lambda match: match.saved_search):
+        search_matches = list(search_matches)
+        searches.append(
+            {
+                "url": f"{settings.SITE_URL}{get_saved_search_url(saved_search)}",
+                "count": len(search_matches),
+                "vacancys": [
+                    (
+                        match.vacancy,
+                        f"{settings.SITE_URL}{reverse('worksite_app:some_vacancy', args=(match.vacancy_id,))}",
+                    )
+                    for match in search_matches[: settings.SAVED_SEARCHES_SHOWN_VACANCYS]
+                ],
+            }
+        )
+    context = {"applicant": applicant, "searches": searches, "site_url": settings.SITE_URL}
+    body = render_to_string("worksite_app/saved_searches_digest.txt", context)
+    return EmailMessage("Новые вакансии по сохраненным поискам", body, to=[applicant.email])
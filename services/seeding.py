@@ -0,0 +1,287 @@
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import Any, Dict, Iterable, List, Literal, NamedTuple, Set, Tuple, Type
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVector
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, models, transaction
+from django.db.models import Max
+
+from home_app.models import ApplicantSettings, CompanySettings
+from services.common_utils import insert_rows
+from worksite_app.constants import EXPERIENCE_CHOICES_VALID_VALUES, FILTERED_CITIES
+from worksite_app.models import Offer, Rating, RatingEligibility, Vacancy
+
+SEED_PASSWORD = "password"
+VACANCY_NAMES = (
+    "Python developer",
+    "Backend developer",
+    "Frontend developer",
+    "Fullstack developer",
+    "Android developer",
+    "QA engineer",
+    "DevOps engineer",
+    "Data analyst",
+    "Data scientist",
+    "Project manager",
+    "Product manager",
+    "System administrator",
+    "UX/UI designer",
+    "Technical writer",
+)
+VACANCY_LEVELS = ("", "Junior ", "Middle ", "Senior ", "Lead ")
+SKILLS = (
+    "Python", "Django", "DRF", "FastAPI", "Celery", "PostgreSQL", "Redis", "Docker", "Kubernetes", "Linux",
+    "Git", "JavaScript", "TypeScript", "React", "Vue", "Kotlin", "Java", "Go", "SQL", "Pandas", "Figma",
+    "CI/CD", "Nginx", "RabbitMQ", "Kafka", "Английский язык",
+)  # fmt: skip
+TEXT = "Синтетические данные для проверки производительности. " * 2
+
+# Доля вакансий в крупных городах, остальные вакансии распределяются между прочими городами поровну
+BIG_CITIES = {
+    "Москва": 30,
+    "Санкт-Петербург": 12,
+    "Новосибирск": 3,
+    "Екатеринбург": 3,
+    "Казань": 3,
+    "Нижний Новгород": 2,
+    "Челябинск": 2,
+    "Самара": 2,
+    "Ростов-на-Дону": 2,
+    "Красноярск": 2,
+}
+EXPERIENCE_WEIGHTS = 15, 20, 35, 20, 10  # в порядке EXPERIENCE_CHOICES
+# Медиана зарплаты по требуемому опыту, зарплаты распределены логнормально вокруг нее
+EXPERIENCE_MEDIAN_MONEY = {"0": 40000, "1": 60000, "2": 100000, "3": 160000, "4": 230000}
+RATING_WEIGHTS = (5, 7, 15, 33, 40)
+SKILLS_PER_VACANCY = 2, 6
+APPLYED_VACANCYS_SHARE = 0.05  # доля вакансий, закрытых принятием одного из откликов
+WITHDRAWN_OFFERS_SHARE = 0.05
+VACANCYS_AGE_DAYS = 90  # вакансии добавлены равномерно за этот период
+# Момент, относительно которого генерируются даты: с текущим временем одинаковый seed давал бы разные данные
+SEED_NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class SeedScale(NamedTuple):
+    """Структура данных с количеством создаваемых объектов каждого типа."""
+
+    companies: int
+    applicants: int
+    vacancys: int
+    offers: int
+    ratings: int
+
+
+def seed_worksite(scale: SeedScale, seed: int = 0, chunk_size: int = 5000, now: datetime = SEED_NOW) -> SeedScale:
+    """
+    Заполнение БД синтетическими компаниями, соискателями, вакансиями, откликами и отзывами пачками по
+    chunk_size (вакансии и отклики вставляются в обход ORM, см. _insert). Даты вакансий и откликов лежат до now,
+    при одинаковых seed и now создаются одинаковые данные. Денормализованные счетчики и оценки компаний считаются
+    во время генерации, поэтому после заполнения они сразу согласованы с данными. Возвращается фактически
+    созданное количество объектов.
+    """
+
+    rng = random.Random(seed)
+    password = make_password(SEED_PASSWORD)  # хеш считается один раз, это самая медленная часть создания
+    companies = _bulk_create(
+        User,
+        (User(username=f"company{i}", first_name=f"Company {i}", password=password) for i in range(scale.companies)),
+        chunk_size,
+    )
+    applicants = _bulk_create(
+        User, (User(username=f"applicant{i}", password=password) for i in range(scale.applicants)), chunk_size
+    )
+
+    vacancys_count: Counter = Counter()
+    offers_count: Counter = Counter()
+    # Число вакансий у компании и откликов на вакансию распределены по Парето: немногие крупные компании
+    # и популярные вакансии дают большую часть данных
+    company_weights = list(accumulate(rng.paretovariate(1.2) for _ in companies))
+    vacancy_weights = [rng.paretovariate(1.5) for _ in range(scale.vacancys)]
+    offers_per_weight = scale.offers / sum(vacancy_weights) if vacancy_weights else 0
+    city_names, city_weights = _get_city_weights()
+    vacancy_id, offer_id = _get_next_id(Vacancy), _get_next_id(Offer)
+    offers_created = 0
+    for chunk_start in range(0, scale.vacancys, chunk_size):
+        weights = vacancy_weights[chunk_start : chunk_start + chunk_size]
+        owners = rng.choices(companies, cum_weights=company_weights, k=len(weights))
+        cities = rng.choices(city_names, cum_weights=city_weights, k=len(weights))
+        vacancys, offers = [], []
+        for company, city, weight in zip(owners, cities, weights):
+            vacancy = _generate_vacancy(rng, vacancy_id, company, city, now)
+            vacancy_offers = _generate_offers(
+                rng, offer_id, vacancy, applicants, min(round(weight * offers_per_weight), len(applicants)), now
+            )
+            vacancys.append(vacancy)
+            offers.extend(vacancy_offers)
+            vacancy_id, offer_id = vacancy_id + 1, offer_id + len(vacancy_offers)
+            if not vacancy["archived"]:
+                vacancys_count[company] += 1
+            for offer in vacancy_offers:
+                offers_count[offer["applicant_id"]] += 1
+        with transaction.atomic():
+            _insert(Vacancy, vacancys)
+            _insert(Offer, offers)
+            if offers and connection.vendor == "postgresql":
+                # поисковый вектор, который для новых откликов заполняет extract_resume_text, одним запросом
+                Offer.objects.filter(pk__range=(offers[0]["id"], offers[-1]["id"])).update(
+                    resume_search_vector=SearchVector("resume_search_text", config=settings.OFFERS_SEARCH_CONFIG)
+                )
+        offers_created += len(offers)
+    _reset_sequences(Vacancy, Offer)
+
+    ratings = _generate_ratings(rng, companies, company_weights, applicants, scale.ratings)
+    _bulk_create(Rating, ratings, chunk_size)
+    _bulk_create(
+        RatingEligibility,
+        (RatingEligibility(company_id=r.company_id, applicant_id=r.applicant_id, consumed=True) for r in ratings),
+        chunk_size,
+    )
+    company_ratings: Dict[int, List[int]] = defaultdict(list)
+    for rating in ratings:
+        company_ratings[rating.company_id].append(rating.rating)
+    _bulk_create(
+        CompanySettings,
+        (
+            CompanySettings(
+                company_id=company,
+                company_description=TEXT,
+                vacancys_count=vacancys_count[company],
+                rating=round(sum(company_ratings[company]) / len(company_ratings[company]), 1)
+                if company_ratings[company]
+                else 0,
+            )
+            for company in companies
+        ),
+        chunk_size,
+    )
+    _bulk_create(
+        ApplicantSettings,
+        (ApplicantSettings(applicant_id=a, offers_count=offers_count[a]) for a in applicants),
+        chunk_size,
+    )
+    return SeedScale(len(companies), len(applicants), scale.vacancys, offers_created, len(ratings))
+
+
+def _generate_vacancy(rng: random.Random, pk: int, company: int, city: str, now: datetime) -> Dict[str, Any]:
+    experience = rng.choices(EXPERIENCE_CHOICES_VALID_VALUES, weights=EXPERIENCE_WEIGHTS)[0]
+    money = rng.lognormvariate(0, 0.35) * EXPERIENCE_MEDIAN_MONEY[experience]
+    return {
+        "id": pk,
+        "company_id": company,
+        "name": VACANCY_LEVELS[int(experience)] + rng.choice(VACANCY_NAMES),
+        "description": TEXT,
+        "money": min(max(round(money, -3), 1000), 1000000),
+        "experience": experience,
+        "city": city,
+        "skills": ", ".join(rng.sample(SKILLS, rng.randint(*SKILLS_PER_VACANCY))),
+        "time_added": now - timedelta(days=rng.random() * VACANCYS_AGE_DAYS),
+    }
+
+
+def _generate_offers(
+    rng: random.Random, first_pk: int, vacancy: Dict[str, Any], applicants: List[int], count: int, now: datetime
+) -> List[Dict[str, Any]]:
+    """
+    Отклики разных соискателей на вакансию (у всех текстовое резюме, см. ограничение only_one_resume).
+    Заодно заполняются счетчик откликов вакансии и ее архивация, если один из откликов принят.
+    """
+
+    offers = []
+    for pk, applicant in enumerate(rng.sample(applicants, count), first_pk):
+        time_added = vacancy["time_added"] + (now - vacancy["time_added"]) * rng.random()
+        withdrawn = rng.random() < WITHDRAWN_OFFERS_SHARE
+        offers.append(
+            {
+                "id": pk,
+                "applicant_id": applicant,
+                "vacancy_id": vacancy["id"],
+                "resume_text": TEXT,
+                "resume_search_text": TEXT,
+                "withdrawn": withdrawn,
+                "time_added": time_added,
+                "time_withdrawn": time_added + (now - time_added) * rng.random() if withdrawn else None,
+            }
+        )
+    active = [offer for offer in offers if not offer["withdrawn"]]
+    vacancy["offers_count"] = len(active)
+    vacancy["archived"] = bool(active) and rng.random() < APPLYED_VACANCYS_SHARE
+    if vacancy["archived"]:
+        applyed = rng.choice(active)
+        applyed["applyed"] = True
+        applyed["time_applyed"] = vacancy["time_closed"] = applyed["time_added"] + (now - applyed["time_added"]) / 2
+    return offers
+
+
+def _generate_ratings(
+    rng: random.Random, companies: List[int], company_weights: List[float], applicants: List[int], count: int
+) -> List[Rating]:
+    """
+    Отзывы разных соискателей на компании, у крупных компаний отзывов больше. Отзывов создается не больше
+    половины возможных пар, иначе выборка с отбрасыванием повторов завершалась бы слишком долго.
+    """
+
+    count = min(count, len(companies) * len(applicants) // 2)
+    pairs: Set[Tuple[int, int]] = set()
+    ratings = []
+    while len(ratings) < count:
+        company = rng.choices(companies, cum_weights=company_weights)[0]
+        applicant = rng.choice(applicants)
+        if (company, applicant) in pairs:
+            continue
+        pairs.add((company, applicant))
+        rating = rng.choices((1, 2, 3, 4, 5), weights=RATING_WEIGHTS)[0]
+        ratings.append(Rating(company_id=company, applicant_id=applicant, rating=rating, comment=TEXT))
+    return ratings
+
+
+def _get_city_weights() -> Tuple[List[str], List[float]]:
+    cities = FILTERED_CITIES[1:]  # первый город - значение фильтра "Любой"
+    other_weight = (100 - sum(BIG_CITIES.values())) / (len(cities) - len(BIG_CITIES))
+    return cities, list(accumulate(BIG_CITIES.get(city, other_weight) for city in cities))
+
+
+def _insert(model: Type[models.Model], rows: List[Dict[str, Any]]) -> Literal[None]:
+    """
+    Вставка строк в обход ORM: bulk_create вызывает pre_save и ищет подключение к БД для каждого поля
+    каждого объекта, что при миллионах строк занимает большую часть времени. Непереданные поля получают
+    значения по умолчанию.
+    """
+
+    db = connections[DEFAULT_DB_ALIAS]
+    fields = model._meta.concrete_fields
+    defaults = [field.get_default() for field in fields]
+    values = (
+        [field.get_db_prep_save(row.get(field.attname, default), db) for field, default in zip(fields, defaults)]
+        for row in rows
+    )
+    insert_rows(model, [field.column for field in fields], values)
+
+
+def _get_next_id(model: Type[models.Model]) -> int:
+    return (model.objects.aggregate(max_id=Max("pk"))["max_id"] or 0) + 1
+
+
+def _reset_sequences(*model_classes: Type[models.Model]) -> Literal[None]:
+    """Сдвиг последовательностей первичных ключей после вставки строк с явными id (нужно в PostgreSQL)."""
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), model_classes):
+            cursor.execute(sql)
+
+
+def _bulk_create(model: Type[models.Model], objects: Iterable[models.Model], chunk_size: int) -> List[int]:
+    """Создание объектов пачками. Возвращаются только id, чтобы не держать в памяти все созданные объекты."""
+
+    pks: List[int] = []
+    objects = iter(objects)
+    while chunk := list(islice(objects, chunk_size)):
+        with transaction.atomic():
+            model.objects.bulk_create(chunk)
+        pks.extend(obj.pk for obj in chunk)
+    return pks
@@ -0,0 +1,229 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from scipy import sparse
+
+from worksite_app.constants import EXPERIENCE_CHOICES
+from worksite_app.models import SimilarVacancy, Vacancy
+
+TOKEN_RE = re.compile(r"[\w+#]+")
+# Зарплата переводится в логарифмическую шкалу с шагом в пол-октавы (в 1.41 раза), соседние шаги тоже похожи
+MONEY_STEPS_PER_OCTAVE = 2
+MONEY_MAX_STEP = math.ceil(math.log2(1000000) * MONEY_STEPS_PER_OCTAVE) + 1
+
+VacancyRow = Tuple[int, str, str, str, str, str, int]
+
+
+class VacancyVectors(NamedTuple):
+    """Структура данных с признаками вакансий: id вакансий и матрица, строки которой нормированы (по L2)."""
+
+    ids: np.ndarray
+    matrix: sparse.csr_matrix
+
+
+class Neighbors(NamedTuple):
+    vacancy: int
+    similar: np.ndarray  # id похожих вакансий по убыванию сходства
+    scores: np.ndarray
+
+
+def get_live_vacancys() -> QuerySet[Vacancy]:
+    return Vacancy.objects.filter(archived=False, deleted=False)
+
+
+def get_vacancy_rows(queryset: QuerySet[Vacancy]) -> Iterator[VacancyRow]:
+    fields = "pk", "name", "description", "skills", "city", "experience", "money"
+    return queryset.order_by("pk").values_list(*fields).iterator(chunk_size=settings.SIMILAR_VACANCYS_BLOCK_SIZE)
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if len(token) > 1 and not token.isdigit()]
+
+
+def _get_terms(name: str, description: str, skills: str) -> Counter:
+    """Термины вакансии: слова названия (с двойным весом), описания и навыки целиком."""
+
+    terms = Counter(_tokenize(description or ""))
+    for token in _tokenize(name):
+        terms[token] += 2
+    terms.update(f"skill:{skill.strip().lower()}" for skill in (skills or "").split(",") if skill.strip())
+    return terms
+
+
+def _normalize(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def build_vectors(rows: Iterable[VacancyRow]) -> VacancyVectors:
+    """
+    Построение признаков вакансий: TF-IDF по названию, описанию и навыкам, город, опыт и зарплата. Каждая группа
+    признаков нормируется отдельно и умножается на свой вес из SIMILAR_VACANCYS_WEIGHTS, поэтому скалярное
+    произведение строк итоговой матрицы - косинусное сходство вакансий.
+    """
+
+    vocabulary: Dict[str, int] = {}
+    cities: Dict[str, int] = {}
+    ids, indptr, indices, counts = [], [0], [], []
+    city_columns, experience_columns, money_positions = [], [], []
+    for pk, name, description, skills, city, experience, money in rows:
+        for term, count in _get_terms(name, description, skills).items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            counts.append(count)
+        ids.append(pk)
+        indptr.append(len(indices))
+        city_columns.append(cities.setdefault(city, len(cities)))
+        experience_columns.append(int(experience))
+        money_positions.append(math.log2(max(money, 1)) * MONEY_STEPS_PER_OCTAVE)
+
+    n = len(ids)
+    text = sparse.csr_matrix(
+        (1 + np.log(np.array(counts, dtype=np.float32)), np.array(indices, dtype=np.int32), np.array(indptr)),
+        shape=(n, len(vocabulary)),
+        dtype=np.float32,
+    )
+    document_frequency = np.bincount(text.indices, minlength=len(vocabulary))
+    text = text @ sparse.diags((np.log((1 + n) / (1 + document_frequency)) + 1).astype(np.float32))
+
+    rows_range = np.arange(n)
+    city = sparse.csr_matrix((np.ones(n, dtype=np.float32), (rows_range, city_columns)), shape=(n, max(len(cities), 1)))
+    experience = sparse.csr_matrix(
+        (np.ones(n, dtype=np.float32), (rows_range, experience_columns)), shape=(n, len(EXPERIENCE_CHOICES))
+    )
+    # зарплата - два соседних шага шкалы с весами по близости к ним
+    positions = np.array(money_positions, dtype=np.float32)
+    steps = np.floor(positions).astype(np.int32)
+    fractions = positions - steps
+    money = sparse.csr_matrix(
+        (np.concatenate((1 - fractions, fractions)), (np.tile(rows_range, 2), np.concatenate((steps, steps + 1)))),
+        shape=(n, MONEY_MAX_STEP + 1),
+    )
+
+    groups = {"text": text, "city": city, "experience": experience, "money": money}
+    weights = settings.SIMILAR_VACANCYS_WEIGHTS
+    matrix = sparse.hstack([_normalize(group) * weights[name] for name, group in groups.items()], format="csr")
+    return VacancyVectors(np.array(ids, dtype=np.int64), _normalize(matrix).astype(np.float32))
+
+
+def _get_scores(vectors: VacancyVectors, rows: np.ndarray) -> np.ndarray:
+    """
+    Сходства вакансий строк rows со всеми вакансиями. Строки блока переводятся в плотную матрицу: произведение
+    разреженной матрицы на плотную намного быстрее произведения двух разреженных с почти плотным результатом.
+    """
+
+    return (vectors.matrix @ vectors.matrix[rows].T.toarray()).T
+
+
+def get_neighbors(vectors: VacancyVectors, rows: np.ndarray, count: int) -> Iterator[Neighbors]:
+    """
+    Ближайшие count вакансий для строк rows матрицы. Сходства считаются блоками по SIMILAR_VACANCYS_BLOCK_SIZE
+    строк, чтобы в памяти была только плотная матрица блок x все вакансии.
+    """
+
+    k = min(count, len(vectors.ids) - 1)
+    if k <= 0:
+        return
+    for start in range(0, len(rows), settings.SIMILAR_VACANCYS_BLOCK_SIZE):
+        block = rows[start : start + settings.SIMILAR_VACANCYS_BLOCK_SIZE]
+        scores = _get_scores(vectors, block)
+        scores[np.arange(len(block)), block] = -1  # вакансия не похожа сама на себя
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+        for row, similar, similar_scores in zip(block, top, top_scores):
+            found = similar_scores >= settings.SIMILAR_VACANCYS_MIN_SCORE
+            yield Neighbors(int(vectors.ids[row]), vectors.ids[similar[found]], similar_scores[found])
+
+
+def save_neighbors(neighbors: Iterable[Neighbors]) -> int:
+    """
+    Замена списков похожих вакансий пачками по SIMILAR_VACANCYS_BLOCK_SIZE вакансий, вакансии отмечаются
+    посчитанными. Возвращает их число.
+    """
+
+    saved = 0
+    neighbors = iter(neighbors)
+    while batch := [n for _, n in zip(range(settings.SIMILAR_VACANCYS_BLOCK_SIZE), neighbors)]:
+        with transaction.atomic():
+            ids = [n.vacancy for n in batch]
+            SimilarVacancy.objects.filter(vacancy__in=ids).delete()
+            SimilarVacancy.objects.bulk_create(
+                SimilarVacancy(vacancy_id=n.vacancy, similar_id=int(similar), position=position, score=float(score))
+                for n in batch
+                for position, (similar, score) in enumerate(zip(n.similar, n.scores))
+            )
+            Vacancy.objects.filter(pk__in=ids, similar_computed=False).update(similar_computed=True)
+        saved += len(batch)
+    return saved
+
+
+def update_similar_vacancys(full: bool = False) -> Dict[str, int]:
+    """
+    Обновление похожих вакансий. Признаки (и IDF) всегда строятся по всем открытым вакансиям, а сходства
+    считаются при full для всех вакансий, иначе - только для новых (еще не отмеченных similar_computed, в том
+    числе оставшихся без похожих). Новые вакансии при этом добавляются и в списки старых вакансий, если
+    попадают в их число ближайших.
+    """
+
+    live = get_live_vacancys()
+    vectors = build_vectors(get_vacancy_rows(live))
+    count = settings.SIMILAR_VACANCYS_COUNT
+    if full:
+        # списки закрытых вакансий больше не обновляются и не нужны
+        SimilarVacancy.objects.filter(Q(vacancy__archived=True) | Q(vacancy__deleted=True)).delete()
+        updated = save_neighbors(get_neighbors(vectors, np.arange(len(vectors.ids)), count))
+        return {"vacancys": updated, "new": 0}
+
+    new_ids = live.filter(similar_computed=False).values_list("pk", flat=True)
+    rows = np.flatnonzero(np.isin(vectors.ids, np.fromiter(new_ids, dtype=np.int64)))
+    new_neighbors = list(get_neighbors(vectors, rows, count))
+    updated = save_neighbors(new_neighbors) + save_neighbors(_merge_new_neighbors(vectors, rows, count))
+    return {"vacancys": updated, "new": len(rows)}
+
+
+def _merge_new_neighbors(vectors: VacancyVectors, new_rows: np.ndarray, count: int) -> Iterator[Neighbors]:
+    """
+    Списки похожих старых вакансий, в которые попадает новая вакансия. В список добавляется только самая похожая
+    из новых вакансий: между полными пересчетами новых вакансий немного, а неточность исправит полный пересчет.
+    """
+
+    if not len(new_rows) or len(vectors.ids) < 2:
+        return
+    # наибольшее сходство каждой вакансии с новыми вакансиями и сама эта новая вакансия
+    best_scores = np.full(len(vectors.ids), -1, dtype=np.float32)
+    best_rows = np.zeros(len(vectors.ids), dtype=np.int64)
+    for start in range(0, len(new_rows), settings.SIMILAR_VACANCYS_BLOCK_SIZE):
+        block = new_rows[start : start + settings.SIMILAR_VACANCYS_BLOCK_SIZE]
+        scores = _get_scores(vectors, block)
+        scores[:, new_rows] = -1  # списки новых вакансий уже посчитаны
+        top = scores.argmax(axis=0)
+        top_scores = scores[top, np.arange(scores.shape[1])]
+        better = top_scores > best_scores
+        best_scores[better], best_rows[better] = top_scores[better], block[top[better]]
+
+    lists = _get_current_lists(vectors.ids[best_scores >= settings.SIMILAR_VACANCYS_MIN_SCORE])
+    for row in np.flatnonzero(best_scores >= settings.SIMILAR_VACANCYS_MIN_SCORE):
+        vacancy, candidate = int(vectors.ids[row]), int(vectors.ids[best_rows[row]])
+        current = lists.get(vacancy, [])
+        if len(current) >= count and current[-1][1] >= best_scores[row]:
+            continue
+        merged = sorted(current + [(candidate, float(best_scores[row]))], key=lambda item: -item[1])[:count]
+        yield Neighbors(vacancy, np.array([s for s, _ in merged]), np.array([score for _, score in merged]))
+
+
+def _get_current_lists(vacancy_ids: np.ndarray) -> Dict[int, List[Tuple[int, float]]]:
+    lists: Dict[int, List[Tuple[int, float]]] = {}
+    for start in range(0, len(vacancy_ids), settings.SIMILAR_VACANCYS_BLOCK_SIZE):
+        ids = vacancy_ids[start : start + settings.SIMILAR_VACANCYS_BLOCK_SIZE].tolist()
+        queryset = SimilarVacancy.objects.filter(vacancy__in=ids).order_by("vacancy", "position")
+        for vacancy, similar, score in queryset.values_list("vacancy", "similar", "score"):
+            lists.setdefault(vacancy, []).append((similar, score))
+    return lists
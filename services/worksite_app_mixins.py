@@ -1,12 +1,17 @@
-from typing import Any, Dict, Literal, NoReturn, Optional, Tuple, Type, Union
+import re
+from collections import defaultdict
+from functools import partial
+from typing import Any, Dict, List, Literal, NamedTuple, NoReturn, Optional, Tuple, Type, Union
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.postgres.search import SearchQuery
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
-from django.db import IntegrityError, models, transaction
-from django.db.models import Avg, Q
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Avg, Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 from django.http import Http404, HttpRequest
 from django.shortcuts import get_object_or_404
@@ -14,46 +19,210 @@ from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.request import Request
 
-from error_messages.worksite_error_messages import OfferErrors, RatingErrors, VacancyErrors
+from error_messages.errors import E
+from error_messages.worksite_error_messages import (
+    BulkErrors,
+    OfferErrors,
+    RatingErrors,
+    SavedSearchErrors,
+    VacancyErrors,
+)
+from home_app.models import ApplicantSettings, CompanySettings
 from services.common_utils import (
     DefaultPOSTReturn,
+    QuerySetChain,
     RequestHost,
+    change_counter,
+    change_counters,
     check_is_user_company,
+    delete_user_settings_cache,
     get_error_field,
     get_user_settings,
 )
+from services.metrics import CacheName, observe_cache_lookup
+from services.saved_searches import get_search_key
+from tasks.worksite_app_tasks import extract_resume_text
 from worksite_app.constants import EXPERIENCE_CHOICES_VALID_VALUES, FILTERED_CITIES
-from worksite_app.models import Offer, Rating, Vacancy
+from worksite_app.models import (
+    ArchivedOffer,
+    ArchivedVacancy,
+    Offer,
+    Rating,
+    RatingEligibility,
+    SavedSearch,
+    SavedSearchMatch,
+    SimilarVacancy,
+    Vacancy,
+)
 
 Instance = models.Model
 ValidationClass = Union[Type[serializers.ModelSerializer] | Type[forms.ModelForm]]
 
 
+class BulkItemResult(NamedTuple):
+    """Структура данных с результатом обработки одного объекта из пачки bulk-запроса."""
+
+    index: int
+    id: Optional[int] = None
+    error: Optional[E] = None
+
+
+def check_bulk_items(items: List, item_type: Type) -> Optional[E]:
+    """Проверка пачки объектов bulk-запроса целиком (тип, непустота, размер)."""
+
+    if not isinstance(items, list) or not items:
+        return BulkErrors["items"]
+    if len(items) > settings.API_BULK_MAX_ITEMS:
+        return BulkErrors["size"]
+    if not all(isinstance(item, item_type) and not isinstance(item, bool) for item in items):
+        return BulkErrors["items"]
+    return None
+
+
 def get_company_ratings(company: User) -> QuerySet:
     cache_ratings_name = f"{company.pk}{settings.CACHE_NAMES_DELIMITER}{settings.COMPANY_RATINGS_CACHE_NAME}"
     queryset = cache.get(cache_ratings_name)
+    observe_cache_lookup(CacheName.COMPANY_RATINGS, queryset is not None)
     if not queryset:
         queryset = Rating.objects.filter(company=company).select_related("applicant")
         cache.set(cache_ratings_name, queryset, 60 * 60 * 24)
     return queryset
 
 
+def get_similar_vacancys(vacancy_id: int) -> List[Vacancy]:
+    """
+    Открытые вакансии, похожие на вакансию (рассчитываются фоновой задачей update_similar_vacancys), одним
+    запросом по индексу ограничения unique_similar_vacancy_position.
+    """
+
+    similar = (
+        SimilarVacancy.objects.filter(vacancy_id=vacancy_id, similar__archived=False, similar__deleted=False)
+        .select_related("similar", "similar__company")
+        .only(
+            *(f"similar__{field}" for field in ("name", "money", "experience", "city")),
+            "similar__company__username",
+            "similar__company__first_name",
+        )
+        .order_by("position")
+    )
+    return [s.similar for s in similar]
+
+
+class VacancyDetail(NamedTuple):
+    """Структура данных со всем необходимым для отображения конкретной вакансии, полученным одним запросом."""
+
+    vacancy: Vacancy | ArchivedVacancy
+    company_settings: CompanySettings
+    company_ratings_count: int
+    viewer_offer_exists: bool
+    viewer_timezone: str | Literal[False]
+
+
 class CheckPermissionsToSeeVacancy(object):
     """Проверка прав на просмотр конкретной вакансии."""
 
+    # Поля настроек компании, подтягиваемые в запрос вакансии подзапросами
+    company_settings_fields = (
+        "id",
+        "timezone",
+        "company_logo",
+        "company_description",
+        "company_site",
+        "rating",
+        "vacancys_count",
+    )
+
     @staticmethod
-    def check_perms(request: HttpRequest | Request, ids: int) -> Vacancy | NoReturn:
-        try:
-            vacancy = Vacancy.objects.select_related("company").get(pk=ids)
-        except ObjectDoesNotExist:
+    def check_perms(request: HttpRequest | Request, ids: int) -> Vacancy | ArchivedVacancy | NoReturn:
+        """Проверка без подзапросов load(). Если вакансии нет в основной таблице, она ищется среди архивных."""
+
+        for vacancy_model, offer_model in ((Vacancy, Offer), (ArchivedVacancy, ArchivedOffer)):
+            vacancy = vacancy_model.objects.select_related("company").filter(pk=ids).first()
+            if vacancy is not None:
+                break
+        else:
+            raise Http404
+        if vacancy.deleted:
             raise Http404
         if vacancy.archived:
-            applicant = Offer.objects.select_related("applicant").get(vacancy=vacancy, applyed=True).applicant
-            if not (vacancy.company == request.user or request.user == applicant):
+            applicant = offer_model.objects.filter(vacancy=vacancy, applyed=True).values_list("applicant", flat=True)
+            if request.user.pk not in (vacancy.company_id, applicant.first()):
+                raise Http404
+        return vacancy
+
+    @staticmethod
+    def load(request: HttpRequest | Request, ids: int) -> VacancyDetail | NoReturn:
+        """
+        Загрузка вакансии с компанией, ее настройками и состоянием текущего пользователя одним запросом.
+        Если вакансии нет в основной таблице, она ищется среди перенесенных в архив. Нужна только странице
+        вакансии и API вакансии, для проверки прав достаточно check_perms.
+        """
+
+        try:
+            vacancy = CheckPermissionsToSeeVacancy._get_queryset(request.user, Vacancy, Offer).get(pk=ids)
+        except ObjectDoesNotExist:
+            try:
+                queryset = CheckPermissionsToSeeVacancy._get_queryset(request.user, ArchivedVacancy, ArchivedOffer)
+                vacancy = queryset.get(pk=ids)
+            except ObjectDoesNotExist:
                 raise Http404
+        if vacancy.archived and request.user.pk not in (vacancy.company_id, vacancy.applyed_applicant_id):
+            raise Http404
         if vacancy.deleted:
             raise Http404
-        return vacancy
+        return VacancyDetail(
+            vacancy,
+            CheckPermissionsToSeeVacancy.get_company_settings(vacancy),
+            vacancy.company_ratings_count,
+            getattr(vacancy, "viewer_offer_exists", False),
+            getattr(vacancy, "viewer_timezone", None) or False,
+        )
+
+    @staticmethod
+    def _get_queryset(
+        user: User | AnonymousUser,
+        vacancy_model: Type[Vacancy | ArchivedVacancy],
+        offer_model: Type[Offer | ArchivedOffer],
+    ) -> QuerySet:
+        ratings = Rating.objects.filter(company=OuterRef("company")).order_by().values("company")
+        annotations = CheckPermissionsToSeeVacancy.get_company_settings_annotations()
+        annotations["company_ratings_count"] = Coalesce(Subquery(ratings.annotate(c=Count("pk")).values("c")), 0)
+        annotations["applyed_applicant_id"] = Subquery(
+            offer_model.objects.filter(vacancy=OuterRef("pk"), applyed=True).values("applicant")[:1]
+        )
+        if user.is_authenticated:
+            offers = offer_model.objects.filter(vacancy=OuterRef("pk"), applicant=user)
+            annotations["viewer_offer_exists"] = Exists(offers)
+            model, field = (
+                (CompanySettings, "company") if check_is_user_company(user) else (ApplicantSettings, "applicant")
+            )
+            annotations["viewer_timezone"] = Subquery(model.objects.filter(**{field: user}).values("timezone")[:1])
+        return vacancy_model.objects.select_related("company").annotate(**annotations)
+
+    @staticmethod
+    def get_company_settings_annotations() -> Dict[str, Subquery]:
+        """Подзапросы полей настроек компании для аннотации запроса вакансий (см. get_company_settings)."""
+
+        company_settings = CompanySettings.objects.filter(company=OuterRef("company"))
+        return {
+            f"company_settings_{field}": Subquery(company_settings.values(field)[:1])
+            for field in CheckPermissionsToSeeVacancy.company_settings_fields
+        }
+
+    @staticmethod
+    def get_company_settings(vacancy: Vacancy | ArchivedVacancy) -> CompanySettings:
+        values = [
+            getattr(vacancy, f"company_settings_{f}") for f in CheckPermissionsToSeeVacancy.company_settings_fields
+        ]
+        if values[0] is None:
+            return get_user_settings(vacancy.company)
+        company_s = CompanySettings.from_db(
+            CompanySettings.objects.db,
+            ["company_id", *CheckPermissionsToSeeVacancy.company_settings_fields],
+            [vacancy.company_id, *values],
+        )
+        company_s.company = vacancy.company
+        return company_s
 
 
 class CheckPermissionsToSeeVacancyOffersAndDeleteVacancy(object):
@@ -69,6 +238,22 @@ class CheckPermissionsToSeeVacancyOffersAndDeleteVacancy(object):
         return vacancy
 
 
+class CheckPermissionsToSeeResume(object):
+    """Проверка прав на просмотр файла с резюме (автор оффера или компания, разместившая вакансию)."""
+
+    @staticmethod
+    def check_perms(request: HttpRequest | Request, ids: int) -> Offer | ArchivedOffer | NoReturn:
+        offer = (
+            Offer.objects.select_related("vacancy").filter(pk=ids).first()
+            or ArchivedOffer.objects.select_related("vacancy").filter(pk=ids).first()
+        )
+        if offer is None or not offer.resume:
+            raise Http404
+        if request.user.pk not in (offer.applicant_id, offer.vacancy.company_id):
+            raise PermissionDenied
+        return offer
+
+
 class VacancySearchMixin(object):
     """Миксин для составления запроса (класс Q()) на icontains поиск по определенным полям вакансии."""
 
@@ -131,6 +316,172 @@ class VacancyFilterMixin(object):
         return {}
 
 
+class SavedSearchMixin(VacancyFilterMixin, VacancySearchMixin):
+    """
+    Миксин для сохраненных поисков соискателя. Сохраняются только те параметры поиска, которые применяются
+    в filter и search, поэтому сохраненный поиск находит те же вакансии, что и поиск на главной странице.
+    """
+
+    def save_search(self, applicant: User | AnonymousUser, params: Dict[str, str]) -> DefaultPOSTReturn:
+        self.check_perms(applicant)
+        saved_search = self.get_saved_search(params)
+        if not saved_search.params:
+            return DefaultPOSTReturn(False, SavedSearchErrors["params"])
+        if len(saved_search.search) > SavedSearch._meta.get_field("search").max_length:
+            return DefaultPOSTReturn(False, SavedSearchErrors["search"])
+        if SavedSearch.objects.filter(applicant=applicant).count() >= settings.SAVED_SEARCHES_MAX_COUNT:
+            return DefaultPOSTReturn(False, SavedSearchErrors["count"])
+        saved_search.applicant = applicant
+        saved_search.save()
+        return DefaultPOSTReturn(saved_search)
+
+    def get_saved_search(self, params: Dict[str, str]) -> SavedSearch:
+        """Несохраненный объект поиска с параметрами поиска и разобранными из них условиями."""
+
+        kwargs = self.filter(params)
+        search_fields = [field for field in self.search_fields if params.get(f"{field}_search", None)]
+        search = (params.get("search", None) or "") if search_fields else ""
+        saved = {}
+        if "city" in kwargs:
+            saved["city"] = kwargs["city"]
+        if "money__gte" in kwargs:
+            saved["celery_from"] = str(kwargs["money__gte"])
+        if "money__lte" in kwargs:
+            saved["celery_to"] = str(kwargs["money__lte"])
+        saved |= {f"ex{ex}": "on" for ex in kwargs.get("experience__in", ())}
+        if search:
+            saved |= {"search": search} | {f"{field}_search": "on" for field in search_fields}
+        return SavedSearch(
+            params=saved,
+            city=kwargs.get("city", ""),
+            money_from=kwargs.get("money__gte", None),
+            money_to=kwargs.get("money__lte", None),
+            experience="".join(kwargs.get("experience__in", ())),
+            search=search,
+            search_fields=",".join(search_fields) if search else "",
+            search_key=get_search_key(search),
+        )
+
+    @staticmethod
+    def get_saved_searches(applicant: User) -> List[SavedSearch]:
+        """Сохраненные поиски соискателя с последними подошедшими к ним вакансиями (атрибут latest_matches)."""
+
+        latest_matches = SavedSearchMatch.objects.filter(vacancy__archived=False, vacancy__deleted=False)
+        latest_matches = latest_matches.select_related("vacancy").order_by("-time_added", "-pk")
+        return list(
+            SavedSearch.objects.filter(applicant=applicant).prefetch_related(
+                models.Prefetch(
+                    "matches",
+                    latest_matches[: settings.SAVED_SEARCHES_SHOWN_VACANCYS],
+                    to_attr="latest_matches",
+                )
+            )
+        )
+
+    def delete_saved_search(self, applicant: User | AnonymousUser, ids: int) -> Literal[None] | NoReturn:
+        self.check_perms(applicant)
+        deleted, _ = SavedSearch.objects.filter(pk=ids, applicant=applicant).delete()
+        if not deleted:
+            raise Http404
+
+    @staticmethod
+    def check_perms(applicant: User | AnonymousUser) -> Literal[None] | NoReturn:
+        if not applicant.is_authenticated or check_is_user_company(applicant):
+            raise PermissionDenied
+
+
+class OfferQueryNode(NamedTuple):
+    """Узел дерева разобранного поискового запроса по откликам."""
+
+    operator: Literal["and", "or", "not", "word", "phrase"]
+    operands: Tuple["OfferQueryNode", ...] = ()
+    value: str = ""
+
+
+class OfferSearchMixin(object):
+    """
+    Миксин для полнотекстового поиска по откликам на вакансию. Поддерживает операторы AND, OR, NOT, скобки
+    и "фразы в кавычках"; соседние слова без оператора объединяются через AND.
+    """
+
+    search_param = "q"
+    _token_pattern = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+    def search_offers(self, queryset: QuerySet, params: Dict[str, str]) -> QuerySet:
+        query = params.get(self.search_param, None)
+        tree = self.parse_offers_query(query) if query else None
+        if tree is None:
+            return queryset
+        if connection.vendor == "postgresql":
+            return queryset.filter(resume_search_vector=self._to_search_query(tree))
+        return queryset.filter(self._to_q(tree))
+
+    def parse_offers_query(self, query: str) -> Optional[OfferQueryNode]:
+        tokens = self._token_pattern.findall(query)
+        tree, i = self._parse_or(tokens, 0)
+        while i < len(tokens):  # непарные закрывающие скобки пропускаются
+            right, i = self._parse_or(tokens, i + 1)
+            tree = self._combine("and", tree, right)
+        return tree
+
+    def _parse_or(self, tokens: List[str], i: int) -> Tuple[Optional[OfferQueryNode], int]:
+        left, i = self._parse_and(tokens, i)
+        while i < len(tokens) and tokens[i] == "OR":
+            right, i = self._parse_and(tokens, i + 1)
+            left = self._combine("or", left, right)
+        return left, i
+
+    def _parse_and(self, tokens: List[str], i: int) -> Tuple[Optional[OfferQueryNode], int]:
+        left = None
+        while i < len(tokens) and tokens[i] not in ("OR", ")"):
+            if tokens[i] == "AND":
+                i += 1
+                continue
+            right, i = self._parse_not(tokens, i)
+            left = self._combine("and", left, right)
+        return left, i
+
+    def _parse_not(self, tokens: List[str], i: int) -> Tuple[Optional[OfferQueryNode], int]:
+        token = tokens[i] if i < len(tokens) else ")"
+        if token in ("AND", "OR", ")"):
+            return None, i
+        if token == "NOT":
+            operand, i = self._parse_not(tokens, i + 1)
+            return (OfferQueryNode("not", (operand,)) if operand else None), i
+        if token == "(":
+            node, i = self._parse_or(tokens, i + 1)
+            return node, i + 1 if i < len(tokens) and tokens[i] == ")" else i
+        if token.startswith('"'):
+            phrase = token.strip('"').strip()
+            return (OfferQueryNode("phrase", value=phrase) if phrase else None), i + 1
+        return OfferQueryNode("word", value=token), i + 1
+
+    @staticmethod
+    def _combine(
+        operator: Literal["and", "or"], left: Optional[OfferQueryNode], right: Optional[OfferQueryNode]
+    ) -> Optional[OfferQueryNode]:
+        if left is None or right is None:
+            return left or right
+        return OfferQueryNode(operator, (left, right))
+
+    def _to_search_query(self, node: OfferQueryNode) -> SearchQuery:
+        if node.operator in ("word", "phrase"):
+            search_type = "plain" if node.operator == "word" else "phrase"
+            return SearchQuery(node.value, config=settings.OFFERS_SEARCH_CONFIG, search_type=search_type)
+        operands = [self._to_search_query(operand) for operand in node.operands]
+        if node.operator == "not":
+            return ~operands[0]
+        return operands[0] & operands[1] if node.operator == "and" else operands[0] | operands[1]
+
+    def _to_q(self, node: OfferQueryNode) -> Q:
+        if node.operator in ("word", "phrase"):
+            return Q(resume_search_text__icontains=node.value)
+        operands = [self._to_q(operand) for operand in node.operands]
+        if node.operator == "not":
+            return ~operands[0]
+        return operands[0] & operands[1] if node.operator == "and" else operands[0] | operands[1]
+
+
 class DataValidationMixin(object):
     """Класс для валидации через форму/сериализатор полученной от пользователя информации."""
 
@@ -163,6 +514,22 @@ class DataValidationMixin(object):
             )
         raise TypeError(f"Invalid validation class: {validation_class}")
 
+    @staticmethod
+    def save_fields(validator_object: Any, update_fields: Tuple[str, ...]) -> Instance:
+        """
+        Сохранение провалидированного объекта только по полям update_fields. Полное сохранение перезаписало бы
+        денормализованные счетчики значениями из (возможно, закешированного) объекта.
+        """
+
+        if isinstance(validator_object, forms.ModelForm):
+            instance = validator_object.save(commit=False)
+        else:
+            instance = validator_object.instance
+            for field, value in validator_object.validated_data.items():
+                setattr(instance, field, value)
+        instance.save(update_fields=update_fields)
+        return instance
+
     def get_data_to_serializer(self, data: Dict, files: Dict) -> Dict:  # должен быть переопределен
         """
         При использовании сериализатора в качестве валидатора функция должна возвращать данные,
@@ -181,7 +548,10 @@ class AddVacancyMixin(DataValidationMixin):
     def add_vacancy(self, data: Dict, author: User | AnonymousUser) -> DefaultPOSTReturn:
         v, is_valid, data_ = self.validate_received_data(data, {}, instance=Vacancy(company=author))
         if is_valid:
-            v.save()
+            with transaction.atomic():
+                v.save()
+                change_counter(CompanySettings.objects.filter(company=author), "vacancys_count", 1)
+            delete_user_settings_cache(author.pk)
             return DefaultPOSTReturn(True)
         return DefaultPOSTReturn(False, VacancyErrors[get_error_field(self.request_host, v)])
 
@@ -211,7 +581,12 @@ class AddOfferMixin(DataValidationMixin):
             try:
                 if v.instance.resume_text == "":
                     v.instance.resume_text = None
-                v.save()
+                with transaction.atomic():
+                    v.save()
+                    change_counter(Vacancy.objects.filter(pk=vacancy.pk), "offers_count", 1)
+                    change_counter(ApplicantSettings.objects.filter(applicant=applicant), "offers_count", 1)
+                    transaction.on_commit(partial(extract_resume_text.delay, v.instance.pk))
+                delete_user_settings_cache(applicant.pk)
                 return DefaultPOSTReturn(True)
             except IntegrityError:
                 return DefaultPOSTReturn(False, OfferErrors["vacancy"])
@@ -219,13 +594,19 @@ class AddOfferMixin(DataValidationMixin):
 
     @staticmethod
     def check_perms(
-        applicant: User | AnonymousUser, vacancy: Vacancy, raise_exception: Optional[bool] = True
+        applicant: User | AnonymousUser,
+        vacancy: Vacancy,
+        raise_exception: Optional[bool] = True,
+        offers_exists: Optional[bool] = None,
     ) -> bool | NoReturn:
         if vacancy.archived or vacancy.deleted:
             if raise_exception:
                 raise Http404
             return False
-        offers_exists = Offer.objects.filter(vacancy=vacancy, applicant=applicant).exists()
+        if offers_exists is None:
+            offers_exists = applicant.is_authenticated and (
+                Offer.objects.filter(vacancy=vacancy, applicant=applicant).exists()
+            )
         if not applicant.is_authenticated or check_is_user_company(applicant) or offers_exists:
             if raise_exception:
                 raise PermissionDenied
@@ -251,12 +632,16 @@ class AddRatingMixin(DataValidationMixin):
 
         if is_valid:
             with transaction.atomic():
+                # условное обновление не дает двум параллельным запросам оставить два отзыва
+                eligibility = RatingEligibility.objects.filter(applicant=applicant, company=company, consumed=False)
+                if not eligibility.update(consumed=True):
+                    raise PermissionDenied
                 v.save()
                 company_s = get_user_settings(company)
-                rating = Rating.objects.aggregate(Avg("rating"))["rating__avg"]
+                rating = Rating.objects.filter(company=company).aggregate(Avg("rating"))["rating__avg"]
                 company_s.rating = round(rating, 2)
-                company_s.save()
-            cache.delete(f"{company.pk}{settings.CACHE_NAMES_DELIMITER}{settings.USER_SETTINGS_CACHE_NAME}")
+                company_s.save(update_fields=("rating",))
+            delete_user_settings_cache(company.pk)
             return DefaultPOSTReturn(company)
         return DefaultPOSTReturn(False, RatingErrors[get_error_field(self.request_host, v)])
 
@@ -264,14 +649,7 @@ class AddRatingMixin(DataValidationMixin):
     def check_perms(applicant: User | AnonymousUser, company: User) -> bool:
         if (not applicant.is_authenticated) or check_is_user_company(applicant):
             return False
-        offer = Offer.objects.filter(
-            vacancy__in=Vacancy.objects.filter(company=company).all(), applyed=True, applicant=applicant
-        ).exists()
-        if offer:
-            rating = Rating.objects.filter(applicant=applicant, company=company).exists()
-            if not rating:
-                return True
-        return False
+        return RatingEligibility.objects.filter(applicant=applicant, company=company, consumed=False).exists()
 
     def get_data_to_serializer(self, data: Dict, files: Dict) -> Dict:
         return data
@@ -284,8 +662,17 @@ class ApplyOfferMixin(object):
         offer = ApplyOfferMixin.check_perms(request, ids)
         offer.applyed = offer.vacancy.archived = True
         offer.time_applyed = timezone.now()
-        offer.vacancy.save()
-        offer.save()
+        with transaction.atomic():
+            # условное обновление защищает от двойного принятия и счетчики от повторного изменения
+            vacancy = Vacancy.objects.filter(pk=offer.vacancy.pk, archived=False, deleted=False)
+            if not vacancy.update(archived=True, time_closed=offer.time_applyed, version=F("version") + 1):
+                raise Http404
+            offer.save(update_fields=["applyed", "time_applyed"])
+            RatingEligibility.objects.get_or_create(
+                applicant_id=offer.applicant_id, company_id=offer.vacancy.company_id
+            )
+            change_counter(CompanySettings.objects.filter(company=offer.vacancy.company_id), "vacancys_count", -1)
+        delete_user_settings_cache(offer.vacancy.company_id)
         return offer
 
     @staticmethod
@@ -308,7 +695,12 @@ class DeleteVacancyMixin(object):
     def delete_vacancy(self, request: HttpRequest | Request, ids: int) -> Vacancy | NoReturn:
         vacancy = CheckPermissionsToSeeVacancyOffersAndDeleteVacancy.check_perms(request, ids)
         vacancy.deleted = True
-        vacancy.save()
+        with transaction.atomic():
+            vacancys = Vacancy.objects.filter(pk=vacancy.pk, archived=False, deleted=False)
+            if not vacancys.update(deleted=True, time_closed=timezone.now(), version=F("version") + 1):
+                raise Http404
+            change_counter(CompanySettings.objects.filter(company=vacancy.company_id), "vacancys_count", -1)
+        delete_user_settings_cache(vacancy.company_id)
         return vacancy
 
 
@@ -317,8 +709,12 @@ class WithdrawOfferMixin(object):
 
     def withdraw_offer(self, request: HttpRequest | Request, ids: int) -> Offer | NoReturn:
         offer = WithdrawOfferMixin.check_perms(request, ids)
-        offer.withdrawn = True
-        offer.save()
+        offer.withdrawn, offer.time_withdrawn = True, timezone.now()
+        with transaction.atomic():
+            offers = Offer.objects.filter(pk=offer.pk, withdrawn=False, applyed=False)
+            if not offers.update(withdrawn=True, time_withdrawn=offer.time_withdrawn):
+                raise PermissionDenied
+            change_counter(Vacancy.objects.filter(pk=offer.vacancy_id), "offers_count", -1)
         return offer
 
     @staticmethod
@@ -332,16 +728,143 @@ class WithdrawOfferMixin(object):
         return offer
 
 
+class BulkAddVacancysMixin(AddVacancyMixin):
+    """Миксин для добавления пачки вакансий одной транзакцией."""
+
+    def add_vacancys(self, items: List, author: User | AnonymousUser) -> DefaultPOSTReturn:
+        error = check_bulk_items(items, dict)
+        if error:
+            return DefaultPOSTReturn(False, error)
+        # один экземпляр валидатора на всю пачку, как это делает ListSerializer
+        validator = self.validation_class()
+        results: List[BulkItemResult] = []
+        vacancys: List[Tuple[int, Vacancy]] = []
+        for index, item in enumerate(items):
+            try:
+                data = validator.run_validation(item)
+            except serializers.ValidationError as e:
+                results.append(BulkItemResult(index, error=self._get_item_error(e)))
+            else:
+                vacancys.append((index, Vacancy(company=author, **data)))
+        if vacancys:
+            with transaction.atomic():
+                Vacancy.objects.bulk_create([vacancy for _, vacancy in vacancys])
+                change_counter(CompanySettings.objects.filter(company=author), "vacancys_count", len(vacancys))
+            delete_user_settings_cache(author.pk)
+        results.extend(BulkItemResult(index, vacancy.pk) for index, vacancy in vacancys)
+        return DefaultPOSTReturn(sorted(results))
+
+    @staticmethod
+    def _get_item_error(e: serializers.ValidationError) -> E:
+        field = next(iter(e.detail), None) if isinstance(e.detail, dict) else None
+        error = VacancyErrors[field or ""]
+        return error if error.message else BulkErrors["item"]
+
+
+class BulkWithdrawOffersMixin(object):
+    """Миксин для отмены пачки офферов соискателя одной транзакцией."""
+
+    def withdraw_offers(self, request: HttpRequest | Request, ids: List) -> DefaultPOSTReturn:
+        error = check_bulk_items(ids, int)
+        if error:
+            return DefaultPOSTReturn(False, error)
+        results: List[BulkItemResult] = []
+        vacancys: Dict[int, int] = defaultdict(int)
+        with transaction.atomic():
+            offers = {
+                pk: (withdrawn, applyed, vacancy_id)
+                for pk, withdrawn, applyed, vacancy_id in Offer.objects.select_for_update()
+                .filter(pk__in=ids, applicant=request.user)
+                .values_list("pk", "withdrawn", "applyed", "vacancy_id")
+            }
+            for index, pk in enumerate(ids):
+                offer = offers.pop(pk, None)  # pop: повторный id в пачке считается неверным
+                if offer is None:
+                    results.append(BulkItemResult(index, pk, OfferErrors["id"]))
+                elif offer[0] or offer[1]:
+                    results.append(BulkItemResult(index, pk, OfferErrors["state"]))
+                else:
+                    results.append(BulkItemResult(index, pk))
+                    vacancys[offer[2]] -= 1
+            withdrawn = [result.id for result in results if result.error is None]
+            Offer.objects.filter(pk__in=withdrawn).update(withdrawn=True, time_withdrawn=timezone.now())
+            change_counters(Vacancy.objects.all(), "offers_count", vacancys)
+        return DefaultPOSTReturn(results)
+
+
+class BulkApplyOffersMixin(object):
+    """Миксин для принятия пачки офферов компанией одной транзакцией."""
+
+    def apply_offers(self, request: HttpRequest | Request, ids: List) -> DefaultPOSTReturn:
+        error = check_bulk_items(ids, int)
+        if error:
+            return DefaultPOSTReturn(False, error)
+        results: List[BulkItemResult] = []
+        applyed: Dict[int, Tuple[int, int]] = {}  # id оффера -> (id соискателя, id вакансии)
+        with transaction.atomic():
+            # блокируются и офферы, и их вакансии, поэтому состояние не изменится до конца транзакции
+            offers = {
+                row[0]: row[1:]
+                for row in Offer.objects.select_for_update()
+                .filter(pk__in=ids, vacancy__company=request.user)
+                .values_list(
+                    "pk", "applicant_id", "vacancy_id", "withdrawn", "applyed", "vacancy__archived", "vacancy__deleted"
+                )
+            }
+            closed_vacancys = set()
+            for index, pk in enumerate(ids):
+                offer = offers.pop(pk, None)
+                if offer is None:
+                    results.append(BulkItemResult(index, pk, OfferErrors["id"]))
+                    continue
+                applicant_id, vacancy_id, withdrawn, applyed_, archived, deleted = offer
+                if withdrawn or applyed_:
+                    results.append(BulkItemResult(index, pk, OfferErrors["state"]))
+                elif archived or deleted or vacancy_id in closed_vacancys:
+                    results.append(BulkItemResult(index, pk, VacancyErrors["state"]))
+                else:
+                    results.append(BulkItemResult(index, pk))
+                    applyed[pk] = applicant_id, vacancy_id
+                    closed_vacancys.add(vacancy_id)
+            if applyed:
+                now = timezone.now()
+                Vacancy.objects.filter(pk__in=closed_vacancys).update(
+                    archived=True, time_closed=now, version=F("version") + 1
+                )
+                Offer.objects.filter(pk__in=applyed).update(applyed=True, time_applyed=now)
+                RatingEligibility.objects.bulk_create(
+                    [
+                        RatingEligibility(applicant_id=applicant_id, company=request.user)
+                        for applicant_id, _ in applyed.values()
+                    ],
+                    ignore_conflicts=True,
+                )
+                change_counter(CompanySettings.objects.filter(company=request.user), "vacancys_count", -len(applyed))
+        if applyed:
+            delete_user_settings_cache(request.user.pk)
+        return DefaultPOSTReturn(results)
+
+
 class CompanyApplyedOffersMixin(object):
     """Миксин для получения всех предложений соискателей к компании, которые (предложения) были одобрены."""
 
-    def get_company_applyed_offers(self, company: User | AnonymousUser, check_perms: Optional[bool] = True) -> QuerySet:
+    def get_company_applyed_offers(
+        self, company: User | AnonymousUser, check_perms: Optional[bool] = True
+    ) -> QuerySetChain:
+        """
+        Принятые офферы из основной и архивной таблиц. Архивные офферы старше любого актуального (архивируются
+        только вакансии, закрытые раньше остальных), поэтому общий порядок по -time_applyed сохраняется.
+        """
+
         if check_perms:
             CompanyApplyedOffersMixin.check_perms(company)
-        return (
-            Offer.objects.select_related("applicant", "vacancy")
-            .filter(vacancy__company=company, applyed=True)
-            .order_by("-time_applyed")
+        return QuerySetChain(
+            *(
+                model.objects.select_related("applicant", "vacancy")
+                .filter(vacancy__company=company, applyed=True)
+                .order_by("-time_applyed")
+                for model in (Offer, ArchivedOffer)
+            )
         )
 
     @staticmethod
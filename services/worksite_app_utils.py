@@ -1,44 +1,61 @@
 from __future__ import annotations
 
 import os
+from functools import partial
+from itertools import chain
+from operator import attrgetter
 from random import randrange
 from typing import Callable, List, Literal, NamedTuple, NoReturn, Optional, Tuple, TypeAlias
+from urllib.parse import urlencode
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db.models import OuterRef, Subquery
 from django.db.models.fields.files import ImageFieldFile
 from django.db.models.query import QuerySet
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, QueryDict
 from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.safestring import SafeString, mark_safe
 
+from error_messages.errors import E
 from home_app.models import ApplicantSettings, CompanySettings
 from services.common_utils import (
     RequestHost,
     check_is_user_company,
     get_path_to_crop_photo,
+    get_protected_file_response,
     get_timezone,
     get_user_settings,
 )
+from services.company_stats import StatsRow, get_company_dashboard, get_company_stats_period
+from services.metrics import CacheName, observe_cache_lookup
+from services.salary_stats import get_top_cities_stats
+from services.saved_searches import get_saved_search_url
 from services.worksite_app_mixins import (
     AddOfferMixin,
     AddRatingMixin,
     AddVacancyMixin,
     ApplyOfferMixin,
+    CheckPermissionsToSeeResume,
     CheckPermissionsToSeeVacancy,
     CheckPermissionsToSeeVacancyOffersAndDeleteVacancy,
     CompanyApplyedOffersMixin,
     DeleteVacancyMixin,
+    OfferSearchMixin,
+    SavedSearchMixin,
     VacancyFilterMixin,
     VacancySearchMixin,
     WithdrawOfferMixin,
     get_company_ratings,
+    get_similar_vacancys,
 )
 from worksite_app.constants import EXPERIENCE_CHOICES, FILTERED_CITIES
 from worksite_app.forms import AddOfferForm, AddRatingForm, AddVacancyForm
-from worksite_app.models import Offer, Rating, Vacancy
+from worksite_app.models import ArchivedOffer, Offer, Rating, SavedSearch, Vacancy
 
 Context = dict
 num = 100000
@@ -100,7 +117,7 @@ class OffsetButton(NamedTuple):
 
 
 class ObjectsAndOffsets(NamedTuple):
-    objects: QuerySet
+    objects: Tuple
     offset: int
     offset_next: OffsetButton
     offset_back: OffsetButton
@@ -110,12 +127,12 @@ def _get_experience(vacancy: Vacancy) -> str:
     return EXPERIENCE_CHOICES[int(vacancy.experience)][1]
 
 
-def _get_offset(request: HttpRequest, objects: QuerySet[Vacancy | Rating]) -> int:
+def _get_offset(request: HttpRequest, count: int) -> int:
     """Получение оффсета для вакансий или отзывов на компанию."""
 
     try:
         offset = int(request.GET.get("offset", 0))
-        if offset % 20 != 0 or offset > len(objects) or offset < 0:
+        if offset % 20 != 0 or offset > count or offset < 0:
             offset = 0
     except ValueError:
         offset = 0
@@ -187,13 +204,19 @@ def _get_star_classes_list(rating: float) -> List[str]:
     return classes
 
 
-def _get_company_data(company: User, size: int, fields: Optional[Tuple] = None) -> CompanyData:
+def _get_company_data(
+    company: User,
+    size: int,
+    fields: Optional[Tuple] = None,
+    company_settings: Optional[CompanySettings] = None,
+    ratings_count: Optional[int] = None,
+) -> CompanyData:
     """
     Функция для получения различной информации о компании для рендеринга.
     (рейтинг компании, информация о логотипе и CSS классах звезд рейтинга)
     """
 
-    company_s: CompanySettings = get_user_settings(company)
+    company_s: CompanySettings = get_user_settings(company_settings or company)
     if not fields:
         fields = ("rating", "logo", "ratings_count", "classes_list")
     path_to_custom_logo, weight, height = (
@@ -204,7 +227,9 @@ def _get_company_data(company: User, size: int, fields: Optional[Tuple] = None)
         path_to_custom_logo,
         weight,
         height,
-        get_company_ratings(company).count() if "ratings_count" in fields else None,
+        (ratings_count if ratings_count is not None else get_company_ratings(company).count())
+        if "ratings_count" in fields
+        else None,
         _get_star_classes_list(company_s.rating) if "classes_list" in fields else None,
     )
 
@@ -212,20 +237,56 @@ def _get_company_data(company: User, size: int, fields: Optional[Tuple] = None)
 def _get_queryset(
     request: HttpRequest, queryset: QuerySet[Vacancy | Rating], queryset_hadler: Callable
 ) -> ObjectsAndOffsets:
-    """Функция для преобразования QuerySet'a к готовому для рендеринга виду."""
+    """
+    Функция для преобразования QuerySet'a к готовому для рендеринга виду. Обработчик вызывается только для
+    объектов текущей страницы, остальные объекты лишь считаются.
+    """
+
+    count = queryset.count()
+    offset = _get_offset(request, count)
+    offset_next = OffsetButton(offset + 20, count > offset + 20)
+    offset_back = OffsetButton(offset - 20, offset > 0 and count > 0)
+    return ObjectsAndOffsets(queryset_hadler(queryset[offset : offset + 20]), offset, offset_next, offset_back)
+
+
+def get_vacancys_with_company_version(vacancys: QuerySet[Vacancy]) -> QuerySet[Vacancy]:
+    """Добавление версии настроек компании, нужной для ключа кеша карточки вакансии (см. vacancys_queryset_handler)."""
 
-    queryset = queryset_hadler(queryset)
-    offset = _get_offset(request, queryset)
-    offset_next = OffsetButton(offset + 20, len(queryset[offset + 20 :]) > 0)
-    offset_back = OffsetButton(offset - 20, len(queryset[:offset]) > 0)
-    return ObjectsAndOffsets(queryset, offset, offset_next, offset_back)
+    return vacancys.annotate(
+        company_version=Subquery(CompanySettings.objects.filter(company=OuterRef("company")).values("version")[:1])
+    )
 
 
-def vacancys_queryset_handler(vacancys: QuerySet):
-    return tuple(
-        VacancyRenderObject(v, _get_experience(v), company_data=_get_company_data(v.company, 200, ("logo",)))
+def vacancys_queryset_handler(vacancys: QuerySet[Vacancy], show_archived: bool = False) -> Tuple[SafeString, ...]:
+    """
+    Готовые HTML карточки вакансий страницы. Карточки кешируются, ключ содержит версии вакансии и настроек
+    компании (увеличиваются при изменении вакансии и логотипа компании), поэтому устаревшие карточки не
+    удаляются, а просто перестают запрашиваться. Из кеша карточки получаются одним запросом, а рендерятся
+    только отсутствующие в нем.
+    """
+
+    vacancys = tuple(vacancys)
+    cache_names = tuple(
+        f"{v.pk}{settings.CACHE_NAMES_DELIMITER}{settings.VACANCY_CARD_CACHE_NAME}{settings.CACHE_NAMES_DELIMITER}"
+        f"{v.version}.{v.company_version}.{int(show_archived and v.archived)}"
         for v in vacancys
     )
+    cards = cache.get_many(cache_names) if vacancys else {}
+    missed = {}
+    for v, cache_name in zip(vacancys, cache_names):
+        observe_cache_lookup(CacheName.VACANCY_CARDS, cache_name in cards)
+        if cache_name not in cards:
+            vacancy = VacancyRenderObject(
+                v, _get_experience(v), company_data=_get_company_data(v.company, 200, ("logo",))
+            )
+            missed[cache_name] = render_to_string(
+                "worksite_app/vacancy_card.html",
+                {"vacancy": vacancy, "show_archived": show_archived, "MEDIA_URL": settings.MEDIA_URL},
+            )
+    if missed:
+        cache.set_many(missed, settings.VACANCY_CARD_CACHE_TIMEOUT)
+    cards |= missed
+    return tuple(mark_safe(cards[cache_name]) for cache_name in cache_names)
 
 
 def _get_path_to_applicant_avatar(applicant: User) -> str:
@@ -244,14 +305,13 @@ def _get_context(request: HttpRequest, **kwargs) -> Context:
     context: Context = Context({"offset_params": {}})
     company: User | Literal[None] = kwargs.get("company", None)
 
-    if kwargs.get("queryset", None):
+    if kwargs.get("queryset", None) is not None:
         alias = kwargs["queryset_context_alias"]
         queryset_data = _get_queryset(request, kwargs["queryset"], kwargs["queryset_handler"])
-        context[alias] = queryset_data.objects if len(queryset_data.objects) > 0 else tuple()
+        context[alias] = queryset_data.objects
         context["offset_params"]["offset"] = queryset_data.offset
         context["offset_params"]["offset_next"] = queryset_data.offset_next
         context["offset_params"]["offset_back"] = queryset_data.offset_back
-        context[alias] = context[alias][queryset_data.offset : queryset_data.offset_next]
     context["any_random_integer"] = randrange(num) if kwargs.get("any_random_integer", None) else None
     context["company_data"] = _get_company_data(company, kwargs["size"]) if company else None
     context["show_success"] = request.GET.get("show_success", None)
@@ -260,18 +320,21 @@ def _get_context(request: HttpRequest, **kwargs) -> Context:
     return context
 
 
-class HomeViewUtils(VacancyFilterMixin, VacancySearchMixin):
+class HomeViewUtils(SavedSearchMixin):
     def home_utils(self, request: HttpRequest) -> Context:
         filter_kwargs = self.filter(request.GET)
         search_query = self.search(request.GET)
         queryset = Vacancy.objects.select_related("company").filter(**filter_kwargs).filter(search_query)
         context = _get_context(
             request,
-            queryset=queryset,
+            queryset=get_vacancys_with_company_version(queryset),
             queryset_handler=vacancys_queryset_handler,
             any_random_integer=True,
             queryset_context_alias="vacancys",
         )
+        context["save_search_params"] = None
+        if request.user.is_authenticated and not check_is_user_company(request.user):
+            context["save_search_params"] = urlencode(self.get_saved_search(request.GET).params) or None
         return context | {"show_button": check_is_user_company(request.user)}
 
 
@@ -293,16 +356,24 @@ class SomeVacancyViewUtils(AddOfferMixin):
     def some_vacancy_utils(
         self, request: HttpRequest, ids: int, flag_success: Optional[bool] = None, error_code: Optional[str] = None
     ) -> Context:
-        vacancy = CheckPermissionsToSeeVacancy.check_perms(request, ids)
-        context = _get_context(request, company=vacancy.company, size=250, any_random_integer=True, tzone=True)
+        detail = CheckPermissionsToSeeVacancy.load(request, ids)
+        vacancy = detail.vacancy
+        context = _get_context(request, any_random_integer=True)
+        context["company_data"] = _get_company_data(
+            vacancy.company, 250, company_settings=detail.company_settings, ratings_count=detail.company_ratings_count
+        )
+        context["tzone"] = detail.viewer_timezone
         context["vacancy"] = VacancyRenderObject(
             vacancy, experience=_get_experience(vacancy), city=vacancy.city, skills=vacancy.skills
         )
-        context["view_offer"] = self.check_perms(request.user, vacancy, raise_exception=False)
+        context["view_offer"] = self.check_perms(
+            request.user, vacancy, raise_exception=False, offers_exists=detail.viewer_offer_exists
+        )
         context["view_all_offers"] = request.user == vacancy.company if not vacancy.archived else False
+        context["similar_vacancys"] = get_similar_vacancys(vacancy.pk)
         context["flag_success"], context["error_code"] = flag_success, error_code
         if context["view_all_offers"]:
-            context["offers_count"] = Offer.objects.filter(vacancy=vacancy, withdrawn=False).count()
+            context["offers_count"] = vacancy.offers_count
         return context | {"offer_form": AddOfferForm()}
 
     def some_vacancy_post_utils(self, view_self, request: HttpRequest, ids: int) -> HttpResponse:
@@ -321,12 +392,12 @@ class SomeCompanyViewUtils(AddRatingMixin):
         if not company.first_name != "":
             raise Http404
         context = _get_context(request, company=company, size=200, any_random_integer=True, show_success=True)
-        company_s: CompanySettings = get_user_settings(request.user)
+        company_s: CompanySettings = get_user_settings(company)
         company_data = {
             "company_description": company_s.company_description,
             "company_site": company_s.company_site,
             "company_first_name": company.first_name,
-            "company_vacancys_count": Vacancy.objects.filter(company=company, archived=False, deleted=False).count(),
+            "company_vacancys_count": company_s.vacancys_count,
             "company_username": company.username,
         }
         context["is_user_company"] = check_is_user_company(request.user) and (request.user.username == uname)
@@ -374,23 +445,31 @@ class CompanyVacancysViewUtils(VacancyFilterMixin, VacancySearchMixin):
         queryset = Vacancy.objects.select_related("company").filter(**filter_kwargs).filter(search_query)
         context = _get_context(
             request,
-            queryset=queryset,
-            queryset_handler=vacancys_queryset_handler,
+            queryset=get_vacancys_with_company_version(queryset),
+            queryset_handler=partial(vacancys_queryset_handler, show_archived=request.user == company),
             queryset_context_alias="vacancys",
             any_random_integer=True,
         )
         return context | {"company": uname, "show_archived": request.user == company}
 
 
-class VacancyOffersViewUtils(CheckPermissionsToSeeVacancyOffersAndDeleteVacancy):
+class VacancyOffersViewUtils(CheckPermissionsToSeeVacancyOffersAndDeleteVacancy, OfferSearchMixin):
     def vacancy_offers_utils(self, request: HttpRequest, ids: int) -> Context:
         vacancy = self.check_perms(request, ids)
         context = _get_context(request, any_random_integer=True, tzone=True)
+        queryset = Offer.objects.filter(vacancy=vacancy, withdrawn=False).select_related("applicant")
+        queryset = self.search_offers(queryset.defer("resume_search_vector"), request.GET)
         offers = tuple(
             OfferRenderObject(obj=offer, path_to_applicant_avatar=_get_path_to_applicant_avatar(offer.applicant))
-            for offer in Offer.objects.filter(vacancy=vacancy, withdrawn=False).select_related("applicant")
+            for offer in queryset
         )
-        return context | {"offers": offers}
+        return context | {"offers": offers, "vacancy": vacancy, "q": request.GET.get(self.search_param, "")}
+
+
+class OfferResumeViewUtils(CheckPermissionsToSeeResume):
+    def offer_resume_utils(self, request: HttpRequest, ids: int) -> HttpResponse | FileResponse:
+        offer = self.check_perms(request, ids)
+        return get_protected_file_response(offer.resume)
 
 
 class ApplyOfferViewUtils(ApplyOfferMixin):
@@ -407,10 +486,24 @@ class MyOffersViewUtils:
     def my_offers_utils(request: HttpRequest) -> Context:
         assert request.user.is_authenticated and (not check_is_user_company(request.user)), PermissionDenied
         context = _get_context(request, any_random_integer=True, tzone=True)
-        offers = Offer.objects.select_related("vacancy", "vacancy__company").filter(
-            applicant=request.user, vacancy__deleted=False
+        offers = sorted(
+            chain(
+                *(
+                    model.objects.select_related("vacancy", "vacancy__company").filter(
+                        applicant=request.user, vacancy__deleted=False
+                    )
+                    for model in (Offer, ArchivedOffer)
+                )
+            ),
+            key=attrgetter("time_added"),
+            reverse=True,
         )
-        return context | {"offers": offers, "path_to_applicant_avatar": _get_path_to_applicant_avatar(request.user)}
+        applicant_s: ApplicantSettings = get_user_settings(request.user)
+        return context | {
+            "offers": offers,
+            "offers_count": applicant_s.offers_count,
+            "path_to_applicant_avatar": _get_path_to_applicant_avatar(request.user),
+        }
 
 
 class SearchViewUtils:
@@ -422,6 +515,7 @@ class SearchViewUtils:
                     "choices_cities": FILTERED_CITIES,
                     "experience_values": EXPERIENCE_CHOICES,
                     "get_params": ((k, v) for k, v in request.GET.items()),
+                    "salary_stats": get_top_cities_stats(),
                 }
             )
         company = request.GET.get("company", None)
@@ -456,3 +550,69 @@ class CompanyApplyedOffersUtils(CompanyApplyedOffersMixin):
             OfferRenderObject(offer, _get_path_to_applicant_avatar(offer.applicant)) for offer in applyed_offers
         )
         return context | {"offers": offers if len(offers) > 0 else None}
+
+
+class SavedSearchRenderObject(NamedTuple):
+    obj: SavedSearch
+    url: str
+    experience: str
+
+
+class SavedSearchesViewUtils(SavedSearchMixin):
+    def saved_searches_utils(self, request: HttpRequest, error: Optional[str] = None) -> Context:
+        self.check_perms(request.user)
+        context = _get_context(request)
+        experience = dict(EXPERIENCE_CHOICES)
+        saved_searches = tuple(
+            SavedSearchRenderObject(
+                saved_search,
+                get_saved_search_url(saved_search),
+                ", ".join(experience[ex] for ex in saved_search.experience),
+            )
+            for saved_search in self.get_saved_searches(request.user)
+        )
+        return context | {"saved_searches": saved_searches, "error": error}
+
+    def saved_searches_post_utils(self, view_self, request: HttpRequest) -> HttpResponse:
+        flag = self.save_search(request.user, QueryDict(request.POST.get("params", "")))
+        if flag.status:
+            return redirect(f"{reverse('worksite_app:saved_searches')}?show_success=True")
+        return view_self.get(request, error=flag.error.message)
+
+    def delete_saved_search_utils_post(self, request: HttpRequest, ids: int) -> Literal[None] | NoReturn:
+        self.delete_saved_search(request.user, ids)
+
+
+class StatsRenderObject(NamedTuple):
+    obj: StatsRow
+    time_to_apply: str
+    withdrawal_rate: str
+
+
+def _get_stats_render_object(stats: StatsRow) -> StatsRenderObject:
+    time_to_apply, withdrawal_rate = "-", "-"
+    if stats.time_to_apply is not None:
+        hours = round(stats.time_to_apply.total_seconds() / 3600)
+        time_to_apply = f"{hours // 24} д. {hours % 24} ч." if hours >= 24 else f"{hours} ч."
+    if stats.withdrawal_rate is not None:
+        withdrawal_rate = f"{stats.withdrawal_rate:.1%}"
+    return StatsRenderObject(stats, time_to_apply, withdrawal_rate)
+
+
+class CompanyStatsViewUtils(object):
+    @staticmethod
+    def company_stats_utils(request: HttpRequest) -> Context:
+        if not check_is_user_company(request.user):
+            raise PermissionDenied
+        context = _get_context(request)
+        period = get_company_stats_period(request.GET)
+        if isinstance(period, E):
+            context["error"] = period.message
+            period = get_company_stats_period({})
+        dashboard = get_company_dashboard(request.user, period)
+        return context | {
+            "period": dashboard.period,
+            "totals": _get_stats_render_object(dashboard.totals),
+            "vacancys": [(vacancy, _get_stats_render_object(vacancy.stats)) for vacancy in dashboard.vacancys],
+            "days": [(day, _get_stats_render_object(day.stats)) for day in reversed(dashboard.days)],
+        }
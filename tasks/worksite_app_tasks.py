@@ -0,0 +1,360 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Literal, Optional, Type
+
+import docx
+from celery import shared_task
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.files.storage import Storage
+from django.db import connection, models, transaction
+from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery, TextField, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from pypdf import PdfReader
+
+from home_app.models import ApplicantSettings, CompanySettings
+from services import company_stats, salary_stats, saved_searches, similar_vacancys
+from services.common_utils import change_counters, delete_user_settings_cache, get_path_to_crop_photo
+from worksite_app.models import ArchivedOffer, ArchivedVacancy, Offer, Vacancy, resumes_storage
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def extract_resume_text(offer_id: int) -> Literal[None]:
+    """Функция для извлечения текста резюме и обновления поискового индекса откликов."""
+
+    offer = Offer.objects.filter(pk=offer_id).only("resume", "resume_text").first()
+    if offer is None:
+        return
+    text = _extract_text(offer.resume) if offer.resume else (offer.resume_text or "")
+    text = text[: settings.RESUME_TEXT_MAX_LENGTH]
+    fields = {"resume_search_text": text}
+    if connection.vendor == "postgresql":
+        fields["resume_search_vector"] = SearchVector(
+            Value(text, output_field=TextField()), config=settings.OFFERS_SEARCH_CONFIG
+        )
+    Offer.objects.filter(pk=offer_id).update(**fields)
+
+
+@shared_task
+def reconcile_counters() -> Dict[str, int]:
+    """Функция для исправления расхождений денормализованных счетчиков с реальными данными."""
+
+    vacancys = _reconcile_counter(
+        Vacancy.objects.all(), "offers_count", Offer.objects.filter(vacancy=OuterRef("pk"), withdrawn=False), "vacancy"
+    )
+    companies = _reconcile_counter(
+        CompanySettings.objects.all(),
+        "vacancys_count",
+        Vacancy.objects.filter(company=OuterRef("company"), archived=False, deleted=False),
+        "company",
+        owner="company",
+    )
+    applicants = _reconcile_counter(
+        ApplicantSettings.objects.all(),
+        "offers_count",
+        Offer.objects.filter(applicant=OuterRef("applicant")),
+        "applicant",
+        owner="applicant",
+        archived=ArchivedOffer.objects.filter(applicant=OuterRef("applicant")),
+    )
+    delete_user_settings_cache(*companies, *applicants)
+    return {"vacancys": len(vacancys), "companies": len(companies), "applicants": len(applicants)}
+
+
+def _reconcile_counter(
+    queryset: QuerySet,
+    field: str,
+    related: QuerySet,
+    group_by: str,
+    owner: str = "pk",
+    archived: Optional[QuerySet] = None,
+) -> List[int]:
+    """
+    Пересчитывает счетчик field только у строк, где он разошелся с реальным значением. Возвращает значения
+    поля owner исправленных строк (для сброса кеша). Пересчет выполняется одним UPDATE на пачку строк.
+    Если передан archived, к реальному значению добавляются строки, перенесенные в архивную таблицу.
+    """
+
+    actual = _count(related, group_by)
+    if archived is not None:
+        actual = actual + _count(archived, group_by)
+    drifted = queryset.annotate(actual=actual).exclude(**{field: F("actual")}).values_list("pk", owner)
+    repaired: List[int] = []
+    last_pk = 0
+    while batch := list(drifted.filter(pk__gt=last_pk).order_by("pk")[: settings.COUNTERS_RECONCILE_BATCH_SIZE]):
+        queryset.filter(pk__in=[pk for pk, _ in batch]).update(**{field: actual})
+        repaired.extend(value for _, value in batch)
+        last_pk = batch[-1][0]
+    return repaired
+
+
+def _count(related: QuerySet, group_by: str) -> Coalesce:
+    return Coalesce(Subquery(related.order_by().values(group_by).annotate(c=Count("pk")).values("c")), 0)
+
+
+@shared_task
+def archive_closed_vacancys() -> int:
+    """
+    Функция для переноса вакансий, закрытых более VACANCYS_ARCHIVE_AFTER_DAYS дней назад, вместе с откликами
+    в архивные таблицы. Каждая пачка переносится в своей транзакции, id записей сохраняются.
+    """
+
+    cutoff = timezone.now() - timedelta(days=settings.VACANCYS_ARCHIVE_AFTER_DAYS)
+    closed = Vacancy.objects.filter(time_closed__lt=cutoff).order_by("pk").values_list("pk", flat=True)
+    archived = 0
+    while ids := list(closed[: settings.VACANCYS_ARCHIVE_BATCH_SIZE]):
+        with transaction.atomic():
+            vacancys = Vacancy.objects.select_for_update().filter(pk__in=ids, time_closed__lt=cutoff)
+            ArchivedVacancy.objects.bulk_create(_copy_rows(vacancys, ArchivedVacancy))
+            ArchivedOffer.objects.bulk_create(_copy_rows(Offer.objects.filter(vacancy__in=ids), ArchivedOffer))
+            archived += vacancys.delete()[1].get(Vacancy._meta.label, 0)
+    logger.info("Archived %d closed vacancys", archived)
+    return archived
+
+
+def _copy_rows(queryset: QuerySet, model: Type[models.Model]) -> List[models.Model]:
+    """Создание (без сохранения) объектов model из строк queryset по совпадающим полям."""
+
+    source = {field.attname for field in queryset.model._meta.concrete_fields}
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in source]
+    return [model(**dict(zip(names, row))) for row in queryset.order_by().values_list(*names)]
+
+
+OFFERS_RETENTION_POLICIES: Dict[str, Callable[[datetime], Q]] = {
+    "withdrawn": lambda cutoff: Q(withdrawn=True, time_withdrawn__lt=cutoff),
+    "deleted_vacancys": lambda cutoff: Q(vacancy__deleted=True, vacancy__time_closed__lt=cutoff),
+}
+
+
+class _RateLimiter(object):
+    """Ограничение числа операций в секунду, чтобы очистка файлов не нагружала диск."""
+
+    def __init__(self, rate: int):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = time.monotonic()
+
+    def wait(self) -> Literal[None]:
+        now = time.monotonic()
+        if self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time = max(self.next_time, now) + self.interval
+
+
+@shared_task
+def delete_expired_offers() -> Dict[str, int]:
+    """
+    Функция для удаления откликов (и файлов с резюме) с истекшим сроком хранения по OFFERS_RETENTION_DAYS.
+    Отклики удаляются пачками по RETENTION_BATCH_SIZE в отдельных транзакциях, файлы удаляются после фиксации
+    транзакции не чаще RETENTION_FILES_PER_SECOND в секунду.
+    """
+
+    report = {"offers": 0, "files": 0, "bytes": 0}
+    limiter = _RateLimiter(settings.RETENTION_FILES_PER_SECOND)
+    for policy, days in settings.OFFERS_RETENTION_DAYS.items():
+        if days is None:
+            continue
+        query = OFFERS_RETENTION_POLICIES[policy](timezone.now() - timedelta(days=days))
+        for model in (Offer, ArchivedOffer):
+            _delete_offers(model, query, report, limiter)
+    logger.info("Deleted %(offers)d expired offers, %(files)d files, %(bytes)d bytes", report)
+    return report
+
+
+def _delete_offers(
+    model: Type[Offer | ArchivedOffer], query: Q, report: Dict[str, int], limiter: _RateLimiter
+) -> Literal[None]:
+    expired = model.objects.filter(query).order_by("pk").values_list("pk", flat=True)
+    storage = resumes_storage()
+    while ids := list(expired[: settings.RETENTION_BATCH_SIZE]):
+        with transaction.atomic():
+            offers = list(
+                model.objects.select_for_update()
+                .filter(pk__in=ids)
+                .values_list("applicant_id", "vacancy_id", "withdrawn", "resume")
+            )
+            model.objects.filter(pk__in=ids).delete()
+            applicants = Counter(applicant for applicant, _, _, _ in offers)
+            change_counters(
+                ApplicantSettings.objects.all(),
+                "offers_count",
+                {applicant: -count for applicant, count in applicants.items()},
+                key="applicant",
+            )
+            if model is Offer:  # счетчик вакансии учитывает только не отмененные отклики
+                vacancys = Counter(vacancy for _, vacancy, withdrawn, _ in offers if not withdrawn)
+                change_counters(
+                    Vacancy.objects.all(), "offers_count", {vacancy: -count for vacancy, count in vacancys.items()}
+                )
+        delete_user_settings_cache(*applicants)
+        report["offers"] += len(offers)
+        for resume in (resume for _, _, _, resume in offers if resume):
+            limiter.wait()
+            report["bytes"] += _delete_file(storage, resume)
+            report["files"] += 1
+
+
+def _delete_file(storage: Storage, name: str) -> int:
+    """Удаление файла из хранилища. Возвращает размер удаленного файла."""
+
+    try:
+        size = storage.size(name)
+        storage.delete(name)
+    except OSError:  # файл, который не удалось удалить сейчас, удалит sweep_orphan_media
+        logger.warning("Unable to delete file %s", name, exc_info=True)
+        return 0
+    return size
+
+
+@shared_task
+def sweep_orphan_media(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Функция для удаления файлов, на которые не ссылается ни одна запись в БД: резюме в защищенном хранилище,
+    логотипы компаний и аватарки соискателей (вместе с обрезанными копиями). Возвращает число и общий размер
+    удаленных (при dry_run - найденных) файлов.
+    """
+
+    resumes = {
+        name
+        for model in (Offer, ArchivedOffer)
+        for name in model.objects.exclude(resume="").values_list("resume", flat=True).iterator()
+    }
+    photos = set(CompanySettings.objects.values_list("company_logo", flat=True).iterator())
+    for avatar in ApplicantSettings.objects.values_list("applicant_avatar", flat=True).iterator():
+        photos.update((avatar, get_path_to_crop_photo(avatar)))
+
+    report = {"files": 0, "bytes": 0}
+    limiter = _RateLimiter(settings.RETENTION_FILES_PER_SECOND)
+    grace_time = time.time() - settings.ORPHAN_MEDIA_GRACE_HOURS * 60 * 60
+    for media_root, directory, referenced in (
+        (settings.PROTECTED_MEDIA_ROOT, "offers", resumes),
+        (settings.MEDIA_ROOT, settings.CUSTOM_COMPANY_LOGOS_DIR, photos),
+        (settings.MEDIA_ROOT, settings.CUSTOM_APPLICANT_AVATARS_DIR, photos),
+    ):
+        root = settings.BASE_DIR / media_root
+        # обход снизу вверх, чтобы опустевшие папки пользователей (logos/<id>/, avatars/<id>/) удалялись сразу
+        for dirpath, _, filenames in os.walk(root / directory, topdown=False):
+            path = Path(dirpath)
+            for filename in filenames:
+                file = path / filename
+                if file.relative_to(root).as_posix() in referenced:
+                    continue
+                stat = file.stat()
+                if stat.st_mtime > grace_time:
+                    continue
+                report["files"] += 1
+                report["bytes"] += stat.st_size
+                if not dry_run:
+                    limiter.wait()
+                    file.unlink(missing_ok=True)
+            if not dry_run and path != root / directory and not any(path.iterdir()):
+                path.rmdir()
+    logger.info("Orphaned media: %(files)d files, %(bytes)d bytes", report | {"dry_run": dry_run})
+    return report
+
+
+@shared_task
+def update_similar_vacancys(full: bool = False) -> Dict[str, int]:
+    """
+    Функция для обновления похожих вакансий: при full - пересчет для всех открытых вакансий (раз в сутки, так как
+    меняются веса терминов), иначе - только для новых вакансий (см. services.similar_vacancys).
+    """
+
+    report = similar_vacancys.update_similar_vacancys(full)
+    logger.info("Updated similar vacancys for %(vacancys)d vacancys (%(new)d new)", report)
+    return report
+
+
+@shared_task
+def update_salary_stats(full: bool = False) -> Dict[str, int]:
+    """
+    Функция для обновления статистики зарплат: пересчитываются только группы (город, опыт) с изменившимися
+    вакансиями, при full - все группы (см. services.salary_stats).
+    """
+
+    report = salary_stats.update_salary_stats(full)
+    logger.info("Updated salary stats: %(updated)d of %(groups)d groups, %(removed)d removed", report)
+    return report
+
+
+@shared_task
+def update_company_stats() -> Dict[str, int]:
+    """
+    Функция для пересчета дневной статистики откликов компаний за последние COMPANY_STATS_REFRESH_DAYS дней
+    (см. services.company_stats). Вчерашний день пересчитывается еще раз после его окончания.
+    """
+
+    report = company_stats.update_company_stats()
+    logger.info("Updated company stats for %(days)d days: %(rows)d rows, %(withdrawals)d earlier withdrawals", report)
+    return report
+
+
+@shared_task
+def match_saved_searches() -> Dict[str, int]:
+    """Функция для подбора сохраненных поисков для новых вакансий (см. services.saved_searches)."""
+
+    report = saved_searches.match_new_vacancys()
+    logger.info("Matched %(vacancys)d new vacancys with saved searches: %(matches)d matches", report)
+    return report
+
+
+@shared_task
+def send_saved_search_digests() -> Dict[str, int]:
+    """Функция для рассылки писем с новыми вакансиями по сохраненным поискам."""
+
+    report = saved_searches.send_digests()
+    logger.info("Sent %(emails)d saved search digests (%(matches)d matches)", report)
+    return report
+
+
+def _extract_text(resume: FieldFile) -> str:
+    extractor = _EXTRACTORS.get(os.path.splitext(resume.name)[1].lower(), None)
+    if extractor is None:
+        return ""
+    try:
+        with resume.open("rb") as file:
+            return _normalize_text(extractor(file))
+    except Exception:  # битые и зашифрованные файлы не должны ронять воркер
+        logger.warning("Unable to extract text from resume %s", resume.name, exc_info=True)
+        return ""
+
+
+def _extract_pdf_text(file: BinaryIO) -> str:
+    pages = PdfReader(file).pages[: settings.RESUME_PDF_MAX_PAGES]
+    return "\n".join(page.extract_text() or "" for page in pages)
+
+
+def _extract_docx_text(file: BinaryIO) -> str:
+    document = docx.Document(file)
+    paragraphs = [paragraph.text for paragraph in document.paragraphs]
+    cells = [cell.text for table in document.tables for row in table.rows for cell in row.cells]
+    return "\n".join(paragraphs + cells)
+
+
+def _extract_txt_text(file: BinaryIO) -> str:
+    content = file.read(settings.RESUME_TEXT_MAX_LENGTH * 4)
+    for encoding in ("utf-8", "cp1251"):
+        try:
+            return content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return content.decode("utf-8", errors="ignore")
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text.replace("\x00", "")).strip()
+
+
+_EXTRACTORS: Dict[str, Callable[[BinaryIO], str]] = {
+    ".pdf": _extract_pdf_text,
+    ".docx": _extract_docx_text,
+    ".txt": _extract_txt_text,
+}
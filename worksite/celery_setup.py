@@ -1,17 +1,79 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 from django.conf import settings
 
+from services.metrics import connect_celery_metrics
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "worksite.settings")
 
 app = Celery(
     "worksite",
-    include=["tasks.home_app_tasks"],
+    include=["tasks.home_app_tasks", "tasks.worksite_app_tasks"],
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
 )
 app.conf.task_routes = {
     "tasks.home_app_tasks.make_center_crop": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.extract_resume_text": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.reconcile_counters": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.archive_closed_vacancys": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.delete_expired_offers": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.sweep_orphan_media": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.update_similar_vacancys": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.match_saved_searches": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.send_saved_search_digests": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.update_salary_stats": {"queue": "main_queue"},
+    "tasks.worksite_app_tasks.update_company_stats": {"queue": "main_queue"},
+}
+app.conf.beat_schedule = {
+    "reconcile-counters": {
+        "task": "tasks.worksite_app_tasks.reconcile_counters",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "archive-closed-vacancys": {
+        "task": "tasks.worksite_app_tasks.archive_closed_vacancys",
+        "schedule": crontab(minute=0, hour=4),
+    },
+    "delete-expired-offers": {
+        "task": "tasks.worksite_app_tasks.delete_expired_offers",
+        "schedule": crontab(minute=30, hour=4),
+    },
+    "sweep-orphan-media": {
+        "task": "tasks.worksite_app_tasks.sweep_orphan_media",
+        "schedule": crontab(minute=0, hour=5, day_of_week=0),
+    },
+    "update-similar-vacancys": {
+        "task": "tasks.worksite_app_tasks.update_similar_vacancys",
+        "schedule": crontab(minute="*/10"),
+    },
+    "rebuild-similar-vacancys": {
+        "task": "tasks.worksite_app_tasks.update_similar_vacancys",
+        "schedule": crontab(minute=0, hour=2),
+        "kwargs": {"full": True},
+    },
+    "match-saved-searches": {
+        "task": "tasks.worksite_app_tasks.match_saved_searches",
+        "schedule": crontab(minute="*/5"),
+    },
+    "send-saved-search-digests": {
+        "task": "tasks.worksite_app_tasks.send_saved_search_digests",
+        "schedule": crontab(minute=0, hour=9),
+    },
+    "update-salary-stats": {
+        "task": "tasks.worksite_app_tasks.update_salary_stats",
+        "schedule": crontab(minute="*/15"),
+    },
+    "rebuild-salary-stats": {
+        "task": "tasks.worksite_app_tasks.update_salary_stats",
+        "schedule": crontab(minute=30, hour=2, day_of_week=0),
+        "kwargs": {"full": True},
+    },
+    "update-company-stats": {
+        "task": "tasks.worksite_app_tasks.update_company_stats",
+        "schedule": crontab(minute=20),
+    },
 }
 app.autodiscover_tasks()
+connect_celery_metrics()
@@ -1,3 +1,4 @@
+from importlib.util import find_spec
 from os.path import join
 from pathlib import Path
 from typing import List
@@ -33,11 +34,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "services.instrumentation.InstrumentationMiddleware",
+    "services.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "services.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -92,6 +96,122 @@ DEFAULT_APPLICANT_AVATAR_FILENAME = "default_applicant_avatar.jpg"
 CUSTOM_COMPANY_LOGOS_DIR = "logos"
 CUSTOM_APPLICANT_AVATARS_DIR = "avatars"
 
+# PROTECTED FILES (RESUMES)
+# Файлы из PROTECTED_MEDIA_ROOT не раздаются напрямую: Django проверяет права доступа, а саму передачу
+# файла выполняет nginx через заголовок X-Accel-Redirect на internal location PROTECTED_MEDIA_URL.
+PROTECTED_MEDIA_ROOT = "protected/"
+PROTECTED_MEDIA_URL = "/protected/"
+USE_X_ACCEL_REDIRECT = int(env("USE_X_ACCEL_REDIRECT", default=0))
+
+# RESUMES TEXT EXTRACTION AND SEARCH
+RESUME_TEXT_MAX_LENGTH = 100000
+RESUME_PDF_MAX_PAGES = 50
+OFFERS_SEARCH_CONFIG = "russian"
+
+# DENORMALIZED COUNTERS
+COUNTERS_RECONCILE_BATCH_SIZE = 1000
+
+# ARCHIVE OF CLOSED VACANCYS
+VACANCYS_ARCHIVE_AFTER_DAYS = 30
+VACANCYS_ARCHIVE_BATCH_SIZE = 500
+
+# RETENTION OF OFFERS AND ORPHANED MEDIA
+# Сколько дней хранятся отклики по каждой политике из OFFERS_RETENTION_POLICIES (None - политика отключена):
+# withdrawn - отмененные отклики (от времени отмены), deleted_vacancys - отклики на удаленные вакансии.
+OFFERS_RETENTION_DAYS = {"withdrawn": 90, "deleted_vacancys": 30}
+RETENTION_BATCH_SIZE = 200
+RETENTION_FILES_PER_SECOND = 50
+# Файлы моложе этого срока не считаются потерянными: запись о них может быть еще не сохранена
+ORPHAN_MEDIA_GRACE_HOURS = 24
+
+# SIMILAR VACANCYS
+SIMILAR_VACANCYS_COUNT = 5
+SIMILAR_VACANCYS_MIN_SCORE = 0.2
+# Вес групп признаков в сходстве вакансий (см. services.similar_vacancys.build_vectors)
+SIMILAR_VACANCYS_WEIGHTS = {"text": 1.0, "city": 0.6, "experience": 0.4, "money": 0.4}
+# Вакансий в блоке при подсчете сходств: в памяти плотная матрица float32 размером блок x все открытые вакансии
+SIMILAR_VACANCYS_BLOCK_SIZE = 256
+
+# SAVED SEARCHES
+SAVED_SEARCHES_MAX_COUNT = 20
+# Новых вакансий в пачке подбора сохраненных поисков и соискателей в пачке рассылки
+SAVED_SEARCHES_BATCH_SIZE = 500
+# Вакансий по каждому поиску в письме с новыми вакансиями и на странице сохраненных поисков
+SAVED_SEARCHES_SHOWN_VACANCYS = 10
+# Адрес сайта для ссылок в письмах
+SITE_URL = env("SITE_URL", default="http://localhost")
+EMAIL_BACKEND = env("EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = env("EMAIL_HOST", default="localhost")
+EMAIL_PORT = int(env("EMAIL_PORT", default=25))
+DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="worksite@localhost")
+
+# SALARY STATS
+# Границы интервалов гистограммы зарплат (после их изменения нужен полный пересчет update_salary_stats(full=True))
+SALARY_STATS_BINS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000001)
+# Городов в пачке при пересчете статистики
+SALARY_STATS_BATCH_SIZE = 200
+# Городов с наибольшим числом вакансий в статистике на странице поиска
+SALARY_STATS_SHOWN_CITIES = 10
+
+# COMPANY STATS
+# Дней (включая сегодня), за которые фоновая задача пересчитывает статистику компаний; более ранние дни
+# пересчитывает команда backfill_company_stats
+COMPANY_STATS_REFRESH_DAYS = 2
+# Период статистики на странице и в API по умолчанию и наибольший
+COMPANY_STATS_DEFAULT_DAYS = 30
+COMPANY_STATS_MAX_DAYS = 366
+# Дней в одной транзакции пересчета
+COMPANY_STATS_BATCH_DAYS = 7
+# Отзывов откликов, поданных до пересчитываемых дней, в одной транзакции их учета
+COMPANY_STATS_BATCH_OFFERS = 5000
+
+# REQUEST INSTRUMENTATION
+INSTRUMENTATION_ENABLED = int(env("INSTRUMENTATION_ENABLED", default=1))
+# Server-Timing раскрывает внутренние детали обработки запроса, поэтому по умолчанию отдается только в DEBUG
+INSTRUMENTATION_SERVER_TIMING = int(env("INSTRUMENTATION_SERVER_TIMING", default=DEBUG))
+# Форма SQL запроса, выполненная за один HTTP запрос больше этого числа раз, считается N+1
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5
+
+# SLOW QUERIES LOG
+# В журнал worksite.slow_queries пишутся запросы не быстрее порога и случайная доля SLOW_QUERY_SAMPLE_RATE остальных
+SLOW_QUERY_THRESHOLD_MS = int(env("SLOW_QUERY_THRESHOLD_MS", default=200))
+SLOW_QUERY_SAMPLE_RATE = float(env("SLOW_QUERY_SAMPLE_RATE", default=0))
+# Для медленных SELECT дольше этого порога (один раз на форму запроса) в журнал добавляется EXPLAIN, None - никогда
+SLOW_QUERY_EXPLAIN_THRESHOLD_MS = 1000
+
+# REQUEST PROFILING
+# Профилирование запросов staff пользователей по параметру _profile или заголовку X-Profile (services.profiling)
+PROFILING_ENABLED = int(env("PROFILING_ENABLED", default=1))
+# Интервал снятия стеков сэмплирующим профилировщиком. Меньше интервала переключения потоков GIL (5 мс)
+# его уменьшать бесполезно, пока поток запроса занят Python кодом
+PROFILING_SAMPLE_INTERVAL_MS = 5
+
+# RATE LIMITING
+# Token bucket лимиты записи по scope (атрибут ratelimits у views): "user:10/m" - корзина на 10 запросов
+# пользователя, полностью пополняющаяся за минуту, "ip:5/h" - на 5 запросов с одного IP за час.
+RATELIMIT_ENABLED = int(env("RATELIMIT_ENABLED", default=1))
+RATELIMIT_BACKEND = env("RATELIMIT_BACKEND", default="services.ratelimit.RedisTokenBucketBackend")
+RATELIMIT_REDIS_URL = env("RATELIMIT_REDIS_URL", default=CELERY_BROKER_URL)
+RATELIMITS = {
+    "offers": ["user:10/m", "user:100/d", "ip:30/m"],
+    "ratings": ["user:5/m", "ip:20/m"],
+    "settings": ["user:10/m", "ip:30/m"],
+    "saved_searches": ["user:10/m", "ip:30/m"],
+    "register": ["ip:5/h"],
+}
+
+# RESPONSE COMPRESSION
+# Ответы по этим путям сжимаются brotli (если установлен пакет brotli) или gzip, когда тело не меньше порога
+COMPRESSION_PATH_PREFIXES = ("/api/",)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# PROMETHEUS METRICS
+# Каталоги PROMETHEUS_MULTIPROC_DIR процессов (gunicorn, Celery), метрики которых объединяются в /metrics.
+# Значение - пути через запятую, пустой список - отдаются метрики только текущего процесса.
+METRICS_DIRS = [path.strip() for path in env("METRICS_DIRS", default="").split(",") if path.strip()]
+
 ...
 
 DEFAULT_USER_TIMEZONE = "Europe/London"
@@ -117,7 +237,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "services.instrumentation.InstrumentedRedisCache",
         "LOCATION": CELERY_BROKER_URL,
         "TIMEOUT": 60 * 30,
     }
@@ -125,12 +245,23 @@ CACHES = {
 
 USER_SETTINGS_CACHE_NAME = "settings"
 COMPANY_RATINGS_CACHE_NAME = "ratings"
+VACANCY_CARD_CACHE_NAME = "vacancy_card"
+VACANCY_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+API_COUNT_CACHE_NAME = "api_count"
 CACHE_NAMES_DELIMITER = ":"
 
 LOGGING = {
     "version": 1,
     "handlers": {"console": {"class": "logging.StreamHandler"}},
-    "loggers": {"django.db.backends": {"handlers": ["console"], "level": env("DJANGO_LOG_LEVEL", default="DEBUG")}},
+    "loggers": {
+        # каждый SQL запрос пишется только при DJANGO_LOG_LEVEL=DEBUG, обычно достаточно worksite.slow_queries
+        "django.db.backends": {"handlers": ["console"], "level": env("DJANGO_LOG_LEVEL", default="INFO")},
+        "worksite.slow_queries": {"handlers": ["console"], "level": env("SLOW_QUERY_LOG_LEVEL", default="INFO")},
+        "worksite.instrumentation": {
+            "handlers": ["console"],
+            "level": env("INSTRUMENTATION_LOG_LEVEL", default="INFO"),
+        },
+    },
 }
 
 
@@ -159,15 +290,36 @@ MEDIA_ROOT = "media/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# orjson необязателен: без него (или при API_ORJSON=0) используются стандартные JSONRenderer и JSONParser
+API_ORJSON = int(env("API_ORJSON", default=1)) and find_spec("orjson") is not None
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "apiv1.renderers.ORJSONRenderer" if API_ORJSON else "rest_framework.renderers.JSONRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apiv1.parsers.ORJSONParser" if API_ORJSON else "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework.authentication.TokenAuthentication"],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    # Лимиты задаются атрибутом ratelimits у вьюсетов и APIView (см. RATELIMITS)
+    "DEFAULT_THROTTLE_CLASSES": ["services.ratelimit.TokenBucketThrottle"],
+    # Число прокси перед gunicorn (nginx), по заголовку X-Forwarded-For от них определяется IP клиента
+    "NUM_PROXIES": int(env("NUM_PROXIES", default=0)),
+    # limit/offset или, с параметром cursor, keyset пагинация (см. apiv1.pagination.HybridPagination)
+    "DEFAULT_PAGINATION_CLASS": "apiv1.pagination.HybridPagination",
     "PAGE_SIZE": 20,
 }
+# Максимальное количество объектов в одном запросе к bulk-эндпоинтам API
+API_BULK_MAX_ITEMS = int(env("API_BULK_MAX_ITEMS", default=500))
+# Примерное количество объектов (параметр count=approximate): до этой оценки планировщика PostgreSQL выполняется
+# точный COUNT(*), результат кешируется на API_COUNT_CACHE_TIMEOUT секунд
+API_APPROXIMATE_COUNT_THRESHOLD = int(env("API_APPROXIMATE_COUNT_THRESHOLD", default=10000))
+API_COUNT_CACHE_TIMEOUT = 60
+# Потоковая выгрузка: строк за одно чтение серверного курсора и размер отправляемого блока в байтах
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_STREAM_BUFFER_SIZE = 64 * 1024
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Worksite API",
@@ -0,0 +1,38 @@
+"""
+Настройки для локального запуска бенчмарков (manage.py benchmark_worksite --settings=worksite.settings_benchmark):
+SQLite и кеш в памяти процесса, без PostgreSQL, Redis и брокера Celery.
+"""
+
+import os
+
+for name, value in (
+    ("SECRET_KEY", "benchmark"),
+    ("DEBUG", "0"),
+    ("ALLOWED_HOSTS", "testserver"),
+    ("DATABASE_NAME", ""),
+    ("DATABASE_USER", ""),
+    ("DATABASE_PASSWORD", ""),
+    ("DATABASE_HOST", ""),
+    ("DATABASE_PORT", ""),
+    ("CELERY_BROKER_URL", "memory://"),
+    ("CELERY_RESULT_BACKEND", "cache+memory://"),
+):
+    os.environ.setdefault(name, value)
+
+from worksite.settings import *  # noqa: E402, F403
+
+# Команда benchmark_worksite создает и заполняет отдельную тестовую БД, в SQLite она находится в памяти
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+CACHES = {"default": {"BACKEND": "services.instrumentation.InstrumentedLocMemCache"}}
+RATELIMIT_ENABLED = 0
+# Быстрый хешер паролей: при заполнении БД и логине пользователей сценариев хеширование не должно доминировать
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+INSTRUMENTATION_SERVER_TIMING = 0
+SLOW_QUERY_SAMPLE_RATE = 0
+SLOW_QUERY_THRESHOLD_MS = 10**6
+LOGGING = {
+    "version": 1,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"worksite": {"handlers": ["console"], "level": "ERROR"}},
+}
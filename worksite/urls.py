@@ -19,6 +19,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path, re_path
 
+from services.metrics import metrics_view
+
 from .settings import MEDIA_ROOT, MEDIA_URL
 
 # domain.com/
@@ -28,4 +30,5 @@ urlpatterns = [
     path("", include("home_app.urls")),
     path("api/v1/", include("apiv1.urls")),
     re_path(r"^authorization/", include("djoser.urls.authtoken")),
+    path("metrics", metrics_view, name="metrics"),
 ] + static(MEDIA_URL, document_root=MEDIA_ROOT)
@@ -1,7 +1,10 @@
 from django.contrib import admin
 
-from worksite_app.models import Offer, Rating, Vacancy
+from worksite_app.models import ArchivedOffer, ArchivedVacancy, Offer, Rating, RatingEligibility, Vacancy
 
 admin.site.register(Vacancy)
 admin.site.register(Offer)
 admin.site.register(Rating)
+admin.site.register(RatingEligibility)
+admin.site.register(ArchivedVacancy)
+admin.site.register(ArchivedOffer)
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class WorksiteAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "worksite_app"
+
+    def ready(self) -> None:
+        from services.instrumentation import add_slow_query_log
+
+        connection_created.connect(add_slow_query_log)
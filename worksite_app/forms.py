@@ -1,3 +1,5 @@
+from typing import Optional
+
 from django import forms
 from django.core.validators import MaxValueValidator, MinValueValidator
 
@@ -69,6 +71,10 @@ class AddOfferForm(forms.ModelForm):
         model = Offer
         fields = "resume", "resume_text"
 
+    def clean_resume_text(self) -> Optional[str]:
+        # пустое письменное резюме хранится как NULL, иначе не пройдет проверка ограничения only_one_resume
+        return self.cleaned_data["resume_text"] or None
+
 
 class AddRatingForm(forms.ModelForm):
     rating = forms.ChoiceField(choices=RATINGS, required=False, label="Оценка")
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from services.company_stats import Period, update_company_stats
+from worksite_app.models import ArchivedOffer, Offer
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает дневную статистику откликов компаний за период (по умолчанию - с первого отклика). "
+        "Пересчет можно повторять, строки дней периода заменяются."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Первый день (ГГГГ-ММ-ДД).")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Последний день (ГГГГ-ММ-ДД).")
+
+    def handle(self, *args, **options) -> None:
+        date_to = options["date_to"] or timezone.localdate()
+        date_from = options["date_from"] or self._get_first_date(date_to)
+        if date_from > date_to:
+            raise CommandError("--from is later than --to.")
+        report = {"days": 0, "rows": 0, "withdrawals": 0}
+        # по месяцу за раз, чтобы был виден прогресс длинного пересчета
+        while date_from <= date_to:
+            period = Period(date_from, min(date_from + timedelta(days=30), date_to))
+            for key, value in update_company_stats(period).items():
+                report[key] += value
+            self.stdout.write(f"{period.date_from} - {period.date_to}: {report['rows']} rows")
+            date_from = period.date_to + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Processed days: {report['days']}, rows: {report['rows']}"))
+
+    @staticmethod
+    def _get_first_date(date_to: date) -> date:
+        times = [
+            model.objects.order_by("time_added").values_list("time_added", flat=True).first()
+            for model in (Offer, ArchivedOffer)
+        ]
+        times = [timezone.localdate(value) for value in times if value is not None]
+        return min(times, default=date_to - timedelta(days=settings.COMPANY_STATS_REFRESH_DAYS - 1))
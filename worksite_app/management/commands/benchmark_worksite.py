@@ -0,0 +1,267 @@
+import gzip
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from apiv1.renderers import ORJSONRenderer
+from services.compression import brotli
+from services.seeding import SeedScale, seed_worksite
+from worksite_app.constants import EXPERIENCE_CHOICES_VALID_VALUES, FILTERED_CITIES
+from worksite_app.models import Offer, Rating, Vacancy
+
+SCALES = {
+    "small": SeedScale(companies=20, applicants=200, vacancys=2000, offers=5000, ratings=500),
+    "medium": SeedScale(companies=100, applicants=2000, vacancys=20000, offers=50000, ratings=5000),
+    "large": SeedScale(companies=500, applicants=10000, vacancys=200000, offers=500000, ratings=25000),
+}
+
+
+class Scenario(NamedTuple):
+    """Структура данных с описанием измеряемого запроса."""
+
+    name: str
+    url: str
+    user: Optional[User] = None
+    token: Optional[str] = None
+
+
+class ScenarioResult(NamedTuple):
+    """Структура данных с результатами измерения сценария (время в миллисекундах, память в килобайтах)."""
+
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    queries: int
+    peak_memory_kb: float
+
+
+class EncodingResult(NamedTuple):
+    """
+    Структура данных с временем кодирования ответа API стандартным json и orjson (в миллисекундах) и его
+    размером без сжатия, с gzip и brotli (None, если пакет brotli не установлен).
+    """
+
+    json_ms: float
+    orjson_ms: float
+    bytes: int
+    gzip_bytes: int
+    br_bytes: Optional[int]
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет отдельную тестовую БД синтетическими данными и измеряет время ответа, число SQL запросов и "
+        "пиковую память основных страниц и API. Результаты сохраняются в JSON и сравниваются с базовыми. "
+        "Локально запускается с --settings=worksite.settings_benchmark (SQLite и кеш в памяти)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--scale", choices=tuple(SCALES), default="small", help="Размер набора данных.")
+        parser.add_argument("--iterations", type=int, default=30, help="Запросов на каждый сценарий.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора данных.")
+        parser.add_argument("--output", default="benchmark_results.json", help="Файл для результатов.")
+        parser.add_argument("--baseline", default="benchmarks/baseline.json", help="Файл с базовыми результатами.")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2, help="Допустимый рост p95 и памяти относительно базовых."
+        )
+        parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как базовые.")
+
+    def handle(self, *args, **options) -> None:
+        if options["iterations"] < 2:
+            raise CommandError("--iterations must be at least 2.")
+        scale = SCALES[options["scale"]]
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            seed_worksite(scale, seed=options["seed"])
+            self.stdout.write(f"Seeded {options['scale']} dataset in {time.perf_counter() - started:.1f}s")
+            scenarios_list = self._get_scenarios()
+            scenarios = {
+                scenario.name: self._measure(scenario, options["iterations"])._asdict() for scenario in scenarios_list
+            }
+            encoding = {
+                scenario.name: self._measure_encoding(scenario, options["iterations"])._asdict()
+                for scenario in scenarios_list
+                if scenario.token
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = {
+            "meta": {
+                "scale": options["scale"],
+                "iterations": options["iterations"],
+                "seed": options["seed"],
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "created": timezone.now().isoformat(),
+            },
+            "scenarios": scenarios,
+            "encoding": encoding,
+        }
+        self._write(Path(options["output"]), results)
+        self._print_encoding(encoding)
+        if options["save_baseline"]:
+            self._write(Path(options["baseline"]), results)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved: {options['baseline']}"))
+            return
+
+        baseline_path = Path(options["baseline"])
+        if not baseline_path.exists():
+            self._print(scenarios, {})
+            self.stdout.write(self.style.WARNING(f"Baseline {baseline_path} not found, nothing to compare."))
+            return
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline["meta"]["scale"] != options["scale"]:
+            self.stdout.write(self.style.WARNING(f"Baseline was measured on {baseline['meta']['scale']} scale."))
+        regressions = self._compare(scenarios, baseline["scenarios"], options["threshold"])
+        self._print(scenarios, baseline["scenarios"])
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    @staticmethod
+    def _get_scenarios() -> List[Scenario]:
+        """Сценарии строятся по самым "тяжелым" объектам: вакансии с наибольшим числом откликов и т.п."""
+
+        vacancy_id = (
+            Offer.objects.filter(vacancy__archived=False)
+            .values("vacancy")
+            .annotate(n=Count("pk"))
+            .order_by("-n")[0]["vacancy"]
+        )
+        company = Vacancy.objects.select_related("company").get(pk=vacancy_id).company
+        applicant_id = Offer.objects.values("applicant").annotate(n=Count("pk")).order_by("-n")[0]["applicant"]
+        applicant = User.objects.get(pk=applicant_id)
+        rated = User.objects.get(
+            pk=Rating.objects.values("company").annotate(n=Count("pk")).order_by("-n")[0]["company"]
+        )
+        token = Token.objects.get_or_create(user=applicant)[0].key
+        # глубокая страница - ближе к концу списка открытых вакансий при любом размере набора данных
+        deep_offset = Vacancy.objects.filter(archived=False, deleted=False).count() * 4 // 5
+        filters = f"city={FILTERED_CITIES[1]}&celery_from=50000&celery_to=200000" + "".join(
+            f"&ex{ex}=on" for ex in EXPERIENCE_CHOICES_VALID_VALUES[:2]
+        )
+        return [
+            Scenario("home", "/worksite/"),
+            Scenario("home_filters", f"/worksite/?{filters}"),
+            Scenario("home_search", "/worksite/?search=developer&name_search=on"),
+            Scenario("some_vacancy", f"/worksite/vacancy/{vacancy_id}/", applicant),
+            Scenario("company_rating", f"/worksite/{rated.username}/ratings/"),
+            Scenario("vacancy_offers", f"/worksite/vacancy/{vacancy_id}/offers/", company),
+            Scenario("api_vacancys", "/api/v1/vacancys/", token=token),
+            Scenario("api_vacancys_deep", f"/api/v1/vacancys/?offset={deep_offset}", token=token),
+            Scenario("api_vacancys_cursor", "/api/v1/vacancys/?cursor=", token=token),
+            Scenario("api_offers", "/api/v1/offers/", token=token),
+            Scenario("api_company_ratings", f"/api/v1/company/{rated.username}/ratings/", token=token),
+        ]
+
+    @staticmethod
+    def _measure(scenario: Scenario, iterations: int) -> ScenarioResult:
+        client = Client()
+        if scenario.user:
+            client.force_login(scenario.user)
+        headers = {"HTTP_AUTHORIZATION": f"Token {scenario.token}"} if scenario.token else {}
+        response = client.get(scenario.url, **headers)  # прогрев кеша, заодно проверка сценария
+        if response.status_code != 200:
+            raise CommandError(f"{scenario.name}: GET {scenario.url} returned {response.status_code}.")
+
+        timings, queries = [], []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                client.get(scenario.url, **headers)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        # память измеряется отдельным запросом: tracemalloc сильно замедляет выполнение и исказил бы время
+        tracemalloc.start()
+        try:
+            client.get(scenario.url, **headers)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        return ScenarioResult(
+            p50_ms=round(percentiles[49], 2),
+            p95_ms=round(percentiles[94], 2),
+            p99_ms=round(percentiles[98], 2),
+            mean_ms=round(statistics.fmean(timings), 2),
+            queries=max(queries),
+            peak_memory_kb=round(peak / 1024, 1),
+        )
+
+    @staticmethod
+    def _measure_encoding(scenario: Scenario, iterations: int) -> EncodingResult:
+        data = Client().get(scenario.url, HTTP_AUTHORIZATION=f"Token {scenario.token}").data
+        timings = {}
+        for name, renderer in (("json", JSONRenderer()), ("orjson", ORJSONRenderer())):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                content = renderer.render(data)
+            timings[name] = (time.perf_counter() - started) * 1000 / iterations
+        return EncodingResult(
+            json_ms=round(timings["json"], 3),
+            orjson_ms=round(timings["orjson"], 3),
+            bytes=len(content),
+            gzip_bytes=len(gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL)),
+            br_bytes=len(brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)) if brotli else None,
+        )
+
+    @staticmethod
+    def _compare(scenarios: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+        """Регрессия - рост p95 или памяти больше чем на threshold, либо любой рост числа SQL запросов."""
+
+        regressions = []
+        for name, result in scenarios.items():
+            base = baseline.get(name, None)
+            if base is None:
+                continue
+            for metric in ("p95_ms", "peak_memory_kb"):
+                if result[metric] > base[metric] * (1 + threshold):
+                    regressions.append(f"{name}: {metric} {base[metric]} -> {result[metric]}")
+            if result["queries"] > base["queries"]:
+                regressions.append(f"{name}: queries {base['queries']} -> {result['queries']}")
+        return regressions
+
+    def _print(self, scenarios: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+        self.stdout.write(
+            f"{'scenario':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'memory KB':>11}{'p95 diff':>10}"
+        )
+        for name, result in scenarios.items():
+            base_p95 = baseline.get(name, {}).get("p95_ms", None)
+            diff = f"{(result['p95_ms'] / base_p95 - 1) * 100:+.0f}%" if base_p95 else "-"
+            self.stdout.write(
+                f"{name:<22}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{result['queries']:>9}{result['peak_memory_kb']:>11.1f}{diff:>10}"
+            )
+
+    def _print_encoding(self, encoding: Dict[str, Dict]) -> None:
+        self.stdout.write(f"{'encoding':<22}{'json ms':>9}{'orjson ms':>11}{'bytes':>9}{'gzip':>9}{'br':>9}")
+        for name, result in encoding.items():
+            self.stdout.write(
+                f"{name:<22}{result['json_ms']:>9.3f}{result['orjson_ms']:>11.3f}{result['bytes']:>9}"
+                f"{result['gzip_bytes']:>9}{result['br_bytes'] if result['br_bytes'] is not None else '-':>9}"
+            )
+
+    @staticmethod
+    def _write(path: Path, results: Dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
@@ -0,0 +1,153 @@
+import csv
+import json
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+
+from error_messages.errors import E
+from error_messages.worksite_error_messages import BulkErrors, VacancyErrors
+from home_app.models import CompanySettings
+from services.common_utils import change_counter, check_is_user_company, delete_user_settings_cache, insert_rows
+from worksite_app.constants import EXPERIENCE_CHOICES_VALID_VALUES, FILTERED_CITIES
+from worksite_app.forms import AddVacancyForm
+from worksite_app.models import Vacancy
+
+FIELDS = "name", "description", "money", "experience", "city", "skills"
+# "Любой" есть в FILTERED_CITIES только как значение фильтра, у вакансии должен быть конкретный город
+CITIES = frozenset(FILTERED_CITIES) - {"Любой"}
+SKILLS_MAX_LENGTH = Vacancy._meta.get_field("skills").max_length
+
+
+class VacancyRowValidator(object):
+    """
+    Проверка строк импорта по тем же правилам, что и AddVacancyForm, но без создания формы на каждую строку:
+    поля формы создаются один раз, а для строки вызывается только их clean().
+    """
+
+    def __init__(self):
+        self.fields = AddVacancyForm().fields
+
+    def validate(self, row: Dict) -> Tuple[Dict, List[E]]:
+        data, errors = {}, []
+        for name in FIELDS:
+            try:
+                data[name] = self.fields[name].clean(row.get(name, None))
+            except ValidationError:
+                errors.append(VacancyErrors[name])
+        if "experience" in data and data["experience"] not in EXPERIENCE_CHOICES_VALID_VALUES:
+            errors.append(VacancyErrors["experience"])
+        if "city" in data and data["city"] not in CITIES:
+            errors.append(VacancyErrors["city"])
+        if "skills" in data and len(data["skills"]) > SKILLS_MAX_LENGTH:
+            errors.append(VacancyErrors["skills"])
+        return data, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует вакансии компании из CSV или JSONL файла (или stdin) пачками. "
+        "Отклоненные строки записываются в отдельный JSONL файл."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", help="Путь к файлу или - для чтения из stdin.")
+        parser.add_argument("--company", required=True, help="username компании-владельца вакансий.")
+        parser.add_argument("--input-format", choices=("csv", "jsonl"), help="По умолчанию по расширению файла.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Строк в одной вставке.")
+        parser.add_argument("--rejects", help="Файл для отклоненных строк (по умолчанию <path>.rejects.jsonl).")
+        parser.add_argument("--copy", action="store_true", help="Вставлять через COPY (только PostgreSQL).")
+
+    def handle(self, *args, **options) -> None:
+        company = User.objects.filter(username=options["company"]).first()
+        if company is None or not check_is_user_company(company):
+            raise CommandError(f"Company {options['company']} does not exist.")
+        if options["copy"] and connection.vendor != "postgresql":
+            raise CommandError("--copy is supported only on PostgreSQL.")
+        path = options["path"]
+        input_format = options["input_format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        rejects_path = options["rejects"] or ("import_rejects.jsonl" if path == "-" else f"{path}.rejects.jsonl")
+        insert = self._copy if options["copy"] else self._bulk_create
+
+        validator = VacancyRowValidator()
+        rejects: Optional[TextIO] = None
+        batch: List[Vacancy] = []
+        read = inserted = rejected = 0
+        started = time.perf_counter()
+        file = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+        try:
+            for line, row in self._read_rows(file, input_format):
+                read += 1
+                data, errors = validator.validate(row) if isinstance(row, dict) else ({}, [BulkErrors["item"]])
+                if errors:
+                    rejects = rejects or open(rejects_path, "w", encoding="utf-8")
+                    rejects.write(self._get_reject_line(line, row, errors))
+                    rejected += 1
+                    continue
+                batch.append(Vacancy(company=company, **data))
+                if len(batch) >= options["batch_size"]:
+                    inserted += self._flush(batch, company, insert)
+                    batch = []
+            inserted += self._flush(batch, company, insert)
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if rejects:
+                rejects.close()
+            delete_user_settings_cache(company.pk)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read: {read}, inserted: {inserted}, rejected: {rejected}, "
+                f"time: {elapsed:.2f}s, rows/sec: {read / elapsed if elapsed else 0:.0f}"
+            )
+        )
+        if rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected rows: {rejects_path}"))
+
+    @staticmethod
+    def _read_rows(file: TextIO, input_format: str) -> Iterator[Tuple[int, Dict]]:
+        if input_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(file, 1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except json.JSONDecodeError:
+                    yield line, text
+
+    @staticmethod
+    def _get_reject_line(line: int, row: Dict | str, errors: List[E]) -> str:
+        reject = {"line": line, "row": row, "errors": [{"code": e.code, "detail": e.message} for e in errors]}
+        return json.dumps(reject, ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def _flush(batch: List[Vacancy], company: User, insert: Callable[[List[Vacancy]], None]) -> int:
+        if not batch:
+            return 0
+        with transaction.atomic():
+            insert(batch)
+            change_counter(CompanySettings.objects.filter(company=company), "vacancys_count", len(batch))
+        return len(batch)
+
+    @staticmethod
+    def _bulk_create(batch: List[Vacancy]) -> None:
+        Vacancy.objects.bulk_create(batch)
+
+    @staticmethod
+    def _copy(batch: List[Vacancy]) -> None:
+        """Вставка пачки через COPY FROM STDIN (быстрее INSERT на больших объемах)."""
+
+        fields = [field for field in Vacancy._meta.concrete_fields if not field.primary_key]
+        rows = (
+            [field.get_db_prep_save(field.pre_save(vacancy, True), connection) for field in fields] for vacancy in batch
+        )
+        insert_rows(Vacancy, [field.column for field in fields], rows)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from tasks.worksite_app_tasks import extract_resume_text
+from worksite_app.models import Offer
+
+
+class Command(BaseCommand):
+    help = "Извлекает текст резюме для откликов, которые еще не попали в поисковый индекс."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--all", action="store_true", help="Переиндексировать все отклики.")
+        parser.add_argument("--delay", action="store_true", help="Ставить задачи в очередь celery.")
+
+    def handle(self, *args, **options) -> None:
+        offers = Offer.objects.all() if options["all"] else Offer.objects.filter(resume_search_text="")
+        count = 0
+        for offer_id in offers.values_list("pk", flat=True).iterator():
+            if options["delay"]:
+                extract_resume_text.delay(offer_id)
+            else:
+                extract_resume_text(offer_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed offers: {count}"))
@@ -0,0 +1,51 @@
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from services.seeding import SEED_NOW, SEED_PASSWORD, SeedScale, seed_worksite
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет БД синтетическими компаниями, соискателями, вакансиями, откликами и отзывами "
+        "(для воспроизведения нагрузки продакшена локально). При одинаковом --seed данные одинаковые."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--companies", type=int, default=100)
+        parser.add_argument("--applicants", type=int, default=2000)
+        parser.add_argument("--vacancys", type=int, default=10000)
+        parser.add_argument("--offers", type=int, default=30000, help="Примерное общее число откликов.")
+        parser.add_argument("--ratings", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора данных.")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Строк в одной вставке.")
+        parser.add_argument(
+            "--now",
+            type=datetime.fromisoformat,
+            default=SEED_NOW,
+            help="Момент, до которого генерируются даты (ISO 8601, по умолчанию фиксированный).",
+        )
+
+    def handle(self, *args, **options) -> None:
+        scale = SeedScale(*(options[field] for field in SeedScale._fields))
+        if min(scale) < 0 or options["chunk_size"] < 1:
+            raise CommandError("Counts must not be negative and --chunk-size must be positive.")
+        if scale.vacancys and not (scale.companies and scale.applicants):
+            raise CommandError("Vacancies require at least one company and one applicant.")
+        if User.objects.filter(username__in=("company0", "applicant0")).exists():
+            raise CommandError("The database is already seeded (user company0 or applicant0 exists).")
+
+        started = time.perf_counter()
+        now = options["now"] if timezone.is_aware(options["now"]) else timezone.make_aware(options["now"])
+        created = seed_worksite(scale, seed=options["seed"], chunk_size=options["chunk_size"], now=now)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(f"{field}: {count}" for field, count in created._asdict().items())
+                + f", time: {elapsed:.2f}s, vacancys/sec: {created.vacancys / elapsed if elapsed else 0:.0f}"
+            )
+        )
+        self.stdout.write(f"Users company<N> and applicant<N> have password {SEED_PASSWORD!r}.")
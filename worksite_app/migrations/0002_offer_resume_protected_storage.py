@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 02:50
+
+import os
+import shutil
+
+import worksite_app.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_resumes_to_protected_storage(apps, schema_editor):
+    Offer = apps.get_model("worksite_app", "Offer")
+    for name in Offer.objects.exclude(resume="").values_list("resume", flat=True).iterator():
+        source = os.path.join(settings.BASE_DIR, settings.MEDIA_ROOT, name)
+        destination = os.path.join(settings.BASE_DIR, settings.PROTECTED_MEDIA_ROOT, name)
+        if os.path.isfile(source) and not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.move(source, destination)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="offer",
+            name="resume",
+            field=models.FileField(default="", storage=worksite_app.models.resumes_storage, upload_to="offers/"),
+        ),
+        migrations.RunPython(move_resumes_to_protected_storage, migrations.RunPython.noop),
+    ]
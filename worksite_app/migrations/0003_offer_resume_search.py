@@ -0,0 +1,53 @@
+# Generated by Django 5.0 on 2026-10-19 03:40
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import F
+
+# GIN индекс по tsvector существует только в PostgreSQL, поэтому создается вручную, а не через Meta.indexes.
+SEARCH_INDEX_NAME = "worksite_app_offer_resume_search_gin"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{SEARCH_INDEX_NAME}" ON "worksite_app_offer" USING GIN ("resume_search_vector")'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{SEARCH_INDEX_NAME}"')
+
+
+def fill_search_text_from_resume_text(apps, schema_editor):
+    Offer = apps.get_model("worksite_app", "Offer")
+    offers = Offer.objects.filter(resume_text__isnull=False).exclude(resume_text="")
+    offers.update(resume_search_text=F("resume_text"))
+    if schema_editor.connection.vendor == "postgresql":
+        offers.update(resume_search_vector=SearchVector("resume_search_text", config=settings.OFFERS_SEARCH_CONFIG))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0002_offer_resume_protected_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="offer",
+            name="resume_search_text",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="offer",
+            name="resume_search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_search_text_from_resume_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0 on 2026-10-19 04:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, group_by):
+    return Coalesce(Subquery(queryset.order_by().values(group_by).annotate(c=Count("pk")).values("c")), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Vacancy = apps.get_model("worksite_app", "Vacancy")
+    Offer = apps.get_model("worksite_app", "Offer")
+    CompanySettings = apps.get_model("home_app", "CompanySettings")
+    ApplicantSettings = apps.get_model("home_app", "ApplicantSettings")
+
+    Vacancy.objects.update(
+        offers_count=_count(Offer.objects.filter(vacancy=OuterRef("pk"), withdrawn=False), "vacancy")
+    )
+    CompanySettings.objects.update(
+        vacancys_count=_count(
+            Vacancy.objects.filter(company=OuterRef("company"), archived=False, deleted=False), "company"
+        )
+    )
+    ApplicantSettings.objects.update(
+        offers_count=_count(Offer.objects.filter(applicant=OuterRef("applicant")), "applicant")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("home_app", "0002_settings_counters"),
+        ("worksite_app", "0003_offer_resume_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vacancy",
+            name="offers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
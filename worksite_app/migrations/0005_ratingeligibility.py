@@ -0,0 +1,62 @@
+# Generated by Django 5.0 on 2026-10-19 05:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def fill_rating_eligibility(apps, schema_editor):
+    Offer = apps.get_model("worksite_app", "Offer")
+    Rating = apps.get_model("worksite_app", "Rating")
+    RatingEligibility = apps.get_model("worksite_app", "RatingEligibility")
+
+    rated = Rating.objects.filter(applicant=OuterRef("applicant"), company=OuterRef("vacancy__company"))
+    pairs = (
+        Offer.objects.filter(applyed=True)
+        .annotate(consumed=Exists(rated))
+        .values_list("applicant_id", "vacancy__company_id", "consumed")
+        .distinct()
+    )
+    RatingEligibility.objects.bulk_create(
+        (
+            RatingEligibility(applicant_id=applicant_id, company_id=company_id, consumed=consumed)
+            for applicant_id, company_id, consumed in pairs.iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("worksite_app", "0004_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RatingEligibility",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("consumed", models.BooleanField(default=False)),
+                ("time_added", models.DateTimeField(auto_now_add=True)),
+                (
+                    "applicant",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("applicant", "company"), name="unique_rating_eligibility")
+                ],
+            },
+        ),
+        migrations.RunPython(fill_rating_eligibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.0 on 2026-10-19 06:10
+
+import django.db.models.deletion
+import worksite_app.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Now
+
+
+def fill_time_closed(apps, schema_editor):
+    Vacancy = apps.get_model("worksite_app", "Vacancy")
+    Offer = apps.get_model("worksite_app", "Offer")
+
+    # для архивированных вакансий известно время принятия оффера, для удаленных берется время миграции
+    time_applyed = Offer.objects.filter(vacancy=OuterRef("pk"), applyed=True).values("time_applyed")[:1]
+    Vacancy.objects.filter(Q(archived=True) | Q(deleted=True)).update(
+        time_closed=Coalesce(Subquery(time_applyed), Now())
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("worksite_app", "0005_ratingeligibility"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vacancy",
+            name="time_closed",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="vacancy",
+            index=models.Index(
+                condition=models.Q(("time_closed__isnull", False)),
+                fields=["time_closed"],
+                name="worksite_vacancy_closed_idx",
+            ),
+        ),
+        migrations.RunPython(fill_time_closed, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="ArchivedVacancy",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("name", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True, default="", null=True)),
+                ("money", models.PositiveIntegerField()),
+                (
+                    "experience",
+                    models.CharField(
+                        choices=[
+                            ("0", "не требуется"),
+                            ("1", "1 год"),
+                            ("2", "1-3 лет"),
+                            ("3", "3-5 лет"),
+                            ("4", "5+ лет"),
+                        ],
+                        max_length=1,
+                    ),
+                ),
+                ("city", models.CharField(max_length=20)),
+                ("skills", models.CharField(blank=True, default="", max_length=512, null=True)),
+                ("time_added", models.DateTimeField()),
+                ("archived", models.BooleanField(default=False)),
+                ("deleted", models.BooleanField(default=False)),
+                ("time_closed", models.DateTimeField(null=True)),
+                ("time_archived", models.DateTimeField(auto_now_add=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-time_added",),
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedOffer",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "resume",
+                    models.FileField(default="", storage=worksite_app.models.resumes_storage, upload_to="offers/"),
+                ),
+                ("resume_text", models.TextField(blank=True, null=True)),
+                ("applyed", models.BooleanField(default=False)),
+                ("withdrawn", models.BooleanField(default=False)),
+                ("time_added", models.DateTimeField()),
+                ("time_applyed", models.DateTimeField(null=True)),
+                (
+                    "applicant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+                (
+                    "vacancy",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="offers",
+                        to="worksite_app.archivedvacancy",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-time_added",),
+            },
+        ),
+    ]
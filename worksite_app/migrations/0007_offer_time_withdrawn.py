@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-19 07:20
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def fill_time_withdrawn(apps, schema_editor):
+    # время отмены ранее отмененных откликов неизвестно, срок хранения для них отсчитывается от миграции
+    for model in ("Offer", "ArchivedOffer"):
+        apps.get_model("worksite_app", model).objects.filter(withdrawn=True).update(time_withdrawn=Now())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0006_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedoffer",
+            name="time_withdrawn",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name="offer",
+            name="time_withdrawn",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_time_withdrawn, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0007_offer_time_withdrawn"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vacancy",
+            index=models.Index(
+                condition=models.Q(("archived", False), ("deleted", False)),
+                fields=["-time_added", "-id"],
+                name="worksite_vacancy_active_idx",
+            ),
+        ),
+    ]
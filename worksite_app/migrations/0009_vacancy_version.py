@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0008_vacancy_active_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vacancy",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0 on 2026-10-19 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0009_vacancy_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarVacancy",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("position", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="worksite_app.vacancy",
+                    ),
+                ),
+                (
+                    "vacancy",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_vacancys",
+                        to="worksite_app.vacancy",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("vacancy", "position"), name="unique_similar_vacancy_position")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.0 on 2026-10-19 15:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("worksite_app", "0010_similarvacancy"),
+    ]
+
+    operations = [
+        # существующие вакансии считаются уже проверенными, иначе по ним пришли бы уведомления о "новых" вакансиях
+        migrations.AddField(
+            model_name="vacancy",
+            name="saved_searches_matched",
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="vacancy",
+            name="saved_searches_matched",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="vacancy",
+            index=models.Index(
+                condition=models.Q(("saved_searches_matched", False)),
+                fields=["id"],
+                name="worksite_vacancy_unmatched_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="SavedSearch",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("params", models.JSONField()),
+                ("city", models.CharField(blank=True, default="", max_length=20)),
+                ("money_from", models.PositiveIntegerField(null=True)),
+                ("money_to", models.PositiveIntegerField(null=True)),
+                ("experience", models.CharField(blank=True, default="", max_length=5)),
+                ("search", models.CharField(blank=True, default="", max_length=100)),
+                ("search_fields", models.CharField(blank=True, default="", max_length=32)),
+                ("search_key", models.CharField(blank=True, default="", max_length=3)),
+                ("time_added", models.DateTimeField(auto_now_add=True)),
+                (
+                    "applicant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="saved_searches",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-time_added",),
+                "indexes": [models.Index(fields=["search_key", "city"], name="worksite_savedsearch_key_idx")],
+            },
+        ),
+        migrations.CreateModel(
+            name="SavedSearchMatch",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("notified", models.BooleanField(default=False)),
+                ("time_added", models.DateTimeField(auto_now_add=True)),
+                (
+                    "saved_search",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches",
+                        to="worksite_app.savedsearch",
+                    ),
+                ),
+                (
+                    "vacancy",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="worksite_app.vacancy",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("notified", False)),
+                        fields=["id"],
+                        name="worksite_match_pending_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("saved_search", "vacancy"), name="unique_saved_search_match")
+                ],
+            },
+        ),
+    ]
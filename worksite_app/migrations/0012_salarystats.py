@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0011_savedsearch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SalaryStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("city", models.CharField(max_length=20)),
+                ("experience", models.CharField(blank=True, default="", max_length=1)),
+                ("count", models.PositiveIntegerField()),
+                ("p10", models.PositiveIntegerField()),
+                ("p50", models.PositiveIntegerField()),
+                ("p90", models.PositiveIntegerField()),
+                ("histogram", models.JSONField()),
+                ("money_sum", models.BigIntegerField()),
+                ("ids_sum", models.BigIntegerField()),
+                ("time_updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("city", "experience"), name="unique_salary_stats_group")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0 on 2026-10-19 19:40
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("worksite_app", "0012_salarystats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="offer",
+            index=models.Index(fields=["time_added"], name="worksite_offer_added_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="offer",
+            index=models.Index(
+                condition=models.Q(("time_applyed__isnull", False)),
+                fields=["time_applyed"],
+                name="worksite_offer_applyed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="offer",
+            index=models.Index(
+                condition=models.Q(("time_withdrawn__isnull", False)),
+                fields=["time_withdrawn"],
+                name="worksite_offer_withdrawn_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="CompanyDailyStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("vacancy_id", models.BigIntegerField()),
+                ("vacancy_name", models.CharField(max_length=100)),
+                ("date", models.DateField()),
+                ("offers_count", models.PositiveIntegerField(default=0)),
+                ("applyed_count", models.PositiveIntegerField(default=0)),
+                ("withdrawn_count", models.PositiveIntegerField(default=0)),
+                ("time_to_apply_sum", models.DurationField(default=datetime.timedelta)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["company", "date"], name="worksite_company_stats_idx")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("vacancy_id", "date"), name="unique_company_daily_stats")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0013_companydailystats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companydailystats",
+            name="offers_withdrawn_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
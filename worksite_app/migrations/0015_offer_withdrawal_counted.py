@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0014_companydailystats_offers_withdrawn_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="offer",
+            name="withdrawal_counted",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="archivedoffer",
+            name="withdrawal_counted",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="offer",
+            index=models.Index(
+                condition=models.Q(("withdrawal_counted", False), ("withdrawn", True)),
+                fields=["time_added"],
+                name="worksite_offer_uncounted_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedoffer",
+            index=models.Index(
+                condition=models.Q(("withdrawal_counted", False), ("withdrawn", True)),
+                fields=["time_added"],
+                name="worksite_arch_uncounted_idx",
+            ),
+        ),
+    ]
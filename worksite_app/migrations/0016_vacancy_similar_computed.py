@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-19 11:05
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def fill_similar_computed(apps, schema_editor):
+    # вакансии без списка похожих посчитает следующее обновление похожих вакансий
+    similar = apps.get_model("worksite_app", "SimilarVacancy").objects.filter(vacancy=OuterRef("pk"))
+    apps.get_model("worksite_app", "Vacancy").objects.filter(Exists(similar)).update(similar_computed=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("worksite_app", "0015_offer_withdrawal_counted"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vacancy",
+            name="similar_computed",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="vacancy",
+            index=models.Index(
+                condition=models.Q(("similar_computed", False)), fields=["id"], name="worksite_vacancy_unscored_idx"
+            ),
+        ),
+        migrations.RunPython(fill_similar_computed, migrations.RunPython.noop),
+    ]
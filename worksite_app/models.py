@@ -1,6 +1,10 @@
 import json
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files.storage import FileSystemStorage
 from django.core.validators import MaxValueValidator, MinLengthValidator, MinValueValidator
 from django.db import models
 from django.db.models.query_utils import Q
@@ -8,6 +12,14 @@ from django.db.models.query_utils import Q
 from .constants import EXPERIENCE_CHOICES, RATINGS
 
 
+def resumes_storage() -> FileSystemStorage:
+    """Хранилище файлов с резюме, недоступное для прямой раздачи как медиа."""
+
+    return FileSystemStorage(
+        location=settings.BASE_DIR / settings.PROTECTED_MEDIA_ROOT, base_url=settings.PROTECTED_MEDIA_URL
+    )
+
+
 class Vacancy(models.Model):
     """Модель для вакансий."""
 
@@ -21,8 +33,33 @@ class Vacancy(models.Model):
     time_added = models.DateTimeField(auto_now_add=True, blank=True)
     archived = models.BooleanField(default=False)
     deleted = models.BooleanField(default=False)
+    # Денормализованный счетчик неотозванных откликов на вакансию.
+    offers_count = models.PositiveIntegerField(default=0, editable=False)
+    # Время архивации или удаления, по нему закрытые вакансии переносятся в архивные таблицы.
+    time_closed = models.DateTimeField(null=True, editable=False)
+    # Версия вакансии для ключа кеша ее карточки, увеличивается при изменении вакансии.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Вакансия уже проверена на совпадение с сохраненными поисками (см. services.saved_searches).
+    saved_searches_matched = models.BooleanField(default=False, editable=False)
+    # Для вакансии уже посчитан список похожих, возможно пустой (см. services.similar_vacancys).
+    similar_computed = models.BooleanField(default=False, editable=False)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=("time_closed",), condition=Q(time_closed__isnull=False), name="worksite_vacancy_closed_idx"
+            ),
+            # ключ keyset пагинации активных вакансий в API (см. apiv1.pagination.HybridPagination)
+            models.Index(
+                fields=("-time_added", "-id"),
+                condition=Q(archived=False, deleted=False),
+                name="worksite_vacancy_active_idx",
+            ),
+            models.Index(
+                fields=("id",), condition=Q(saved_searches_matched=False), name="worksite_vacancy_unmatched_idx"
+            ),
+            models.Index(fields=("id",), condition=Q(similar_computed=False), name="worksite_vacancy_unscored_idx"),
+        ]
         ordering = ("-time_added",)
 
     def __str__(self):
@@ -37,12 +74,18 @@ class Offer(models.Model):
 
     applicant = models.ForeignKey(User, on_delete=models.CASCADE)
     vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE)
-    resume = models.FileField(upload_to="offers/", default="")
+    resume = models.FileField(upload_to="offers/", storage=resumes_storage, default="")
     resume_text = models.TextField(max_length=2048, blank=True, default="", validators=[MinLengthValidator(64)])
+    # Текст резюме для поиска (извлеченный из файла или скопированный из resume_text), заполняется в фоне.
+    resume_search_text = models.TextField(blank=True, default="", editable=False)
+    resume_search_vector = SearchVectorField(null=True, editable=False)
     applyed = models.BooleanField(default=False)
     withdrawn = models.BooleanField(default=False)
     time_added = models.DateTimeField(auto_now_add=True)
     time_applyed = models.DateTimeField(null=True)
+    time_withdrawn = models.DateTimeField(null=True, editable=False)
+    # отзыв учтен в offers_withdrawn_count дневной статистики дня отклика (см. services.company_stats)
+    withdrawal_counted = models.BooleanField(default=False, editable=False)
 
     class Meta:
         constraints = [
@@ -51,12 +94,101 @@ class Offer(models.Model):
                 name="only_one_resume",
             )
         ]
+        indexes = [
+            # выборка событий откликов за день при подсчете статистики компаний (см. services.company_stats)
+            models.Index(fields=("time_added",), name="worksite_offer_added_idx"),
+            models.Index(
+                fields=("time_applyed",), condition=Q(time_applyed__isnull=False), name="worksite_offer_applyed_idx"
+            ),
+            models.Index(
+                fields=("time_withdrawn",),
+                condition=Q(time_withdrawn__isnull=False),
+                name="worksite_offer_withdrawn_idx",
+            ),
+            models.Index(
+                fields=("time_added",),
+                condition=Q(withdrawn=True, withdrawal_counted=False),
+                name="worksite_offer_uncounted_idx",
+            ),
+        ]
         ordering = ("-time_added",)
 
     def __str__(self):
         return f"{self.pk} offer by {self.applicant}"
 
 
+class ArchivedVacancy(models.Model):
+    """
+    Модель закрытых (архивированных или удаленных) вакансий, перенесенных из Vacancy фоновой задачей.
+    Первичный ключ сохраняется, поэтому ссылки на вакансию продолжают работать.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    company = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    name = models.CharField(max_length=100)
+    # Колонки повторяют таблицы вакансий и откликов, в которых эти поля могут быть NULL
+    description = models.TextField(null=True, blank=True, default="")  # noqa: DJ001
+    money = models.PositiveIntegerField()
+    experience = models.CharField(max_length=1, choices=EXPERIENCE_CHOICES)
+    city = models.CharField(max_length=20)
+    skills = models.CharField(max_length=512, null=True, blank=True, default="")  # noqa: DJ001
+    time_added = models.DateTimeField()
+    archived = models.BooleanField(default=False)
+    deleted = models.BooleanField(default=False)
+    time_closed = models.DateTimeField(null=True)
+    time_archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-time_added",)
+
+    def __str__(self):
+        return f"{self.name}"
+
+
+class ArchivedOffer(models.Model):
+    """Модель откликов на вакансии, перенесенные в ArchivedVacancy."""
+
+    id = models.BigIntegerField(primary_key=True)
+    applicant = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    vacancy = models.ForeignKey(ArchivedVacancy, on_delete=models.CASCADE, related_name="offers")
+    resume = models.FileField(upload_to="offers/", storage=resumes_storage, default="")
+    resume_text = models.TextField(null=True, blank=True)  # noqa: DJ001
+    applyed = models.BooleanField(default=False)
+    withdrawn = models.BooleanField(default=False)
+    time_added = models.DateTimeField()
+    time_applyed = models.DateTimeField(null=True)
+    time_withdrawn = models.DateTimeField(null=True)
+    withdrawal_counted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=("time_added",),
+                condition=Q(withdrawn=True, withdrawal_counted=False),
+                name="worksite_arch_uncounted_idx",
+            )
+        ]
+        ordering = ("-time_added",)
+
+    def __str__(self):
+        return f"{self.pk} archived offer by {self.applicant}"
+
+
+class RatingEligibility(models.Model):
+    """Модель права соискателя оставить отзыв на компанию (появляется после принятия его оффера компанией)."""
+
+    applicant = models.ForeignKey(User, on_delete=models.CASCADE)
+    company = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    consumed = models.BooleanField(default=False)  # отзыв уже оставлен
+    time_added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=("applicant", "company"), name="unique_rating_eligibility")]
+
+    def __str__(self):
+        return f"{self.applicant} can rate {self.company}"
+
+
 class Rating(models.Model):
     """Модель отзывов соискателей на компании."""
 
@@ -71,3 +203,119 @@ class Rating(models.Model):
 
     def __str__(self):
         return f"{self.applicant} review on the '{self.company.first_name}' company"
+
+
+class SimilarVacancy(models.Model):
+    """
+    Модель похожих вакансий, рассчитанных фоновой задачей update_similar_vacancys (см. services.similar_vacancys).
+    У каждой вакансии хранится не больше SIMILAR_VACANCYS_COUNT соседей, упорядоченных по position.
+    """
+
+    vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE, related_name="similar_vacancys")
+    similar = models.ForeignKey(Vacancy, on_delete=models.CASCADE, related_name="+")
+    position = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # индекс этого ограничения используется и для выборки соседей вакансии по порядку
+            models.UniqueConstraint(fields=("vacancy", "position"), name="unique_similar_vacancy_position")
+        ]
+
+    def __str__(self):
+        return f"{self.similar_id} is similar to {self.vacancy_id}"
+
+
+class SavedSearch(models.Model):
+    """
+    Модель сохраненных поисков соискателей. В params хранятся параметры поиска в том виде, в котором их понимают
+    VacancyFilterMixin и VacancySearchMixin, остальные поля - разобранные из них условия, по которым подбираются
+    новые вакансии (см. services.saved_searches).
+    """
+
+    applicant = models.ForeignKey(User, on_delete=models.CASCADE, related_name="saved_searches")
+    params = models.JSONField()
+    city = models.CharField(max_length=20, blank=True, default="")  # пустая строка - любой город
+    money_from = models.PositiveIntegerField(null=True)
+    money_to = models.PositiveIntegerField(null=True)
+    experience = models.CharField(max_length=5, blank=True, default="")  # подходящие значения опыта или любой
+    search = models.CharField(max_length=100, blank=True, default="")
+    search_fields = models.CharField(max_length=32, blank=True, default="")  # поля вакансии через запятую
+    # Ключ инвертированного индекса по ключевым словам - первая триграмма search (пустая строка без search)
+    search_key = models.CharField(max_length=3, blank=True, default="")
+    time_added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=("search_key", "city"), name="worksite_savedsearch_key_idx")]
+        ordering = ("-time_added",)
+
+    def __str__(self):
+        return f"{self.applicant} saved search {self.params}"
+
+
+class SavedSearchMatch(models.Model):
+    """Модель новых вакансий, подошедших под сохраненный поиск. Неотправленные - очередь уведомлений."""
+
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="matches")
+    vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE, related_name="+")
+    notified = models.BooleanField(default=False)
+    time_added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=("saved_search", "vacancy"), name="unique_saved_search_match")]
+        indexes = [models.Index(fields=("id",), condition=Q(notified=False), name="worksite_match_pending_idx")]
+
+    def __str__(self):
+        return f"{self.vacancy_id} matches saved search {self.saved_search_id}"
+
+
+class SalaryStats(models.Model):
+    """
+    Модель статистики зарплат открытых вакансий по городу и опыту (пустая строка experience - все уровни опыта
+    города). Пересчитывается фоновой задачей update_salary_stats только для изменившихся групп, которые
+    определяются по сигнатуре группы: количеству вакансий, сумме зарплат и сумме id (см. services.salary_stats).
+    """
+
+    city = models.CharField(max_length=20)
+    experience = models.CharField(max_length=1, blank=True, default="")
+    count = models.PositiveIntegerField()
+    p10 = models.PositiveIntegerField()
+    p50 = models.PositiveIntegerField()
+    p90 = models.PositiveIntegerField()
+    histogram = models.JSONField()  # количества вакансий в интервалах SALARY_STATS_BINS
+    money_sum = models.BigIntegerField()
+    ids_sum = models.BigIntegerField()
+    time_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=("city", "experience"), name="unique_salary_stats_group")]
+
+    def __str__(self):
+        return f"Salary stats for {self.city} ({self.experience or 'all'})"
+
+
+class CompanyDailyStats(models.Model):
+    """
+    Модель дневной статистики откликов на вакансию, заполняется фоновой задачей update_company_stats из Offer и
+    ArchivedOffer (см. services.company_stats). События считаются в день, когда они произошли: отклики - по
+    time_added, принятия - по time_applyed, отзывы - по time_withdrawn.
+    """
+
+    company = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    # id вакансии в Vacancy или ArchivedVacancy (при архивации id сохраняется), поэтому без внешнего ключа
+    vacancy_id = models.BigIntegerField()
+    vacancy_name = models.CharField(max_length=100)
+    date = models.DateField()
+    offers_count = models.PositiveIntegerField(default=0)
+    # из откликов, поданных в этот день, отозвано (в любой день) - для доли отозванных
+    offers_withdrawn_count = models.PositiveIntegerField(default=0)
+    applyed_count = models.PositiveIntegerField(default=0)
+    withdrawn_count = models.PositiveIntegerField(default=0)
+    time_to_apply_sum = models.DurationField(default=timedelta)  # сумма time_applyed - time_added принятых
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=("vacancy_id", "date"), name="unique_company_daily_stats")]
+        indexes = [models.Index(fields=("company", "date"), name="worksite_company_stats_idx")]
+
+    def __str__(self):
+        return f"Stats for vacancy {self.vacancy_id} on {self.date}"
@@ -1,3 +1,1260 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import pstats
+import tempfile
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from typing import Literal
+from unittest import mock
 
-# Create your tests here.
+import docx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.http import Http404, HttpRequest, HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from rest_framework.authtoken.models import Token
+
+from apiv1.views import ExportCompanyVacancysAPIView
+from home_app.models import ApplicantSettings, CompanySettings, RequestProfile
+from services.common_utils import RequestHost, get_path_to_crop_photo, get_user_settings
+from services.company_stats import Period, update_company_stats
+from services.compression import CompressionMiddleware
+from services.home_app_mixins import UpdateSettingsMixin
+from services.instrumentation import InstrumentationMiddleware
+from services.metrics import MultiDirCollector, clear_multiprocess_dir
+from services.profiling import ProfilingMiddleware
+from services.ratelimit import get_backend
+from services.salary_stats import update_salary_stats
+from services.saved_searches import match_new_vacancys, send_digests
+from services.seeding import SEED_NOW, SeedScale, seed_worksite
+from services.similar_vacancys import update_similar_vacancys
+from services.worksite_app_mixins import (
+    CheckPermissionsToSeeVacancy,
+    CompanyApplyedOffersMixin,
+    OfferQueryNode,
+    OfferSearchMixin,
+)
+from tasks.worksite_app_tasks import (
+    archive_closed_vacancys,
+    delete_expired_offers,
+    extract_resume_text,
+    reconcile_counters,
+    sweep_orphan_media,
+)
+from worksite_app.models import (
+    ArchivedOffer,
+    ArchivedVacancy,
+    CompanyDailyStats,
+    Offer,
+    Rating,
+    RatingEligibility,
+    SalaryStats,
+    SavedSearch,
+    SavedSearchMatch,
+    SimilarVacancy,
+    Vacancy,
+)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SomeVacancyQueriesTestCase(TestCase):
+    """Страница и API вакансии должны загружать все данные одним запросом к БД (и еще одним - похожие вакансии)."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        CompanySettings.objects.create(company=cls.company, company_description="d" * 64, rating=4.0)
+        cls.applicant = User.objects.create_user("applicant", password="password")
+        ApplicantSettings.objects.create(applicant=cls.applicant, timezone="Europe/Moscow")
+        cls.vacancy = Vacancy.objects.create(
+            company=cls.company,
+            name="Python developer",
+            description="d" * 64,
+            money=1000,
+            experience="1",
+            city="Москва",
+        )
+        Offer.objects.create(vacancy=cls.vacancy, applicant=cls.applicant, resume_text="resume")
+        Rating.objects.create(company=cls.company, applicant=cls.applicant, rating=4, comment="c" * 64)
+
+    def test_anonymous_page(self) -> Literal[None]:
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("worksite_app:some_vacancy", kwargs={"ids": self.vacancy.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["view_offer"])
+        self.assertEqual(response.context["company_data"].company_reviews_count, 1)
+
+    def test_applicant_page(self) -> Literal[None]:
+        self.client.force_login(self.applicant)
+        # сессия и пользователь + вакансия со всеми данными + похожие вакансии
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("worksite_app:some_vacancy", kwargs={"ids": self.vacancy.pk}))
+        self.assertFalse(response.context["view_offer"])
+        self.assertEqual(response.context["tzone"], "Europe/Moscow")
+
+    def test_check_perms(self) -> Literal[None]:
+        request = RequestFactory().get("/")
+        request.user = self.applicant
+        # проверка прав без подзапросов страницы вакансии
+        with self.assertNumQueries(1):
+            self.assertEqual(CheckPermissionsToSeeVacancy.check_perms(request, self.vacancy.pk), self.vacancy)
+        Vacancy.objects.filter(pk=self.vacancy.pk).update(archived=True)
+        with self.assertRaises(Http404):
+            CheckPermissionsToSeeVacancy.check_perms(request, self.vacancy.pk)
+        request.user = self.company
+        self.assertEqual(CheckPermissionsToSeeVacancy.check_perms(request, self.vacancy.pk), self.vacancy)
+
+    def test_home_cards(self) -> Literal[None]:
+        cache.clear()
+        self.client.get(reverse("worksite_app:home"))
+        # карточка из кеша: только количество вакансий и сами вакансии страницы
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("worksite_app:home"))
+        self.assertIn(self.vacancy.name, response.context["vacancys"][0])
+        self.assertTrue(cache.has_key(f"{self.vacancy.pk}:vacancy_card:1.1.0"))
+
+        Vacancy.objects.filter(pk=self.vacancy.pk).update(version=F("version") + 1)
+        self.client.get(reverse("worksite_app:home"))
+        self.assertTrue(cache.has_key(f"{self.vacancy.pk}:vacancy_card:2.1.0"))
+
+    def test_api_retrieve(self) -> Literal[None]:
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("vacancy-detail", kwargs={"ids": self.vacancy.pk}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_api_fields(self) -> Literal[None]:
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("vacancy-detail", kwargs={"ids": self.vacancy.pk}), {"fields": "pk", "expand": "company_info"}
+            )
+        self.assertEqual(response.json(), {"pk": self.vacancy.pk, "company_info": response.json()["company_info"]})
+        self.assertEqual(response.json()["company_info"]["rating"], 4.0)
+
+        # количество + вакансии с настройками компании (подзапросами), без незапрошенных полей
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("vacancy-list"), {"fields": "id,name", "expand": "company_info"})
+        self.assertEqual(list(response.json()["results"][0]), ["id", "name", "company_info"])
+
+        response = self.client.get(reverse("vacancy-list"), {"fields": "description"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["code"], "INVALID_FIELDS")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "services.instrumentation.InstrumentedLocMemCache"}},
+    INSTRUMENTATION_ENABLED=1,
+    INSTRUMENTATION_SERVER_TIMING=1,
+    INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=3,
+)
+class InstrumentationMiddlewareTestCase(TestCase):
+    """Middleware должен считать SQL запросы и обращения к кешу и находить N+1."""
+
+    @staticmethod
+    def view(request: HttpRequest) -> HttpResponse:
+        cache.get("missing")
+        cache.set("key", 1)
+        cache.get("key")
+        for pk in range(5):
+            User.objects.filter(pk=pk).exists()
+        return HttpResponse()
+
+    def test_server_timing(self) -> Literal[None]:
+        with self.assertLogs("worksite.instrumentation") as logs:
+            response = InstrumentationMiddleware(self.view)(RequestFactory().get("/"))
+        self.assertIn('desc="5 queries"', response["Server-Timing"])
+        self.assertIn('desc="2 get, 1 set, 0 delete, 1 hits, 1 misses"', response["Server-Timing"])
+        self.assertIn('n-plus-one;desc="1 shapes"', response["Server-Timing"])
+        self.assertIn("worksite_app/tests.py", logs.output[0])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_THRESHOLD_MS=None)
+    def test_slow_query_log(self) -> Literal[None]:
+        with self.assertLogs("worksite.slow_queries", "WARNING") as logs:
+            InstrumentationMiddleware(self.view)(RequestFactory().get("/", HTTP_X_REQUEST_ID="request-1"))
+        self.assertEqual(len(logs.output), 5)
+        self.assertIn('"request_id": "request-1"', logs.output[0])
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    """Запрос с флагом _profile профилируется только для staff пользователей."""
+
+    @staticmethod
+    def view(request: HttpRequest) -> HttpResponse:
+        User.objects.exists()
+        return HttpResponse()
+
+    def test_profiling(self) -> Literal[None]:
+        request = RequestFactory().get("/", {"_profile": "cprofile"})
+        request.user = User.objects.create_user("staff", is_staff=True)
+        response = ProfilingMiddleware(self.view)(request)
+        profile = RequestProfile.objects.get(pk=response["X-Profile-ID"])
+        self.assertEqual(profile.profiler, RequestProfile.CPROFILE)
+        self.assertTrue(pstats.Stats(self._dump(profile)).total_calls)
+
+        request.user = User.objects.create_user("user")
+        response = ProfilingMiddleware(self.view)(request)
+        self.assertNotIn("X-Profile-ID", response)
+
+    def _dump(self, profile: RequestProfile) -> str:
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), profile.profile_filename)
+        with open(path, "wb") as file:
+            file.write(profile.profile)
+        return path
+
+
+@override_settings(
+    RATELIMIT_ENABLED=1,
+    RATELIMIT_BACKEND="services.ratelimit.LocMemTokenBucketBackend",
+    RATELIMITS={"register": ["ip:2/h"], "offers": ["user:1/m", "ip:10/m"]},
+)
+class RateLimitTestCase(TestCase):
+    """Запросы сверх лимита должны получать 429 с заголовком Retry-After."""
+
+    def setUp(self) -> Literal[None]:
+        get_backend.cache_clear()
+
+    def test_view(self) -> Literal[None]:
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse("home_app:register")).status_code, 200)
+        response = self.client.post(reverse("home_app:register"))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1800")
+
+    def test_api(self) -> Literal[None]:
+        applicant = User.objects.create_user("applicant")
+        ApplicantSettings.objects.create(applicant=applicant)
+        headers = {"Authorization": f"Token {Token.objects.create(user=applicant).key}"}
+        self.assertEqual(self.client.post(reverse("my_offer-list"), headers=headers).status_code, 404)
+        response = self.client.post(reverse("my_offer-list"), headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTestCase(TestCase):
+    """Ответы API не меньше порога сжимаются, если клиент поддерживает gzip."""
+
+    def test_gzip(self) -> Literal[None]:
+        response = CompressionMiddleware(lambda request: HttpResponse("a" * 100))(
+            RequestFactory().get("/api/v1/vacancys/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.content), b"a" * 100)
+
+        response = CompressionMiddleware(lambda request: HttpResponse("a" * 99))(
+            RequestFactory().get("/api/v1/vacancys/", HTTP_ACCEPT_ENCODING="gzip")
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class CompanyVacancysTestCase(TestCase):
+    """Общая подготовка тестов с вакансиями одной компании."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        CompanySettings.objects.create(company=cls.company, company_description="d" * 64)
+
+    @classmethod
+    def create_vacancy(cls, name: str = "Python developer", money: int = 100000, **fields) -> Vacancy:
+        fields = {"experience": "2", "city": "Москва"} | fields
+        return Vacancy.objects.create(company=cls.company, name=name, money=money, **fields)
+
+
+class CursorPaginationTestCase(CompanyVacancysTestCase):
+    """Keyset пагинация отдает все объекты без повторов, даже если между страницами добавлены новые объекты."""
+
+    def test_pages(self) -> Literal[None]:
+        expected = [self.create_vacancy().pk for _ in range(5)][::-1]
+        ids, url = [], reverse("vacancy-list") + "?cursor=&limit=2"
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn("count", response.json())
+            ids.extend(vacancy["id"] for vacancy in response.json()["results"])
+            url = response.json()["next"]
+            self.create_vacancy()
+        self.assertEqual(ids, expected)
+
+        response = self.client.get(reverse("vacancy-list"), {"cursor": "invalid"})
+        self.assertEqual(response.json()["code"], "INVALID_CURSOR")
+
+
+class SimilarVacancysTestCase(CompanyVacancysTestCase):
+    """Похожие вакансии: полный пересчет и добавление новой вакансии в списки уже посчитанных."""
+
+    def get_similar(self, vacancy: Vacancy) -> list:
+        return list(
+            SimilarVacancy.objects.filter(vacancy=vacancy).order_by("position").values_list("similar", flat=True)
+        )
+
+    def test_update(self) -> Literal[None]:
+        python = self.create_vacancy("Python developer", skills="Python, Django")
+        analyst = self.create_vacancy("Data analyst", city="Казань", skills="Excel")
+        backend = self.create_vacancy("Backend Python developer", skills="Python, Django")
+        update_similar_vacancys(full=True)
+        self.assertEqual(self.get_similar(python)[0], backend.pk)
+        self.assertEqual(self.get_similar(analyst), [])  # общие только опыт и зарплата, сходство ниже порога
+
+        django = self.create_vacancy("Django Python developer", skills="Python, Django")
+        # вакансия без похожих уже посчитана и снова не проверяется
+        self.assertTrue(Vacancy.objects.get(pk=analyst.pk).similar_computed)
+        self.assertEqual(update_similar_vacancys()["new"], 1)
+        self.assertEqual(update_similar_vacancys()["new"], 0)
+        self.assertEqual(set(self.get_similar(django)[:2]), {python.pk, backend.pk})
+        self.assertIn(django.pk, self.get_similar(python))
+
+        response = self.client.get(reverse("vacancy-detail", kwargs={"ids": python.pk}))
+        self.assertIn(django.pk, [vacancy["id"] for vacancy in response.json()["similar_vacancys"]])
+
+
+class SavedSearchesTestCase(CompanyVacancysTestCase):
+    """Сохраненные поиски: сохранение с главной страницы, подбор новых вакансий пачкой и рассылка писем."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        super().setUpTestData()
+        cls.applicant = User.objects.create_user("applicant", email="applicant@example.com", password="password")
+        ApplicantSettings.objects.create(applicant=cls.applicant)
+
+    def test_match_and_send(self) -> Literal[None]:
+        self.client.force_login(self.applicant)
+        params = "city=Москва&celery_from=50000&search=Python&name_search=on&ex2=on&offset=20"
+        response = self.client.post(reverse("worksite_app:saved_searches"), {"params": params})
+        self.assertEqual(response.status_code, 302)
+        saved_search = SavedSearch.objects.get(applicant=self.applicant)
+        self.assertEqual(saved_search.search_key, "pyt")
+        self.assertNotIn("offset", saved_search.params)
+
+        matched = self.create_vacancy("Senior python developer")
+        self.create_vacancy("Python developer", money=10000)
+        self.create_vacancy("Python developer", city="Казань")
+        self.create_vacancy("Data analyst")
+        self.assertEqual(match_new_vacancys(), {"vacancys": 4, "matches": 1})
+        self.assertEqual(match_new_vacancys(), {"vacancys": 0, "matches": 0})
+        self.assertEqual(list(SavedSearchMatch.objects.values_list("vacancy", flat=True)), [matched.pk])
+
+        self.assertEqual(send_digests()["emails"], 1)
+        self.assertEqual(mail.outbox[0].to, [self.applicant.email])
+        self.assertIn(reverse("worksite_app:some_vacancy", args=(matched.pk,)), mail.outbox[0].body)
+        self.assertEqual(send_digests()["emails"], 0)
+
+        response = self.client.get(reverse("worksite_app:saved_searches"))
+        self.assertContains(response, "Senior python developer")
+
+    def test_closed_vacancys(self) -> Literal[None]:
+        other = User.objects.create_user("other", email="other@example.com", password="password")
+        for applicant in (self.applicant, other):
+            self.client.force_login(applicant)
+            self.client.post(reverse("worksite_app:saved_searches"), {"params": "search=Python&name_search=on"})
+        closed, opened = self.create_vacancy("Python developer"), self.create_vacancy("Senior python developer")
+        self.assertEqual(match_new_vacancys(), {"vacancys": 2, "matches": 4})
+        Vacancy.objects.filter(pk=closed.pk).update(archived=True)
+        # у other осталось только совпадение с закрытой вакансией - письмо ему не отправляется
+        SavedSearchMatch.objects.filter(saved_search__applicant=other, vacancy=opened).delete()
+
+        self.assertEqual(send_digests(), {"applicants": 2, "emails": 1, "matches": 1})
+        self.assertEqual(mail.outbox[0].to, [self.applicant.email])
+        self.assertIn(reverse("worksite_app:some_vacancy", args=(opened.pk,)), mail.outbox[0].body)
+        self.assertNotIn(reverse("worksite_app:some_vacancy", args=(closed.pk,)), mail.outbox[0].body)
+        self.assertFalse(SavedSearchMatch.objects.filter(notified=False).exists())
+
+
+class SalaryStatsTestCase(CompanyVacancysTestCase):
+    """Статистика зарплат: процентили и гистограмма, пересчет только изменившихся групп."""
+
+    def test_update(self) -> Literal[None]:
+        for money in (1000, 2000, 3000, 4000, 5000):
+            self.create_vacancy(money=money)
+        self.create_vacancy(money=10000, experience="4")
+        self.create_vacancy(money=3000, city="Казань")
+        self.assertEqual(update_salary_stats(), {"groups": 5, "updated": 5, "removed": 0})
+        stats = SalaryStats.objects.get(city="Москва", experience="2")
+        self.assertEqual((stats.count, stats.p10, stats.p50, stats.p90), (5, 1400, 3000, 4600))
+        self.assertEqual(sum(stats.histogram), 5)
+        self.assertEqual(SalaryStats.objects.get(city="Москва", experience="").count, 6)
+
+        self.assertEqual(update_salary_stats()["updated"], 0)
+        Vacancy.objects.filter(city="Казань").update(archived=True)
+        self.create_vacancy(money=10000, experience="4")
+        # пересчитаны только группа опыта 4 и итоговая группа Москвы, группы Казани удалены
+        self.assertEqual(update_salary_stats(), {"groups": 3, "updated": 2, "removed": 2})
+        self.assertEqual(SalaryStats.objects.get(city="Москва", experience="4").count, 2)
+
+        response = self.client.get(reverse("salary_stats"), {"city": "Москва", "experience": "all"})
+        self.assertEqual([row["count"] for row in response.json()["results"]], [7])
+        self.assertContains(self.client.get(reverse("worksite_app:search")), "1600 / 4000 / 10000")
+
+
+class CompanyStatsTestCase(CompanyVacancysTestCase):
+    """Дневная статистика откликов: повторяемый пересчет за период и чтение статистики компанией."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        super().setUpTestData()
+        cls.vacancy = cls.create_vacancy()
+        cls.day = timezone.localdate() - timedelta(days=1)
+        noon = timezone.make_aware(datetime.combine(cls.day, time(12)))
+        for i in range(4):
+            applicant = User.objects.create_user(f"applicant{i}", password="password")
+            offer = Offer.objects.create(vacancy=cls.vacancy, applicant=applicant, resume_text="resume")
+            Offer.objects.filter(pk=offer.pk).update(
+                time_added=noon - timedelta(hours=i),
+                applyed=i < 2,
+                time_applyed=noon + timedelta(hours=4) if i < 2 else None,
+                withdrawn=i == 3,
+                time_withdrawn=noon + timedelta(hours=1) if i == 3 else None,
+            )
+        # отклик, поданный раньше (отзывается в тестах)
+        cls.early_day = cls.day - timedelta(days=5)
+        applicant = User.objects.create_user("applicant4", password="password")
+        cls.early_offer = Offer.objects.create(vacancy=cls.vacancy, applicant=applicant, resume_text="resume")
+        Offer.objects.filter(pk=cls.early_offer.pk).update(time_added=noon - timedelta(days=5))
+
+    def withdraw(self, offer: Offer, time_withdrawn: datetime) -> Literal[None]:
+        Offer.objects.filter(pk=offer.pk).update(withdrawn=True, time_withdrawn=time_withdrawn)
+
+    def test_update(self) -> Literal[None]:
+        self.assertEqual(update_company_stats(Period(self.early_day, self.early_day))["rows"], 1)
+        self.withdraw(self.early_offer, timezone.make_aware(datetime.combine(self.day, time(14))))
+        period = Period(self.day, self.day)
+        # отзыв раннего отклика учитывается в дне его подачи один раз, сам день не пересчитывается
+        self.assertEqual(update_company_stats(period), {"days": 1, "rows": 1, "withdrawals": 1})
+        self.assertEqual(update_company_stats(period), {"days": 1, "rows": 1, "withdrawals": 0})
+        stats = CompanyDailyStats.objects.get(date=self.day)
+        self.assertEqual((stats.offers_count, stats.applyed_count, stats.withdrawn_count), (4, 2, 2))
+        self.assertEqual(stats.offers_withdrawn_count, 1)
+        self.assertEqual(stats.time_to_apply_sum, timedelta(hours=9))  # 4 и 5 часов
+        stats = CompanyDailyStats.objects.get(date=self.early_day)
+        self.assertEqual((stats.offers_count, stats.offers_withdrawn_count, stats.withdrawn_count), (1, 1, 0))
+
+        headers = {"Authorization": f"Token {Token.objects.create(user=self.company).key}"}
+        response = self.client.get(reverse("company_stats"), {"date_from": self.day.isoformat()}, headers=headers)
+        totals = response.json()["totals"]
+        # доля считается по откликам, поданным за период, а не по всем отзывам за период
+        self.assertEqual((totals["offers_count"], totals["withdrawn_count"], totals["withdrawal_rate"]), (4, 2, 0.25))
+        response = self.client.get(reverse("company_stats"), {"date_from": self.early_day.isoformat()}, headers=headers)
+        self.assertEqual(response.json()["totals"]["withdrawal_rate"], 0.4)
+        self.assertEqual(response.json()["vacancys"][0]["stats"]["time_to_apply"], "04:30:00")
+        self.assertEqual(
+            self.client.get(reverse("company_stats"), {"date_from": "-"}, headers=headers).status_code, 400
+        )
+        self.client.force_login(self.company)
+        self.assertContains(self.client.get(reverse("worksite_app:company_stats")), "4 ч.")
+
+    def test_retention(self) -> Literal[None]:
+        # отклики старого дня, один из которых удаляется по сроку хранения между пересчетами
+        old_day = timezone.localdate() - timedelta(days=100)
+        old_noon = timezone.make_aware(datetime.combine(old_day, time(12)))
+        self.withdraw(self.early_offer, old_noon + timedelta(hours=1))
+        Offer.objects.filter(pk=self.early_offer.pk).update(time_added=old_noon)
+        offer = Offer.objects.filter(vacancy=self.vacancy, withdrawn=False).first()
+        Offer.objects.filter(pk=offer.pk).update(time_added=old_noon)
+        update_company_stats(Period(old_day, old_day))
+        self.assertEqual(delete_expired_offers()["offers"], 1)
+
+        self.withdraw(offer, timezone.now())
+        update_company_stats()
+        update_company_stats()
+        stats = CompanyDailyStats.objects.get(date=old_day)
+        self.assertEqual((stats.offers_count, stats.offers_withdrawn_count), (2, 2))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CountersTestCase(TestCase):
+    """Денормализованные счетчики: изменение при действиях с вакансиями и откликами и сохранение настроек."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        CompanySettings.objects.create(company=cls.company, company_description="d" * 64, vacancys_count=2)
+        cls.applicant = User.objects.create_user("applicant", password="password")
+        ApplicantSettings.objects.create(applicant=cls.applicant, offers_count=2)
+        cls.vacancys = [
+            Vacancy.objects.create(
+                company=cls.company, name=f"Python developer {i}", money=1000, experience="1", city="Москва"
+            )
+            for i in range(2)
+        ]
+        cls.offers = [
+            Offer.objects.create(vacancy=vacancy, applicant=cls.applicant, resume_text="resume")
+            for vacancy in cls.vacancys
+        ]
+        Vacancy.objects.update(offers_count=1)
+
+    def setUp(self) -> Literal[None]:
+        cache.clear()  # настройки пользователей из других тестов с теми же pk
+
+    def get_counters(self) -> tuple:
+        return (
+            CompanySettings.objects.get(company=self.company).vacancys_count,
+            ApplicantSettings.objects.get(applicant=self.applicant).offers_count,
+            *Vacancy.objects.order_by("pk").values_list("offers_count", flat=True),
+        )
+
+    def test_actions(self) -> Literal[None]:
+        self.client.force_login(self.applicant)
+        self.client.post(reverse("worksite_app:withdraw_offer", kwargs={"ids": self.offers[0].pk}))
+        self.assertEqual(self.get_counters(), (2, 2, 0, 1))
+        # повторный отзыв не меняет счетчики
+        self.client.post(reverse("worksite_app:withdraw_offer", kwargs={"ids": self.offers[0].pk}))
+        self.assertEqual(self.get_counters(), (2, 2, 0, 1))
+
+        self.client.force_login(self.company)
+        self.client.post(reverse("worksite_app:apply_offer", kwargs={"ids": self.offers[1].pk}))
+        self.assertEqual(self.get_counters(), (1, 2, 0, 1))
+        self.client.post(reverse("worksite_app:vacancy_delete", kwargs={"ids": self.vacancys[0].pk}))
+        self.client.post(reverse("worksite_app:vacancy_delete", kwargs={"ids": self.vacancys[0].pk}))
+        self.assertEqual(self.get_counters(), (0, 2, 0, 1))
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+
+    def test_reconcile(self) -> Literal[None]:
+        CompanySettings.objects.update(vacancys_count=10)
+        Vacancy.objects.filter(pk=self.vacancys[0].pk).update(offers_count=5)
+        self.assertEqual(reconcile_counters(), {"vacancys": 1, "companies": 1, "applicants": 0})
+        self.assertEqual(self.get_counters(), (2, 2, 1, 1))
+
+    def test_settings_save(self) -> Literal[None]:
+        # настройки закешированы до изменения счетчика, их сохранение не должно вернуть старое значение
+        for user, mixin in ((self.company, UpdateSettingsMixin()), (self.applicant, UpdateSettingsMixin())):
+            mixin.request_host = RequestHost.VIEW
+            request = RequestFactory().post("/")
+            request.user = user
+            get_user_settings(user)
+            CompanySettings.objects.update(vacancys_count=F("vacancys_count") + 3)
+            ApplicantSettings.objects.update(offers_count=F("offers_count") + 3)
+            data = {"timezone": "Europe/Moscow"}
+            if user == self.company:
+                data["company_description"] = "n" * 64
+            self.assertTrue(mixin.update_settings(request, data, {}).status)
+        self.assertEqual(self.get_counters()[:2], (8, 8))
+        company_s = CompanySettings.objects.get(company=self.company)
+        self.assertEqual((company_s.timezone, company_s.company_description), ("Europe/Moscow", "n" * 64))
+
+
+class ArchiveClosedVacancysTestCase(TestCase):
+    """Перенос закрытых вакансий с откликами в архивные таблицы."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        CompanySettings.objects.create(company=cls.company, company_description="d" * 64, vacancys_count=1)
+        cls.applicants = [User.objects.create_user(f"applicant{i}", password="password") for i in range(2)]
+        for applicant in cls.applicants:
+            ApplicantSettings.objects.create(
+                applicant=applicant, offers_count=2 if applicant == cls.applicants[0] else 1
+            )
+        cls.closed, cls.recent, cls.open = (
+            Vacancy.objects.create(
+                company=cls.company, name=f"Python developer {i}", money=1000, experience="1", city="Москва"
+            )
+            for i in range(3)
+        )
+        long_ago = timezone.now() - timedelta(days=settings.VACANCYS_ARCHIVE_AFTER_DAYS + 1)
+        Vacancy.objects.filter(pk=cls.closed.pk).update(archived=True, time_closed=long_ago, offers_count=2)
+        Vacancy.objects.filter(pk=cls.recent.pk).update(deleted=True, time_closed=timezone.now())
+        cls.applyed = Offer.objects.create(
+            vacancy=cls.closed, applicant=cls.applicants[0], resume_text="resume", applyed=True, time_applyed=long_ago
+        )
+        cls.moved = Offer.objects.create(vacancy=cls.closed, applicant=cls.applicants[1], resume_text="resume")
+        cls.kept = Offer.objects.create(vacancy=cls.open, applicant=cls.applicants[0], resume_text="resume")
+        Vacancy.objects.filter(pk=cls.open.pk).update(offers_count=1)
+        SimilarVacancy.objects.create(vacancy=cls.open, similar=cls.recent, position=0, score=0.5)
+
+    def test_archive(self) -> Literal[None]:
+        self.assertEqual(archive_closed_vacancys(), 1)
+        self.assertEqual(archive_closed_vacancys(), 0)
+        self.assertEqual(list(ArchivedVacancy.objects.values_list("pk", flat=True)), [self.closed.pk])
+        archived = ArchivedVacancy.objects.get()
+        self.assertEqual((archived.name, archived.archived, archived.company), (self.closed.name, True, self.company))
+        self.assertEqual(
+            set(ArchivedOffer.objects.values_list("pk", "vacancy", "applyed")),
+            {(self.applyed.pk, self.closed.pk, True), (self.moved.pk, self.closed.pk, False)},
+        )
+        self.assertEqual(list(Offer.objects.values_list("pk", flat=True)), [self.kept.pk])
+        self.assertEqual(set(Vacancy.objects.values_list("pk", flat=True)), {self.recent.pk, self.open.pk})
+        self.assertEqual(SimilarVacancy.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+
+        headers = {"Authorization": f"Token {Token.objects.create(user=self.applicants[0]).key}"}
+        response = self.client.get(reverse("my_offer-list"), headers=headers)
+        self.assertEqual([offer["id"] for offer in response.json()["results"]], [self.kept.pk, self.applyed.pk])
+        response = self.client.get(reverse("my_offer-detail", kwargs={"ids": self.applyed.pk}), headers=headers)
+        self.assertEqual(response.json()["id"], self.applyed.pk)
+        # отклик другого соискателя не отдается
+        response = self.client.get(reverse("my_offer-detail", kwargs={"ids": self.moved.pk}), headers=headers)
+        self.assertEqual(response.status_code, 404)
+        applyed_offers = CompanyApplyedOffersMixin().get_company_applyed_offers(self.company)
+        self.assertEqual([offer.pk for offer in applyed_offers], [self.applyed.pk])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}, RETENTION_FILES_PER_SECOND=0
+)
+class MediaCleanupTestCase(TestCase):
+    """Удаление откликов с истекшим сроком хранения и файлов, на которые не ссылается ни одна запись в БД."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        cls.applicant = User.objects.create_user("applicant", password="password")
+        cls.logo = f"{settings.CUSTOM_COMPANY_LOGOS_DIR}/{cls.company.pk}/company_logo.png"
+        cls.avatar = f"{settings.CUSTOM_APPLICANT_AVATARS_DIR}/{cls.applicant.pk}/{cls.applicant.pk}.jpg"
+        CompanySettings.objects.create(
+            company=cls.company, company_description="d" * 64, company_logo=cls.logo, vacancys_count=1
+        )
+        ApplicantSettings.objects.create(applicant=cls.applicant, applicant_avatar=cls.avatar, offers_count=6)
+        cls.open, cls.deleted = (
+            Vacancy.objects.create(
+                company=cls.company, name=f"Python developer {i}", money=1000, experience="1", city="Москва"
+            )
+            for i in range(2)
+        )
+        withdrawn_ago = timezone.now() - timedelta(days=settings.OFFERS_RETENTION_DAYS["withdrawn"] + 1)
+        closed_ago = timezone.now() - timedelta(days=settings.OFFERS_RETENTION_DAYS["deleted_vacancys"] + 1)
+        Vacancy.objects.filter(pk=cls.open.pk).update(offers_count=1)
+        Vacancy.objects.filter(pk=cls.deleted.pk).update(deleted=True, time_closed=closed_ago, offers_count=1)
+        cls.expired = [
+            Offer.objects.create(
+                vacancy=cls.open,
+                applicant=cls.applicant,
+                resume="offers/withdrawn.pdf",
+                resume_text=None,
+                withdrawn=True,
+                time_withdrawn=withdrawn_ago,
+            ),
+            Offer.objects.create(vacancy=cls.deleted, applicant=cls.applicant, resume_text="resume"),
+        ]
+        cls.kept = [
+            Offer.objects.create(
+                vacancy=cls.open,
+                applicant=cls.applicant,
+                resume_text="resume",
+                withdrawn=True,
+                time_withdrawn=timezone.now(),
+            ),
+            Offer.objects.create(
+                vacancy=cls.open, applicant=cls.applicant, resume="offers/resume.pdf", resume_text=None
+            ),
+        ]
+        archived_vacancy = ArchivedVacancy.objects.create(
+            id=1000,
+            company=cls.company,
+            name="Python developer archived",
+            money=1000,
+            experience="1",
+            city="Москва",
+            time_added=closed_ago,
+            archived=True,
+            time_closed=closed_ago,
+        )
+        ArchivedOffer.objects.create(
+            id=1000,
+            vacancy=archived_vacancy,
+            applicant=cls.applicant,
+            resume="offers/archived.pdf",
+            withdrawn=True,
+            time_added=withdrawn_ago,
+            time_withdrawn=withdrawn_ago,
+        )
+        ArchivedOffer.objects.create(
+            id=1001,
+            vacancy=archived_vacancy,
+            applicant=cls.applicant,
+            resume="offers/archived_kept.pdf",
+            time_added=withdrawn_ago,
+        )
+
+    def setUp(self) -> Literal[None]:
+        self.media_root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.protected_root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, PROTECTED_MEDIA_ROOT=self.protected_root))
+
+    def create_file(self, path: Path, old: bool = True) -> Path:
+        """Создание файла, при old - с временем изменения раньше ORPHAN_MEDIA_GRACE_HOURS."""
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"file")
+        if old:
+            mtime = (timezone.now() - timedelta(hours=settings.ORPHAN_MEDIA_GRACE_HOURS + 1)).timestamp()
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_delete_expired_offers(self) -> Literal[None]:
+        files = [
+            self.create_file(self.protected_root / name)
+            for name in ("offers/withdrawn.pdf", "offers/archived.pdf", "offers/resume.pdf")
+        ]
+        self.assertEqual(delete_expired_offers(), {"offers": 3, "files": 2, "bytes": 8})
+        self.assertEqual([file.exists() for file in files], [False, False, True])
+        self.assertEqual(set(Offer.objects.values_list("pk", flat=True)), {offer.pk for offer in self.kept})
+        self.assertEqual(list(ArchivedOffer.objects.values_list("pk", flat=True)), [1001])
+        self.assertEqual(ApplicantSettings.objects.get(applicant=self.applicant).offers_count, 3)
+        # отмененный отклик не учитывался в счетчике вакансии
+        self.assertEqual(list(Vacancy.objects.order_by("pk").values_list("offers_count", flat=True)), [1, 0])
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+        self.assertEqual(delete_expired_offers(), {"offers": 0, "files": 0, "bytes": 0})
+
+    def test_sweep_orphan_media(self) -> Literal[None]:
+        kept = [
+            self.create_file(self.media_root / self.logo),
+            self.create_file(self.media_root / self.avatar),
+            self.create_file(self.media_root / get_path_to_crop_photo(self.avatar)),
+            self.create_file(self.protected_root / "offers/resume.pdf"),
+            self.create_file(self.protected_root / "offers/archived.pdf"),
+            # файл моложе ORPHAN_MEDIA_GRACE_HOURS может принадлежать еще не сохраненной записи
+            self.create_file(self.protected_root / "offers/new.pdf", old=False),
+        ]
+        orphans = [
+            self.create_file(self.media_root / settings.CUSTOM_COMPANY_LOGOS_DIR / "0" / "company_logo.png"),
+            self.create_file(self.media_root / settings.CUSTOM_APPLICANT_AVATARS_DIR / "0" / "0_crop.jpg"),
+            self.create_file(self.protected_root / "offers/orphan.pdf"),
+        ]
+        self.assertEqual(sweep_orphan_media(dry_run=True), {"files": 3, "bytes": 12})
+        self.assertTrue(all(file.exists() for file in kept + orphans))
+
+        self.assertEqual(sweep_orphan_media(), {"files": 3, "bytes": 12})
+        self.assertTrue(all(file.exists() for file in kept))
+        self.assertFalse(any(file.exists() for file in orphans))
+        # опустевшие папки пользователей удаляются, корневые папки остаются
+        self.assertFalse(orphans[0].parent.exists() or orphans[1].parent.exists())
+        self.assertTrue((self.media_root / settings.CUSTOM_COMPANY_LOGOS_DIR).exists())
+
+
+class ProtectedResumeTestCase(TestCase):
+    """Файл с резюме отдается только автору оффера и компании, разместившей вакансию, и не раздается как медиа."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company, cls.other_company = (
+            User.objects.create_user(username, password="password", first_name="Company")
+            for username in ("company", "other_company")
+        )
+        cls.applicant, cls.other_applicant = (
+            User.objects.create_user(username, password="password") for username in ("applicant", "other_applicant")
+        )
+        vacancy = Vacancy.objects.create(
+            company=cls.company, name="Python developer", money=1000, experience="1", city="Москва"
+        )
+        cls.offer = Offer.objects.create(
+            vacancy=vacancy, applicant=cls.applicant, resume="offers/resume.pdf", resume_text=None
+        )
+        cls.text_offer = Offer.objects.create(vacancy=vacancy, applicant=cls.other_applicant, resume_text="resume")
+
+    def setUp(self) -> Literal[None]:
+        # поле хранит созданное при импорте хранилище, поэтому подменяется оно, а не PROTECTED_MEDIA_ROOT
+        storage = FileSystemStorage(
+            location=self.enterContext(tempfile.TemporaryDirectory()), base_url=settings.PROTECTED_MEDIA_URL
+        )
+        self.enterContext(mock.patch.object(Offer._meta.get_field("resume"), "storage", storage))
+        storage.save("offers/resume.pdf", ContentFile(b"%PDF resume"))
+
+    def get_resume(self, user: User, api: bool = False, ids: int = 0) -> HttpResponse:
+        kwargs = {"ids": ids or self.offer.pk}
+        if api:
+            headers = {"Authorization": f"Token {Token.objects.get_or_create(user=user)[0].key}"}
+            return self.client.get(reverse("offer_resume", kwargs=kwargs), headers=headers)
+        self.client.force_login(user)
+        return self.client.get(reverse("worksite_app:offer_resume", kwargs=kwargs))
+
+    def test_file_response(self) -> Literal[None]:
+        for user in (self.applicant, self.company):
+            for api in (False, True):
+                response = self.get_resume(user, api)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b"".join(response.streaming_content), b"%PDF resume")
+                self.assertEqual(response["Content-Type"], "application/pdf")
+                self.assertEqual(response["Content-Disposition"], 'inline; filename="resume.pdf"')
+                self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+
+    @override_settings(USE_X_ACCEL_REDIRECT=1)
+    def test_x_accel_redirect(self) -> Literal[None]:
+        for user in (self.applicant, self.company):
+            for api in (False, True):
+                response = self.get_resume(user, api)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["X-Accel-Redirect"], f"{settings.PROTECTED_MEDIA_URL}offers/resume.pdf")
+                self.assertEqual(response.content, b"")
+
+    def test_forbidden(self) -> Literal[None]:
+        for api in (False, True):
+            for user in (self.other_applicant, self.other_company):
+                self.assertEqual(self.get_resume(user, api).status_code, 403)
+            # оффер с текстовым резюме и несуществующий оффер
+            self.assertEqual(self.get_resume(self.company, api, self.text_offer.pk).status_code, 404)
+            self.assertEqual(self.get_resume(self.company, api, self.offer.pk + 100).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("offer_resume", kwargs={"ids": self.offer.pk})).status_code, 401)
+        self.assertEqual(
+            self.client.get(reverse("worksite_app:offer_resume", kwargs={"ids": self.offer.pk})).status_code, 403
+        )
+        # файл лежит не в MEDIA_ROOT, и его url ведет на internal location nginx
+        self.assertEqual(self.client.get(f"{settings.MEDIA_URL}offers/resume.pdf").status_code, 404)
+        self.assertEqual(
+            Offer.objects.get(pk=self.offer.pk).resume.url, f"{settings.PROTECTED_MEDIA_URL}offers/resume.pdf"
+        )
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BulkTestCase(TestCase):
+    """
+    Bulk-эндпоинты: неверная пачка целиком отклоняется без изменений в БД, для остальных пачек возвращается
+    результат по каждому объекту, а счетчики меняются только на обработанные объекты.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company, cls.other_company = (
+            User.objects.create_user(username, password="password", first_name="Company")
+            for username in ("company", "other_company")
+        )
+        for company in (cls.company, cls.other_company):
+            CompanySettings.objects.create(company=company, company_description="d" * 64, vacancys_count=2)
+        cls.applicant, cls.other_applicant = (
+            User.objects.create_user(username, password="password") for username in ("applicant", "other_applicant")
+        )
+        ApplicantSettings.objects.create(applicant=cls.applicant, offers_count=2)
+        ApplicantSettings.objects.create(applicant=cls.other_applicant, offers_count=2)
+        cls.vacancys = [
+            Vacancy.objects.create(
+                company=company, name=f"Python developer {i}", money=1000, experience="1", city="Москва"
+            )
+            for i, company in enumerate((cls.company, cls.company, cls.other_company, cls.other_company))
+        ]
+        cls.offers = [
+            Offer.objects.create(vacancy=cls.vacancys[vacancy], applicant=applicant, resume_text="resume")
+            for vacancy, applicant in (
+                (0, cls.applicant),
+                (1, cls.applicant),
+                (0, cls.other_applicant),
+                (2, cls.other_applicant),
+            )
+        ]
+        for vacancy, count in zip(cls.vacancys, (2, 1, 1, 0)):
+            Vacancy.objects.filter(pk=vacancy.pk).update(offers_count=count)
+
+    def post(self, user: User, url: str, data: object) -> HttpResponse:
+        headers = {"Authorization": f"Token {Token.objects.get_or_create(user=user)[0].key}"}
+        return self.client.post(url, data, content_type="application/json", headers=headers)
+
+    def get_counters(self) -> tuple:
+        return (
+            CompanySettings.objects.get(company=self.company).vacancys_count,
+            *Vacancy.objects.filter(company=self.company).order_by("pk").values_list("offers_count", flat=True),
+        )
+
+    def assert_results(self, response: HttpResponse, results: list) -> Literal[None]:
+        self.assertEqual(response.status_code, 207 if any(code for _, code in results) else 201)
+        self.assertEqual([(result["id"], result["code"]) for result in response.json()["results"]], results)
+
+    @override_settings(API_BULK_MAX_ITEMS=3)
+    def test_add_vacancys(self) -> Literal[None]:
+        url = reverse("vacancy-bulk-create")
+        vacancy = {
+            "name": "Go developer",
+            "money": 2000,
+            "experience": "2",
+            "city": "Казань",
+            "description": "d" * 64,
+            "skills": "Go",
+        }
+        for data, code in (
+            ([], "INVALID_ITEMS"),
+            ({"name": "Go developer"}, "INVALID_ITEMS"),
+            ([vacancy, "vacancy"], "INVALID_ITEMS"),
+            ([vacancy] * 4, "INVALID_SIZE"),
+        ):
+            response = self.post(self.company, url, data)
+            self.assertEqual((response.status_code, response.json()["code"]), (400, code))
+        self.assertEqual(Vacancy.objects.count(), 4)
+        self.assertEqual(self.get_counters(), (2, 2, 1))
+
+        response = self.post(self.company, url, [vacancy, vacancy | {"name": "Go"}, vacancy | {"money": 10}])
+        created = Vacancy.objects.get(company=self.company, name="Go developer")
+        self.assert_results(response, [(created.pk, None), (None, "INVALID_NAME"), (None, "INVALID_MONEY")])
+        self.assertEqual(self.get_counters(), (3, 2, 1, 0))
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+
+    def test_withdraw_offers(self) -> Literal[None]:
+        url = reverse("my_offer-bulk-withdraw")
+        response = self.post(self.applicant, url, {"ids": [self.offers[0].pk, "1"]})
+        self.assertEqual((response.status_code, response.json()["code"]), (400, "INVALID_ITEMS"))
+        self.assertFalse(Offer.objects.filter(withdrawn=True).exists())
+
+        # повторный и чужой id считаются неверными
+        ids = [self.offers[0].pk, self.offers[0].pk, self.offers[2].pk, self.offers[1].pk]
+        response = self.post(self.applicant, url, {"ids": ids})
+        self.assert_results(response, [(ids[0], None), (ids[1], "INVALID_ID"), (ids[2], "INVALID_ID"), (ids[3], None)])
+        self.assertEqual(self.get_counters(), (2, 1, 0))
+        response = self.post(self.applicant, url, {"ids": ids[:1]})
+        self.assert_results(response, [(ids[0], "INVALID_STATE")])
+        self.assertEqual(self.get_counters(), (2, 1, 0))
+        self.assertEqual(ApplicantSettings.objects.get(applicant=self.applicant).offers_count, 2)
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+
+    def test_apply_offers(self) -> Literal[None]:
+        url = reverse("bulk_apply_offers")
+        response = self.post(self.company, url, {"ids": []})
+        self.assertEqual((response.status_code, response.json()["code"]), (400, "INVALID_ITEMS"))
+
+        # второй оффер на ту же вакансию не принимается: вакансия закрывается первым
+        ids = [self.offers[0].pk, self.offers[2].pk, self.offers[3].pk, self.offers[1].pk, self.offers[1].pk]
+        response = self.post(self.company, url, {"ids": ids})
+        self.assert_results(
+            response,
+            [(ids[0], None), (ids[1], "INVALID_STATE"), (ids[2], "INVALID_ID"), (ids[3], None), (ids[4], "INVALID_ID")],
+        )
+        self.assertEqual(set(Offer.objects.filter(applyed=True).values_list("pk", flat=True)), {ids[0], ids[3]})
+        self.assertEqual(Vacancy.objects.filter(company=self.company, archived=False).count(), 0)
+        self.assertEqual(self.get_counters(), (0, 2, 1))
+        self.assertEqual(CompanySettings.objects.get(company=self.other_company).vacancys_count, 2)
+        self.assertEqual(list(RatingEligibility.objects.values_list("applicant", flat=True)), [self.applicant.pk])
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+
+
+@override_settings(EXPORT_STREAM_BUFFER_SIZE=64)
+class ExportTestCase(TestCase):
+    """Потоковые выгрузки в CSV и NDJSON, в том числе сжатые gzip, и ошибки в параметрах выгрузки."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        cls.applicant = User.objects.create_user("applicant", password="password")
+        cls.vacancys = [
+            Vacancy.objects.create(
+                company=cls.company, name=f"Python developer {i}", money=1000, experience="1", city="Москва"
+            )
+            for i in range(3)
+        ]
+        cls.offers = [
+            Offer.objects.create(
+                vacancy=cls.vacancys[0], applicant=cls.applicant, resume="offers/resume.pdf", resume_text=None
+            ),
+            Offer.objects.create(vacancy=cls.vacancys[0], applicant=cls.applicant, resume_text='resume, "text"'),
+        ]
+        cls.headers = {"Authorization": f"Token {Token.objects.create(user=cls.company).key}"}
+
+    def get_export(self, url: str, **params: str) -> tuple:
+        response = self.client.get(url, params, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        content = b"".join(chunks)
+        if params.get("compress") == "gzip":
+            self.assertEqual(response["Content-Type"], "application/gzip")
+            content = gzip.decompress(content)
+        return response, chunks, content.decode()
+
+    def test_csv(self) -> Literal[None]:
+        url = reverse("export_company_vacancys")
+        response, chunks, content = self.get_export(url)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="vacancys_company.csv"')
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(tuple(rows[0]), ExportCompanyVacancysAPIView.fields)
+        self.assertEqual([row[:3] for row in rows[1:]], [[str(v.pk), v.name, "1000"] for v in self.vacancys])
+
+        response, _, gzipped = self.get_export(url, compress="gzip")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="vacancys_company.csv.gz"')
+        self.assertEqual(gzipped, content)
+
+    def test_ndjson(self) -> Literal[None]:
+        url = reverse("export_vacancy_offers", kwargs={"ids": self.vacancys[0].pk})
+        response, _, content = self.get_export(url, output="ndjson", compress="gzip")
+        self.assertEqual(
+            response["Content-Disposition"], f'attachment; filename="offers_{self.vacancys[0].pk}.ndjson.gz"'
+        )
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [(row["id"], row["applicant__username"], row["resume"], row["resume_text"]) for row in rows],
+            [
+                (self.offers[0].pk, "applicant", reverse("offer_resume", kwargs={"ids": self.offers[0].pk}), None),
+                (self.offers[1].pk, "applicant", None, 'resume, "text"'),
+            ],
+        )
+
+        _, _, content = self.get_export(url)
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ["id", "applicant__username", "resume", "resume_text", "time_added"])
+        resume_url = reverse("offer_resume", kwargs={"ids": self.offers[0].pk})
+        self.assertEqual([row[2:4] for row in rows[1:]], [[resume_url, ""], ["", 'resume, "text"']])
+
+    def test_invalid_params(self) -> Literal[None]:
+        url = reverse("export_company_vacancys")
+        for params, code in (({"output": "xml"}, "INVALID_OUTPUT"), ({"compress": "zip"}, "INVALID_COMPRESS")):
+            response = self.client.get(url, params, headers=self.headers)
+            self.assertEqual((response.status_code, response.json()["code"]), (400, code))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ImportVacanciesTestCase(TestCase):
+    """Импорт вакансий из файла: верные строки вставляются пачками, неверные записываются в файл отклоненных."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        CompanySettings.objects.create(company=cls.company, company_description="d" * 64, vacancys_count=1)
+        Vacancy.objects.create(company=cls.company, name="Python developer", money=1000, experience="1", city="Москва")
+
+    def setUp(self) -> Literal[None]:
+        cache.clear()  # настройки пользователей из других тестов с теми же pk
+
+    def test_csv(self) -> Literal[None]:
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "vacancys.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("name", "description", "money", "experience", "city", "skills"))
+            writer.writerow(("Go developer", "d" * 64, "2000", "2", "Казань", "Go, SQL"))
+            writer.writerow(("Go", "d" * 64, "10", "2", "Казань", ""))
+            writer.writerow(("Rust developer", "d" * 64, "3000", "0", "Москва", ""))
+            writer.writerow(("Java developer", "d" * 64, "3000", "9", "Атлантида", ""))
+        get_user_settings(self.company)  # закешированные настройки должны сброситься после импорта
+
+        stdout = io.StringIO()
+        call_command("import_vacancies", path, company="company", batch_size=1, stdout=stdout)
+        self.assertIn("Read: 4, inserted: 2, rejected: 2", stdout.getvalue())
+        self.assertEqual(
+            list(Vacancy.objects.order_by("pk").values_list("name", "money", "experience", "city", "skills")),
+            [
+                ("Python developer", 1000, "1", "Москва", ""),
+                ("Go developer", 2000, "2", "Казань", "Go, SQL"),
+                ("Rust developer", 3000, "0", "Москва", ""),
+            ],
+        )
+        self.assertEqual(get_user_settings(self.company).vacancys_count, 3)
+        self.assertEqual(reconcile_counters(), {"vacancys": 0, "companies": 0, "applicants": 0})
+        with open(f"{path}.rejects.jsonl", encoding="utf-8") as file:
+            rejects = [json.loads(line) for line in file]
+        self.assertEqual(
+            [(reject["line"], [error["code"] for error in reject["errors"]]) for reject in rejects],
+            [(3, ["INVALID_NAME", "INVALID_MONEY"]), (5, ["INVALID_EXPERIENCE", "INVALID_CITY"])],
+        )
+        self.assertEqual(rejects[0]["row"]["money"], "10")
+
+    def test_invalid_company(self) -> Literal[None]:
+        User.objects.create_user("applicant", password="password")
+        for username in ("applicant", "missing"):
+            with self.assertRaises(CommandError):
+                call_command("import_vacancies", "vacancys.csv", company=username)
+        self.assertEqual(Vacancy.objects.count(), 1)
+
+
+class OfferSearchTestCase(TestCase):
+    """Разбор поискового запроса по откликам, поиск без PostgreSQL и извлечение текста резюме для поиска."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.company = User.objects.create_user("company", password="password", first_name="Company")
+        CompanySettings.objects.create(company=cls.company, company_description="d" * 64)
+        cls.applicant = User.objects.create_user("applicant", password="password")
+        ApplicantSettings.objects.create(applicant=cls.applicant)
+        cls.vacancy = Vacancy.objects.create(
+            company=cls.company, name="Python developer", money=1000, experience="1", city="Москва"
+        )
+        cls.offers = [
+            Offer.objects.create(
+                vacancy=cls.vacancy, applicant=cls.applicant, resume_text=text, resume_search_text=text
+            )
+            for text in ("Senior Python developer, Django", "Python and Go developer", "Java developer")
+        ]
+
+    def setUp(self) -> Literal[None]:
+        self.storage = FileSystemStorage(location=self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(mock.patch.object(Offer._meta.get_field("resume"), "storage", self.storage))
+
+    def test_parse(self) -> Literal[None]:
+        word, phrase = (lambda value: OfferQueryNode("word", value=value)), OfferQueryNode("phrase", value="go dev")
+        for query, tree in (
+            ("python django", OfferQueryNode("and", (word("python"), word("django")))),
+            ("python AND django", OfferQueryNode("and", (word("python"), word("django")))),
+            (
+                "python OR go java",
+                OfferQueryNode("or", (word("python"), OfferQueryNode("and", (word("go"), word("java"))))),
+            ),
+            ("python NOT java", OfferQueryNode("and", (word("python"), OfferQueryNode("not", (word("java"),))))),
+            (
+                '(python OR java) "go dev"',
+                OfferQueryNode("and", (OfferQueryNode("or", (word("python"), word("java"))), phrase)),
+            ),
+            ("NOT NOT python", OfferQueryNode("not", (OfferQueryNode("not", (word("python"),)),))),
+            # некорректные запросы: лишние операторы, пустые фразы и непарные скобки пропускаются
+            ("OR python OR", word("python")),
+            ('python AND "" NOT', word("python")),
+            ("(python", word("python")),
+            ("python)) django", OfferQueryNode("and", (word("python"), word("django")))),
+            ("AND OR NOT ( )", None),
+            ('" "', None),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(OfferSearchMixin().parse_offers_query(query), tree)
+
+    def test_search(self) -> Literal[None]:
+        for query, offers in (
+            ("", [0, 1, 2]),
+            ("python", [0, 1]),
+            ("PYTHON NOT senior", [1]),
+            ("django OR java", [0, 2]),
+            ('"go developer"', [1]),
+            ('"developer go"', []),
+            ("NOT", [0, 1, 2]),
+        ):
+            with self.subTest(query=query):
+                queryset = OfferSearchMixin().search_offers(Offer.objects.order_by("pk"), {"q": query})
+                self.assertEqual(list(queryset), [self.offers[i] for i in offers])
+
+        self.client.force_login(self.company)
+        response = self.client.get(
+            reverse("worksite_app:vacancy_offers", kwargs={"ids": self.vacancy.pk}), {"q": "java"}
+        )
+        self.assertEqual([offer.obj for offer in response.context["offers"]], [self.offers[2]])
+
+    @override_settings(RESUME_TEXT_MAX_LENGTH=20)
+    def test_extract_resume_text(self) -> Literal[None]:
+        document = docx.Document()
+        document.add_paragraph("Python   developer")
+        document.add_table(rows=1, cols=1).cell(0, 0).text = "Django"
+        docx_file = io.BytesIO()
+        document.save(docx_file)
+        for name, content, text in (
+            ("offers/resume.txt", "Разработчик\n\tPython".encode("cp1251"), "Разработчик Python"),
+            ("offers/resume.docx", docx_file.getvalue(), "Python developer Dja"),
+            ("offers/resume.odt", b"resume", ""),
+        ):
+            with self.subTest(name=name):
+                self.storage.save(name, ContentFile(content))
+                offer = Offer.objects.create(
+                    vacancy=self.vacancy, applicant=self.applicant, resume=name, resume_text=None
+                )
+                extract_resume_text(offer.pk)
+                self.assertEqual(Offer.objects.get(pk=offer.pk).resume_search_text, text)
+
+        # битый файл не роняет воркер, а текстовое резюме копируется как есть (с обрезкой)
+        self.storage.save("offers/broken.pdf", ContentFile(b"%PDF broken"))
+        offer = Offer.objects.create(
+            vacancy=self.vacancy, applicant=self.applicant, resume="offers/broken.pdf", resume_text=None
+        )
+        with self.assertLogs("tasks.worksite_app_tasks", "WARNING"):
+            extract_resume_text(offer.pk)
+        self.assertEqual(Offer.objects.get(pk=offer.pk).resume_search_text, "")
+        Offer.objects.filter(pk=self.offers[2].pk).update(resume_search_text="")
+        extract_resume_text(self.offers[2].pk)
+        self.assertEqual(Offer.objects.get(pk=self.offers[2].pk).resume_search_text, "Java developer")
+        extract_resume_text(self.offers[0].pk)
+        self.assertEqual(Offer.objects.get(pk=self.offers[0].pk).resume_search_text, "Senior Python develo")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AddRatingTestCase(TestCase):
+    """Рейтинг компании пересчитывается только по отзывам на эту компанию."""
+
+    @classmethod
+    def setUpTestData(cls) -> Literal[None]:
+        cls.companies = [
+            User.objects.create_user(f"company{i}", password="password", first_name="Company") for i in range(2)
+        ]
+        for company, rating in zip(cls.companies, (5.0, 2.0)):
+            CompanySettings.objects.create(company=company, company_description="d" * 64, rating=rating)
+        cls.applicants = [User.objects.create_user(f"applicant{i}", password="password") for i in range(3)]
+        for applicant in cls.applicants:
+            ApplicantSettings.objects.create(applicant=applicant)
+        Rating.objects.create(company=cls.companies[0], applicant=cls.applicants[0], rating=5, comment="c" * 64)
+        Rating.objects.create(company=cls.companies[1], applicant=cls.applicants[1], rating=2, comment="c" * 64)
+        RatingEligibility.objects.create(company=cls.companies[1], applicant=cls.applicants[2])
+
+    def setUp(self) -> Literal[None]:
+        cache.clear()  # настройки пользователей из других тестов с теми же pk
+
+    def test_add(self) -> Literal[None]:
+        url = reverse("add_rating", kwargs={"uname": self.companies[1].username})
+        headers = {"Authorization": f"Token {Token.objects.create(user=self.applicants[2]).key}"}
+        get_user_settings(self.companies[1])
+        response = self.client.post(url, {"rating": 4, "comment": "c" * 64}, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(CompanySettings.objects.order_by("pk").values_list("rating", flat=True)), [5.0, 3.0])
+        self.assertEqual(get_user_settings(self.companies[1]).rating, 3.0)
+        # право на отзыв израсходовано
+        response = self.client.post(url, {"rating": 1, "comment": "c" * 64}, headers=headers)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Rating.objects.filter(company=self.companies[1]).count(), 2)
+
+
+class MetricsTestCase(TestCase):
+    """Эндпоинт /metrics объединяет файлы метрик процессов из всех каталогов METRICS_DIRS."""
+
+    def write_counter(self, path: str, pid: int, value: float) -> Literal[None]:
+        """Запись файла счетчика так же, как его пишет процесс в режиме PROMETHEUS_MULTIPROC_DIR."""
+
+        metric = MmapedDict(os.path.join(path, f"counter_{pid}.db"))
+        key = mmap_key("worksite_test", "worksite_test_total", ["task"], ["import"], "Тестовый счетчик.")
+        metric.write_value(key, value, 0)
+        metric.close()
+
+    def test_multi_dir_collector(self) -> Literal[None]:
+        paths = [self.enterContext(tempfile.TemporaryDirectory()) for _ in range(2)]
+        self.write_counter(paths[0], 1, 2)
+        self.write_counter(paths[0], 2, 3)
+        self.write_counter(paths[1], 1, 5)  # pid может совпадать у процессов в разных контейнерах
+        samples = [
+            (sample.name, sample.labels, sample.value)
+            for metric in MultiDirCollector(paths).collect()
+            for sample in metric.samples
+        ]
+        self.assertEqual(samples, [("worksite_test_total", {"task": "import"}, 10)])
+
+        with override_settings(METRICS_DIRS=paths):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"], CONTENT_TYPE_LATEST)
+        self.assertIn('worksite_test_total{task="import"} 10.0', response.content.decode())
+        self.assertNotIn("worksite_request_duration_seconds", response.content.decode())
+
+    @override_settings(METRICS_DIRS=[])
+    def test_process_registry(self) -> Literal[None]:
+        self.client.get(reverse("metrics"))
+        content = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('worksite_request_duration_seconds_count{method="GET",status="200",view="metrics"}', content)
+
+    def test_clear_multiprocess_dir(self) -> Literal[None]:
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), "web")
+        os.makedirs(path)
+        self.write_counter(path, 1, 2)
+        with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": path}):
+            clear_multiprocess_dir()
+        self.assertEqual(os.listdir(path), [])
+
+
+class SeedWorksiteTestCase(TestCase):
+    """При одинаковых seed и now синтетические данные совпадают независимо от времени запуска."""
+
+    def get_data(self) -> list:
+        return list(
+            Offer.objects.order_by("pk").values_list(
+                "vacancy__name", "vacancy__money", "vacancy__time_added", "time_added", "time_withdrawn"
+            )
+        )
+
+    def test_deterministic(self) -> Literal[None]:
+        scale = SeedScale(companies=3, applicants=10, vacancys=20, offers=50, ratings=5)
+        seed_worksite(scale, seed=1)
+        data = self.get_data()
+        self.assertTrue(data)
+        self.assertTrue(all(row[3] <= SEED_NOW for row in data))
+        # сгенерированные отклики находятся поиском по резюме без фоновой задачи
+        self.assertFalse(Offer.objects.filter(resume_search_text="").exists())
+        User.objects.all().delete()
+        with mock.patch("django.utils.timezone.now", return_value=SEED_NOW + timedelta(days=10)):
+            seed_worksite(scale, seed=1)
+        self.assertEqual(self.get_data(), data)
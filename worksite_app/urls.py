@@ -3,15 +3,19 @@ from django.urls import path
 from worksite_app.views import (
     AddVacancyView,
     ApplyOfferView,
+    DeleteSavedSearchView,
     DeleteVacancyView,
+    SavedSearchesView,
     SomeCompanyView,
     SomeVacancyView,
     WithdrawOfferView,
     company_applyed_offers,
     company_rating,
+    company_stats,
     company_vacancys,
     home,
     my_offers,
+    offer_resume,
     search,
     vacancy_offers,
 )
@@ -33,7 +37,12 @@ urlpatterns = [
     path("vacancy/add/", AddVacancyView.as_view(), name="addvacancy"),
     path("offers/<int:ids>/apply/", ApplyOfferView.as_view(), name="apply_offer"),
     path("offers/applyed/", company_applyed_offers, name="company_applyed_offers"),
+    path("offers/stats/", company_stats, name="company_stats"),
+    # Урлы компаний и соискателей.
+    path("offers/<int:ids>/resume/", offer_resume, name="offer_resume"),
     # Урлы соискателей.
     path("offers/my/", my_offers, name="my_offers"),
     path("offers/my/<int:ids>/withdraw/", WithdrawOfferView.as_view(), name="withdraw_offer"),
+    path("searches/saved/", SavedSearchesView.as_view(), name="saved_searches"),
+    path("searches/saved/<int:ids>/delete/", DeleteSavedSearchView.as_view(), name="delete_saved_search"),
 ]
@@ -6,15 +6,19 @@ from django.shortcuts import redirect, render, reverse
 from django.views.generic import View
 
 from services.common_utils import check_is_user_company
+from services.ratelimit import RateLimitMixin
 from services.worksite_app_utils import (
     AddVacancyViewUtils,
     ApplyOfferViewUtils,
     CompanyApplyedOffersUtils,
     CompanyRatingViewUtils,
+    CompanyStatsViewUtils,
     CompanyVacancysViewUtils,
     DeleteVacancyUtils,
     HomeViewUtils,
     MyOffersViewUtils,
+    OfferResumeViewUtils,
+    SavedSearchesViewUtils,
     SearchViewUtils,
     SomeCompanyViewUtils,
     SomeVacancyViewUtils,
@@ -50,7 +54,9 @@ class AddVacancyView(View):
         return AddVacancyViewUtils().add_vacancy_utils(self, request)
 
 
-class SomeVacancyView(View):
+class SomeVacancyView(RateLimitMixin, View):
+    ratelimits = {"post": "offers"}
+
     def get(
         self, request: HttpRequest, ids: int, flag_success: Optional[bool] = None, error_message: Optional[str] = None
     ) -> HttpResponse:
@@ -61,7 +67,9 @@ class SomeVacancyView(View):
         return SomeVacancyViewUtils().some_vacancy_post_utils(self, request, ids)
 
 
-class SomeCompanyView(View):
+class SomeCompanyView(RateLimitMixin, View):
+    ratelimits = {"post": "ratings"}
+
     def get(self, request: HttpRequest, uname: str, error: Optional[str] = None) -> HttpResponse:
         context = SomeCompanyViewUtils().some_company_utils(request, uname, error)
         return render(request, "worksite_app/some_company.html", context=context)
@@ -85,6 +93,10 @@ def vacancy_offers(request: HttpRequest, ids: int) -> HttpResponse:
     return render(request, "worksite_app/vacancy_offers.html", context=context)
 
 
+def offer_resume(request: HttpRequest, ids: int) -> HttpResponse:
+    return OfferResumeViewUtils().offer_resume_utils(request, ids)
+
+
 class ApplyOfferView(View):
     def get(self, request: HttpRequest, ids: int) -> HttpResponse:
         context = ApplyOfferViewUtils().apply_offer_utils(request, ids)
@@ -134,3 +146,25 @@ def company_applyed_offers(request: HttpRequest) -> HttpResponse:
         "worksite_app/company_applyed_offers.html",
         context=CompanyApplyedOffersUtils().company_applyed_offers(request),
     )
+
+
+def company_stats(request: HttpRequest) -> HttpResponse:
+    context = CompanyStatsViewUtils.company_stats_utils(request)
+    return render(request, "worksite_app/company_stats.html", context=context)
+
+
+class SavedSearchesView(RateLimitMixin, View):
+    ratelimits = {"post": "saved_searches"}
+
+    def get(self, request: HttpRequest, error: Optional[str] = None) -> HttpResponse:
+        context = SavedSearchesViewUtils().saved_searches_utils(request, error)
+        return render(request, "worksite_app/saved_searches.html", context=context)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        return SavedSearchesViewUtils().saved_searches_post_utils(self, request)
+
+
+class DeleteSavedSearchView(View):
+    def post(self, request: HttpRequest, ids: int) -> HttpResponse:
+        SavedSearchesViewUtils().delete_saved_search_utils_post(request, ids)
+        return redirect(f"{reverse('worksite_app:saved_searches')}?show_success=True")